@@ -2,7 +2,9 @@ require('dotenv').config();
 const express = require('express');
 const { GoogleGenerativeAI } = require('@google/generative-ai');
 const { Pool } = require('pg');
+const redis = require('redis');
 const cors = require('cors');
+const telemetryCodec = require('./telemetry_codec');
 
 const app = express();
 app.use(cors());
@@ -38,6 +40,19 @@ pool.on('error', (err) => {
 
 console.log('✅ PostgreSQL: Connection pool initialized');
 
+// Same Redis as server.js: binary telemetry frames refresh its per-robot
+// latest sample (robot:{run_id}:{robot_id}:latest), which the JSON path
+// writes through POST /api/telemetry/:run_id
+const redisClient = redis.createClient({ url: process.env.REDIS_URL });
+let redisErrorLogged = false;
+redisClient.on('error', (err) => {
+    if (!redisErrorLogged) {
+        console.error('⚠️  Redis unavailable, latest telemetry not cached:', err.message);
+        redisErrorLogged = true;
+    }
+});
+redisClient.connect().catch(() => {});
+
 // ============================================
 // GEMINI AI (OPTIONAL)
 // ============================================
@@ -377,6 +392,70 @@ app.post('/api/monitor/telemetry', async (req, res) => {
     }
 });
 
+/**
+ * BINARY TELEMETRY
+ * Batched frames from robots running with TELEMETRY_FORMAT=binary
+ * (telemetry_codec.js): one request and one multi-row insert per frame.
+ */
+app.post('/api/monitor/telemetry/frames',
+    express.raw({ type: telemetryCodec.CONTENT_TYPE, limit: '1mb' }),
+    async (req, res) => {
+    try {
+        const samples = telemetryCodec.decodeFrames(req.body);
+        if (samples.length === 0) {
+            return res.json({ status: 'monitored', samples: 0 });
+        }
+
+        const latest = samples[samples.length - 1];
+        robotStates[latest.robot_id] = {
+            ...latest,
+            battery_level: latest.battery,
+            last_update: Date.now()
+        };
+
+        // Frames hold one robot's samples in order: the last one is current
+        if (latest.run_id && redisClient.isReady) {
+            redisClient.set(`robot:${latest.run_id}:${latest.robot_id}:latest`,
+                            JSON.stringify(latest), { EX: 60 })
+                .catch(err => console.error('Redis cache error:', err.message));
+        }
+
+        const rows = samples.filter(sample => sample.run_id);
+        if (rows.length > 0) {
+            const params = [];
+            const values = rows.map((sample, i) => {
+                params.push(
+                    sample.run_id,
+                    sample.robot_id,
+                    sample.position_x,
+                    sample.position_y,
+                    sample.task_state,
+                    'active',
+                    sample.battery,
+                    sample.tasks_completed,
+                    sample.total_energy
+                );
+                const p = i * 9;
+                return `($${p + 1}, $${p + 2}, $${p + 3}, $${p + 4}, $${p + 5}, $${p + 6}, ` +
+                       `$${p + 7}, $${p + 8}, $${p + 9}, NOW(), '{}')`;
+            });
+
+            pool.query(
+                `INSERT INTO robot_telemetry 
+                (run_id, robot_id, position_x, position_y, task_state, status, battery_level, 
+                 tasks_completed, total_energy_used, timestamp, sensor_data)
+                VALUES ${values.join(', ')}`,
+                params
+            ).catch(err => console.error('DB insert error:', err.message));
+        }
+
+        res.json({ status: 'monitored', samples: samples.length });
+    } catch (error) {
+        console.error('Telemetry frame error:', error.message);
+        res.status(400).json({ error: error.message });
+    }
+});
+
 /**
  * STUCK ROBOT HANDLING
  */
@@ -0,0 +1,131 @@
+/**
+ * TELEMETRY CODEC - Decoder for the robots' binary telemetry frames
+ * Same layout as controllers/warehouse_controller/telemetry_codec.py:
+ * a fixed header (magic "WTEL", version u8, sample count u16, body
+ * length u32, little endian), then robot id, run id and a goal zone
+ * table, then per sample a state code byte, a goal index and zigzag
+ * varints of quantized values, DELTA fields relative to the previous
+ * sample of the frame.
+ */
+
+const MAGIC = 'WTEL';
+const VERSION = 1;
+const HEADER_SIZE = 11;
+const CONTENT_TYPE = 'application/x-warehouse-telemetry';
+
+// Must match TASK_STATES in state_machine.py (codes are indices)
+const TASK_STATES = [
+    'INITIALIZING',
+    'GOING_TO_PICKUP', 'AT_PICKUP',
+    'GOING_TO_SHELF', 'AT_SHELF',
+    'GOING_TO_DELIVERY', 'AT_DELIVERY',
+    'GOING_TO_CHARGE', 'CHARGING',
+    'AWAITING_TASK',
+    'RECOVERY_REVERSE', 'RECOVERY_TURN',
+];
+
+const DELTA = 0;
+const ABSOLUTE = 1;
+
+// [telemetry key, scale, coding] in wire order
+const FIELDS = [
+    ['sim_time', 1000, DELTA],
+    ['position_x', 10000, DELTA],
+    ['position_y', 10000, DELTA],
+    ['battery', 100, DELTA],
+    ['distance_to_goal', 1000, ABSOLUTE],
+    ['tasks_completed', 1, DELTA],
+    ['task_failures', 1, DELTA],
+    ['total_energy', 1000, DELTA],
+    ['task_energy', 1000, ABSOLUTE],
+];
+
+class Reader {
+    constructor(buffer, offset, end) {
+        this.buffer = buffer;
+        this.offset = offset;
+        this.end = end;
+    }
+
+    byte() {
+        if (this.offset >= this.end) throw new Error('truncated telemetry frame');
+        return this.buffer[this.offset++];
+    }
+
+    varint() {
+        let value = 0;
+        let scale = 1;
+        for (;;) {
+            const byte = this.byte();
+            value += (byte & 0x7f) * scale;
+            if (byte < 0x80) return value;
+            scale *= 128;
+        }
+    }
+
+    signed() {
+        const value = this.varint();
+        return value % 2 ? -(value + 1) / 2 : value / 2;
+    }
+
+    text() {
+        const length = this.varint();
+        if (this.offset + length > this.end) throw new Error('truncated telemetry frame');
+        const text = this.buffer.toString('utf8', this.offset, this.offset + length);
+        this.offset += length;
+        return text;
+    }
+}
+
+function decodeFrame(buffer, offset = 0) {
+    if (buffer.length - offset < HEADER_SIZE) throw new Error('truncated telemetry frame');
+    if (buffer.toString('latin1', offset, offset + 4) !== MAGIC) throw new Error('bad telemetry magic');
+    const version = buffer.readUInt8(offset + 4);
+    if (version !== VERSION) throw new Error(`unsupported telemetry version ${version}`);
+    const count = buffer.readUInt16LE(offset + 5);
+    const end = offset + HEADER_SIZE + buffer.readUInt32LE(offset + 7);
+    if (end > buffer.length) throw new Error('truncated telemetry frame');
+
+    const reader = new Reader(buffer, offset + HEADER_SIZE, end);
+    const robot_id = reader.text();
+    const run_id = reader.text() || null;
+    const goals = [null];
+    for (let i = reader.varint(); i > 0; i--) goals.push(reader.text());
+
+    const values = FIELDS.map(() => 0);
+    const samples = [];
+    for (let n = 0; n < count; n++) {
+        const code = reader.byte();
+        const goal = reader.varint();
+        const sample = {
+            robot_id,
+            run_id,
+            task_state: TASK_STATES[code] || 'UNKNOWN',
+            current_goal: goals[goal] ?? null,
+            position_z: 0,
+            status: 'active',
+        };
+        FIELDS.forEach(([key, scale, coding], i) => {
+            const value = reader.signed();
+            values[i] = coding === DELTA ? values[i] + value : value;
+            sample[key] = values[i] / scale;
+        });
+        samples.push(sample);
+    }
+    if (reader.offset !== end) throw new Error('telemetry frame length mismatch');
+    return { samples, end };
+}
+
+// Samples of every frame in buffer (frames back to back)
+function decodeFrames(buffer) {
+    const samples = [];
+    let offset = 0;
+    while (offset < buffer.length) {
+        const frame = decodeFrame(buffer, offset);
+        samples.push(...frame.samples);
+        offset = frame.end;
+    }
+    return samples;
+}
+
+module.exports = { CONTENT_TYPE, TASK_STATES, decodeFrame, decodeFrames };
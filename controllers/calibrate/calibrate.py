@@ -39,9 +39,16 @@
 """
 
 from controller import Robot, Keyboard
-import math, json
+import math, json, os, sys
 from datetime import datetime
 
+from circle_fit import CircleStats
+
+# Layout file reader/writer shared with the warehouse controller
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "warehouse_controller"))
+from warehouse_layout import load_layout, write_layout, ZONE_KINDS
+
 # ─────────────────────────────────────────────────────────────────────────────
 # DEVICE NAMES — change these if your robot uses different names
 # ─────────────────────────────────────────────────────────────────────────────
@@ -166,76 +173,13 @@ def cardinal(deg):
     dirs = ["N","NE","E","SE","S","SW","W","NW"]
     return dirs[round(deg / 45) % 8]
 
-# ─────────────────────────────────────────────────────────────────────────────
-# CIRCLE FIT (Taubin least-squares)
-#   Drive around an object pressing E at edge points.
-#   This maths finds the best-fit circle through those points,
-#   giving you the true centre (x, z) and radius automatically.
-# ─────────────────────────────────────────────────────────────────────────────
-def fit_circle(points):
-    n = len(points)
-    if n < 2:
-        return None, None, None
-
-    if n == 2:
-        cx = (points[0][0] + points[1][0]) / 2
-        cy = (points[0][1] + points[1][1]) / 2
-        r  = math.hypot(points[1][0] - points[0][0],
-                        points[1][1] - points[0][1]) / 2
-        return cx, cy, r
-
-    # Centroid shift for numerical stability
-    mx = sum(p[0] for p in points) / n
-    my = sum(p[1] for p in points) / n
-    u  = [p[0] - mx for p in points]
-    v  = [p[1] - my for p in points]
-    z  = [u[i]**2 + v[i]**2 for i in range(n)]
-
-    Suu = sum(u[i]**2   for i in range(n))
-    Svv = sum(v[i]**2   for i in range(n))
-    Suv = sum(u[i]*v[i] for i in range(n))
-    Su  = sum(u[i]      for i in range(n))
-    Sv  = sum(v[i]      for i in range(n))
-    Suz = sum(u[i]*z[i] for i in range(n))
-    Svz = sum(v[i]*z[i] for i in range(n))
-    Sz  = sum(z[i]      for i in range(n))
-
-    A = [
-        [2*Suu, 2*Suv, Su],
-        [2*Suv, 2*Svv, Sv],
-        [2*Su,  2*Sv,  n ],
-    ]
-    rhs = [Suz + sum(u[i]*v[i]**2 for i in range(n)),
-           Svz + sum(v[i]*u[i]**2 for i in range(n)),
-           Sz]
-
-    def det3(m):
-        return (m[0][0]*(m[1][1]*m[2][2] - m[1][2]*m[2][1])
-              - m[0][1]*(m[1][0]*m[2][2] - m[1][2]*m[2][0])
-              + m[0][2]*(m[1][0]*m[2][1] - m[1][1]*m[2][0]))
-
-    D = det3(A)
-    if abs(D) < 1e-10:
-        xs = [p[0] for p in points]; ys = [p[1] for p in points]
-        return (max(xs)+min(xs))/2+mx, (max(ys)+min(ys))/2+my, \
-               math.hypot(max(xs)-min(xs), max(ys)-min(ys))/2
-
-    def sub_col(m, col, vec):
-        return [[vec[r] if c==col else m[r][c] for c in range(3)] for r in range(3)]
-
-    uc = det3(sub_col(A, 0, rhs)) / D
-    vc = det3(sub_col(A, 1, rhs)) / D
-    dc = det3(sub_col(A, 2, rhs)) / D
-    r  = math.sqrt(max(uc**2 + vc**2 - dc, 0.0))
-    return uc + mx, vc + my, r
-
 # ─────────────────────────────────────────────────────────────────────────────
 # STATE
 # ─────────────────────────────────────────────────────────────────────────────
 name_idx      = 0
 current_name  = ZONE_NAMES[name_idx]
 manual_radius = 0.60          # default matches your current radius values
-edge_points   = []
+edge_stats    = CircleStats()   # running circle-fit sums of the E points
 logged_zones  = {}            # keyed by zone id
 step_count    = 0
 
@@ -289,7 +233,7 @@ while robot.step(ts) != -1:
     # ── Live HUD (updates every 8 steps) ─────────────────────────────────────
     if step_count % 8 == 0:
         cal_tag  = "CAL-OK ✓" if calibrated else "NOT-CAL ✗"
-        edge_tag = f"{len(edge_points)} edges" if edge_points else "no edges"
+        edge_tag = f"{len(edge_stats)} edges" if len(edge_stats) else "no edges"
         logged   = len(logged_zones)
         print(
             f"\r  Pos: X={rx:7.3f}  Z={rz:7.3f}  Y(height)={ry:.3f}"
@@ -322,25 +266,29 @@ while robot.step(ts) != -1:
     # ── E — Mark edge point ───────────────────────────────────────────────────
     elif key in (ord('E'), ord('e')):
         ex, ez = gps_to_xz(gps.getValues())
-        edge_points.append((ex, ez))
-        n = len(edge_points)
-        if n >= 2:
-            cx, cz, r = fit_circle(edge_points)
-            fit_info = (f"  → fitted centre=({cx:.3f}, {cz:.3f})  radius={r:.3f} m"
-                        if cx is not None else "")
+        edge_stats.add(ex, ez)
+        n   = len(edge_stats)
+        fit = edge_stats.fit()
+        if not fit["reason"]:
+            fit_info = (f"  → fitted centre=({fit['x']:.3f}, {fit['z']:.3f})  radius={fit['radius']:.3f} m"
+                        f"  rms={fit['rms']:.3f}  confidence={fit['confidence']:.0%}")
+        elif n < 3:
+            fit_info = f"  → need {3 - n} more point{'s' if n < 2 else ''} for first estimate"
         else:
-            fit_info = "  → need 1 more point for first estimate"
+            fit_info = f"  → no fit yet ({fit['reason']}) — mark points further round the edge"
         print(f"\n  EDGE [{n}] at X={ex:.4f}  Z={ez:.4f}{fit_info}\n")
 
     # ── P — Log zone ──────────────────────────────────────────────────────────
     elif key in (ord('P'), ord('p')):
-        if len(edge_points) >= 2:
-            cx, cz, radius = fit_circle(edge_points)
-            method = f"circle-fit from {len(edge_points)} edge points"
-        elif len(edge_points) == 1:
-            cx, cz = edge_points[0]
+        fit = edge_stats.fit()
+        if not fit["reason"]:
+            cx, cz, radius = fit["x"], fit["z"], fit["radius"]
+            method = (f"circle-fit from {fit['points']} edge points, rms {fit['rms']:.3f} m, "
+                      f"confidence {fit['confidence']:.0%}")
+        elif len(edge_stats):
+            cx, cz = edge_stats.origin
             radius = manual_radius
-            method = "single edge point + manual radius"
+            method = f"first edge point + manual radius (circle fit rejected: {fit['reason']})"
         else:
             cx, cz = gps_to_xz(gps.getValues())
             radius = manual_radius
@@ -353,7 +301,7 @@ while robot.step(ts) != -1:
             "radius": round(radius, 4),
             "_method": method,
         }
-        edge_points = []   # reset for next zone
+        edge_stats.reset()   # reset for next zone
 
         print(f"\n\n  ✅ ✅ ✅  ZONE SAVED  ✅ ✅ ✅")
         print(f"  {current_name:20s}  x={logged_zones[current_name]['x']:8.4f}  "
@@ -387,7 +335,7 @@ while robot.step(ts) != -1:
     elif key in (ord('N'), ord('n')):
         name_idx     = (name_idx + 1) % len(ZONE_NAMES)
         current_name = ZONE_NAMES[name_idx]
-        edge_points  = []
+        edge_stats.reset()
         print(f"\n  Zone → [{current_name}]  (edge points reset)\n")
 
     # ── R — Print report ──────────────────────────────────────────────────────
@@ -465,8 +413,34 @@ while robot.step(ts) != -1:
                 f.write("# 3. They replace your existing PICKUP_ZONES, SHELF_ZONES, etc.\n")
                 f.write("# ═══════════════════════════════════════════════════════════════════\n")
 
-        print(f"\n\n  ✓ Saved JSON  → {jfile}")
-        print(f"  ✓ Saved zones → {pfile}")
-        print("\n  Open zones_output.py — it has your corrected zone dicts.")
-        print("  Replace your old PICKUP_ZONES / SHELF_ZONES / etc. with these.\n")
+        # ── Layout file  (loaded by the controller, no copy-paste) ──────────
+        lfile = "layout_output.json"
+        current = load_layout()
+        surveyed = {kind: [] for kind in ZONE_KINDS}
+        for zid in ZONE_NAMES:
+            if zid in logged_zones:
+                kind = zid.split("_")[0]
+                surveyed[kind].append(logged_zones[zid])
+        # Zones not surveyed this time keep their current calibration
+        for kind in ZONE_KINDS:
+            done = {z["id"] for z in surveyed[kind]}
+            surveyed[kind] += [z for z in current.zones[kind] if z["id"] not in done]
+        errors, warnings = write_layout(
+            lfile, surveyed, gps_offset={"x": offset_x, "z": offset_z},
+            bounds=current.bounds, obstacles=[dict(zip(("x", "z", "radius"), o))
+                                              for o in current.obstacles.tolist()],
+            aisles=current.aisles, name=current.name)
+
+        print(f"\n\n  ✓ Saved JSON   → {jfile}")
+        print(f"  ✓ Saved zones  → {pfile}")
+        print(f"  ✓ Saved layout → {lfile}")
+        for problem in errors:
+            print(f"  ✗ {problem}")
+        for problem in warnings:
+            print(f"  ⚠ {problem}")
+        if errors:
+            print("\n  The layout is not valid yet — re-survey the zones listed above.\n")
+        else:
+            print("\n  Use it with customData {\"LAYOUT\": \"../calibrate/layout_output.json\"}")
+            print("  or copy it over warehouse_controller/warehouse_layout.json.\n")
         break
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+CIRCLE FIT (algebraic least-squares)
+  Drive around an object pressing E at edge points.
+  This maths finds the best-fit circle through those points,
+  giving you the true centre (x, z) and radius automatically.
+
+Kept free of Webots imports so offline tools and benchmarks can use it.
+
+Every point satisfies 2·u·uc + 2·v·vc + dc = u² + v² for the centre
+(uc, vc) and dc = r² − uc² − vc², so the fit only needs the sums in
+STAT_FIELDS. CircleStats keeps them up to date in O(1) per edge point;
+fit_circles solves many zones at once from a stacked (K, 10) array.
+fit_circle is the one-shot pure-Python version of the same fit.
+
+Fits are rejected (reason set, confidence 0) when the points are too
+few, nearly collinear (a short arc, where any radius fits) or leave a
+large residual.
+
+Usage:
+    stats = CircleStats()
+    stats.add(x, z)            # per E keypress
+    fit = stats.fit()          # {"x", "z", "radius", "rms", "confidence", "reason", ...}
+
+    fits = fit_circles(*circle_stats(points, labels))  # every zone at once
+"""
+
+import math
+
+import numpy as np
+
+STAT_FIELDS = ("n", "su", "sv", "suu", "svv", "suv", "suz", "svz", "sz", "szz")
+
+MIN_POINTS = 3
+
+# Smallest / largest spread of the points; below this they are nearly collinear
+MIN_SPREAD_RATIO = 0.05
+
+# Geometric RMS residual as a fraction of the radius above which a fit is rejected
+MAX_RELATIVE_RMS = 0.15
+
+# No warehouse zone is anywhere near this big (metres)
+MAX_RADIUS = 2.0
+
+
+# ============================================
+# SUFFICIENT STATISTICS
+# ============================================
+
+class CircleStats:
+    """
+    Running sums for one circle. Coordinates are taken relative to the
+    first point so the sums stay well conditioned far from the origin.
+    """
+
+    def __init__(self, points=()):
+        self.origin = None
+        self.sums = np.zeros(len(STAT_FIELDS))
+        for x, z in points:
+            self.add(x, z)
+
+    def __len__(self):
+        return int(self.sums[0])
+
+    def add(self, x, z):
+        if self.origin is None:
+            self.origin = (float(x), float(z))
+        u, v = x - self.origin[0], z - self.origin[1]
+        w = u * u + v * v
+        self.sums += (1.0, u, v, u * u, v * v, u * v, u * w, v * w, w, w * w)
+
+    def reset(self):
+        self.origin = None
+        self.sums[:] = 0.0
+
+    def fit(self, max_radius=MAX_RADIUS):
+        """Fit as a dict of plain floats (see fit_circles for the keys)"""
+        if self.origin is None:
+            return {"x": None, "z": None, "radius": None, "rms": None, "points": 0,
+                    "confidence": 0.0, "reason": "no points"}
+        fits = fit_circles(self.sums[None, :], np.array([self.origin]), max_radius)
+        fit = {key: value[0] for key, value in fits.items()}
+        for key in ("x", "z", "radius", "rms"):
+            fit[key] = None if math.isnan(fit[key]) else float(fit[key])
+        fit["points"], fit["confidence"] = int(fit["points"]), float(fit["confidence"])
+        return fit
+
+
+def circle_stats(points, labels=None, count=None):
+    """
+    Stacked sufficient statistics of labelled points: ((K, 10) sums,
+    (K, 2) origins). Each group is centred on its own mean.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    labels = np.zeros(len(points), dtype=int) if labels is None else np.asarray(labels)
+    count = int(labels.max()) + 1 if count is None else count
+    if count == 0 or len(points) == 0:
+        return np.zeros((count, len(STAT_FIELDS))), np.zeros((count, 2))
+    n = np.bincount(labels, minlength=count).astype(float)
+    origins = np.stack([np.bincount(labels, points[:, 0], count),
+                        np.bincount(labels, points[:, 1], count)], axis=1)
+    origins /= np.maximum(n, 1.0)[:, None]
+    u, v = (points - origins[labels]).T
+    w = u * u + v * v
+    columns = (u, v, u * u, v * v, u * v, u * w, v * w, w, w * w)
+    sums = np.stack([n] + [np.bincount(labels, c, count) for c in columns], axis=1)
+    return sums, origins
+
+
+# ============================================
+# BATCHED FIT
+# ============================================
+
+def fit_circles(sums, origins=None, max_radius=MAX_RADIUS):
+    """
+    Fit every row of stacked sums. Returns a dict of (K,) arrays:
+    x, z, radius, rms (geometric, approximate), points, confidence
+    (0..1) and reason ("" for a usable fit). Rows too few or too
+    collinear to solve get NaN geometry.
+    """
+    sums = np.asarray(sums, dtype=float).reshape(-1, len(STAT_FIELDS))
+    origins = np.zeros((len(sums), 2)) if origins is None else np.asarray(origins, dtype=float)
+    n, su, sv, suu, svv, suv, suz, svz, sz, szz = sums.T
+    k = len(sums)
+
+    a = np.empty((k, 3, 3))
+    a[:, 0] = np.stack([suu, suv, su], axis=1)
+    a[:, 1] = np.stack([suv, svv, sv], axis=1)
+    a[:, 2] = np.stack([su, sv, n], axis=1)
+    b = np.stack([suz, svz, sz], axis=1)
+
+    # Spread of the points about their mean: eigenvalues of the 2x2 scatter
+    safe_n = np.maximum(n, 1.0)
+    cuu = suu / safe_n - (su / safe_n) ** 2
+    cvv = svv / safe_n - (sv / safe_n) ** 2
+    cuv = suv / safe_n - su * sv / safe_n ** 2
+    half_gap = np.sqrt(((cuu - cvv) / 2) ** 2 + cuv ** 2)
+    major = (cuu + cvv) / 2 + half_gap
+    minor = np.maximum((cuu + cvv) / 2 - half_gap, 0.0)
+    spread = np.where(major > 0, np.sqrt(minor / np.where(major > 0, major, 1.0)), 0.0)
+
+    solvable = (n >= MIN_POINTS) & (spread >= MIN_SPREAD_RATIO)
+    p = np.zeros((k, 3))
+    if solvable.any():
+        p[solvable] = np.linalg.solve(a[solvable], b[solvable][..., None])[..., 0]
+    uc, vc, dc = p[:, 0] / 2, p[:, 1] / 2, p[:, 2]
+    r2 = dc + uc * uc + vc * vc
+    radius = np.sqrt(np.maximum(r2, 0.0))
+
+    # Algebraic residual Σ(w - [2u 2v 1]·p)² from the same sums; the
+    # geometric residual is about that per point divided by 2r
+    sse = szz - 2 * np.einsum("ki,ki->k", p, b) + np.einsum("ki,kij,kj->k", p, a, p)
+    rms = np.sqrt(np.maximum(sse, 0.0) / safe_n) / np.maximum(2 * radius, 1e-12)
+    relative = rms / np.maximum(radius, 1e-12)
+
+    reason = np.full(k, "", dtype=object)
+    reason[relative > MAX_RELATIVE_RMS] = "large residual"
+    reason[radius > max_radius] = "radius too large"
+    reason[r2 <= 0] = "no real circle"
+    reason[spread < MIN_SPREAD_RATIO] = "points nearly collinear"
+    reason[n < MIN_POINTS] = "too few points"
+
+    confidence = (np.clip(spread / (4 * MIN_SPREAD_RATIO), 0.0, 1.0)
+                  * np.clip(1.0 - relative / MAX_RELATIVE_RMS, 0.0, 1.0)
+                  * (1.0 - 1.0 / np.maximum(n - 1, 1.0)))
+    confidence[reason != ""] = 0.0
+    x, z = uc + origins[:, 0], vc + origins[:, 1]
+    for column in (x, z, radius, rms):
+        column[~solvable] = np.nan
+    return {"x": x, "z": z, "radius": radius, "rms": rms, "points": n.astype(int),
+            "confidence": confidence, "reason": reason}
+
+
+def fit_circle(points):
+    """Best-fit (cx, cz, r) through edge points, without quality checks"""
+    n = len(points)
+    if n < 2:
+        return None, None, None
+
+    if n == 2:
+        cx = (points[0][0] + points[1][0]) / 2
+        cy = (points[0][1] + points[1][1]) / 2
+        r  = math.hypot(points[1][0] - points[0][0],
+                        points[1][1] - points[0][1]) / 2
+        return cx, cy, r
+
+    # Centroid shift for numerical stability
+    mx = sum(p[0] for p in points) / n
+    my = sum(p[1] for p in points) / n
+    u  = [p[0] - mx for p in points]
+    v  = [p[1] - my for p in points]
+
+    # One pass for the sums (Su and Sv are zero after the shift, up to rounding)
+    Suu = Svv = Suv = Su = Sv = Suz = Svz = Sz = 0.0
+    for ui, vi in zip(u, v):
+        zi = ui*ui + vi*vi
+        Suu += ui*ui; Svv += vi*vi; Suv += ui*vi
+        Su  += ui;    Sv  += vi
+        Suz += ui*zi; Svz += vi*zi; Sz  += zi
+
+    # Normal equations of 2u·uc + 2v·vc + dc = u² + v²
+    A = [
+        [2*Suu, 2*Suv, Su],
+        [2*Suv, 2*Svv, Sv],
+        [2*Su,  2*Sv,  n ],
+    ]
+    rhs = [Suz, Svz, Sz]
+
+    def det3(m):
+        return (m[0][0]*(m[1][1]*m[2][2] - m[1][2]*m[2][1])
+              - m[0][1]*(m[1][0]*m[2][2] - m[1][2]*m[2][0])
+              + m[0][2]*(m[1][0]*m[2][1] - m[1][1]*m[2][0]))
+
+    D = det3(A)
+    if abs(D) < 1e-10:
+        xs = [p[0] for p in points]; ys = [p[1] for p in points]
+        return (max(xs)+min(xs))/2, (max(ys)+min(ys))/2, \
+               math.hypot(max(xs)-min(xs), max(ys)-min(ys))/2
+
+    def sub_col(m, col, vec):
+        return [[vec[r] if c==col else m[r][c] for c in range(3)] for r in range(3)]
+
+    uc = det3(sub_col(A, 0, rhs)) / D
+    vc = det3(sub_col(A, 1, rhs)) / D
+    dc = det3(sub_col(A, 2, rhs)) / D
+    r  = math.sqrt(max(dc + uc**2 + vc**2, 0.0))
+    return uc + mx, vc + my, r
@@ -0,0 +1,403 @@
+"""
+AUTO CALIBRATE - Zone calibration from recorded runs
+Replaces the drive-and-press-E survey: robots record their runs as usual
+({"RECORD": true}, run_recorder.py) and this tool turns the GPS traces
+into a layout file, unattended.
+
+Pipeline:
+  1. Arrivals     - the tape marks every task state entered with its goal
+                    zone. An arrival is the frame the robot entered
+                    AT_PICKUP/AT_SHELF/AT_DELIVERY/CHARGING after driving
+                    in from outside: it is inside the zone from that
+                    frame on, so its GPS position lies on the zone's
+                    circle. Where it comes to rest is further in by its
+                    stopping distance (the motion profile decelerates
+                    after arrival) and is not used
+  2. Zones        - arrivals are grouped by the taped zone id
+  3. Circle fit   - RANSAC over 3-point circles through one zone's
+                    arrivals, refit by least squares on the inliers.
+                    Fits whose inliers cover too little of the circle
+                    (robots tend to arrive from the same side) fall back
+                    to the approach estimate: each arrival pushed one
+                    radius further along the direction the robot came
+                    from, then refined to the circle of the zone's known
+                    radius through the arrivals (robots rarely head
+                    straight at the centre). When the estimates disagree
+                    the zone is left where it was and flagged
+  4. Validation   - the layout is written and validated like any other;
+                    zones nobody arrived at keep their previous calibration
+
+--verify records a headless run against a layout, calibrates from it
+and checks that every zone visited comes back within VERIFY_TOLERANCE.
+
+Usage:
+    python auto_calibrate.py                                  # all recordings
+    python auto_calibrate.py warehouse_data/recordings/*.wrun --output new_layout.json
+    python auto_calibrate.py --verify                         # self-check on the headless sim
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "calibrate"))
+
+from circle_fit import CircleStats
+from run_recorder import RECORDING_DIR, read_recording
+from warehouse_layout import LAYOUT_PATH, MAX_ZONE_RADIUS, ZONE_KINDS, load_layout, write_layout
+
+CALIBRATION_DIR = os.path.join("warehouse_data", "calibration")
+
+# States entered on arriving at a zone, and the zone kind each one serves
+ARRIVAL_STATES = {"AT_PICKUP": "pickup", "AT_SHELF": "shelf",
+                  "AT_DELIVERY": "delivery", "CHARGING": "charger"}
+
+# Frames before an arrival used for the approach direction; an arrival
+# needs at least this many frames of driving towards the zone (fewer
+# means the robot was already inside, e.g. two stops at one zone)
+APPROACH_SAMPLES = 10
+
+MIN_VISITS = 3
+
+# RANSAC: hypotheses tried, inlier distance from the circle (m)
+RANSAC_ITERATIONS = 300
+INLIER_TOLERANCE = 0.05
+
+# Smaller circles come from repeated stops at one spot, not from a zone edge
+MIN_RADIUS = 0.2
+
+# A circle needs inliers spread over at least this arc to be trusted
+MIN_ARC_DEGREES = 120.0
+
+# Approach estimates of one zone must agree within this (m)
+APPROACH_SPREAD = 0.15
+
+# Zones that would move further than this (m) stay put and are flagged for review
+MAX_SHIFT = 0.5
+
+# --verify: headless run length (s) and largest centre/radius error (m)
+VERIFY_SECONDS = 1800.0
+VERIFY_TOLERANCE = 0.05
+
+
+# ============================================
+# ARRIVALS
+# ============================================
+
+def load_arrivals(path, gps_offset):
+    """
+    Arrivals of one recording: {zone id: (N, 4) array} of the position at
+    the arrival frame (GPS offset applied), then the unit direction the
+    robot came from
+    """
+    _, frames, _, marks = read_recording(path)
+    data = np.array([frame[:6] for frame in frames], dtype=float).reshape(-1, 6)
+    x, z = data[:, 3] - gps_offset["x"], data[:, 5] - gps_offset["z"]
+
+    arrivals = {}
+    for previous, mark in zip(marks, marks[1:]):
+        frame = mark["frame"]
+        if (mark["state"] not in ARRIVAL_STATES or not mark.get("goal")
+                or not previous["state"].startswith("GOING_TO_")
+                or previous.get("goal") != mark["goal"]
+                or frame - previous["frame"] < APPROACH_SAMPLES or frame < APPROACH_SAMPLES):
+            continue
+        before = frame - APPROACH_SAMPLES
+        direction = np.array([x[frame] - x[before], z[frame] - z[before]])
+        length = math.hypot(*direction)
+        if length == 0.0:
+            continue
+        arrivals.setdefault(mark["goal"], []).append((x[frame], z[frame], *(direction / length)))
+    return {zone: np.array(points) for zone, points in arrivals.items()}
+
+
+def merge_arrivals(per_recording):
+    """One {zone id: arrivals} from several recordings"""
+    merged = {}
+    for arrivals in per_recording:
+        for zone, points in arrivals.items():
+            merged.setdefault(zone, []).append(points)
+    return {zone: np.concatenate(points) for zone, points in merged.items()}
+
+
+# ============================================
+# ROBUST CIRCLE FIT
+# ============================================
+
+def circumcircles(p1, p2, p3):
+    """Circles through rows of three points: (cx, cz, r), NaN where collinear"""
+    (ax, az), (bx, bz), (cx, cz) = p1.T, p2.T, p3.T
+    d = 2.0 * (ax * (bz - cz) + bx * (cz - az) + cx * (az - bz))
+    d = np.where(np.abs(d) < 1e-12, np.nan, d)
+    a2, b2, c2 = ax * ax + az * az, bx * bx + bz * bz, cx * cx + cz * cz
+    ux = (a2 * (bz - cz) + b2 * (cz - az) + c2 * (az - bz)) / d
+    uz = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return ux, uz, np.hypot(ax - ux, az - uz)
+
+
+def arc_coverage(points, cx, cz):
+    """Degrees of the circle covered by points (360 minus the largest gap)"""
+    if len(points) < 2:
+        return 0.0
+    angles = np.sort(np.arctan2(points[:, 1] - cz, points[:, 0] - cx))
+    gaps = np.diff(np.concatenate([angles, [angles[0] + 2 * np.pi]]))
+    return float(np.degrees(2 * np.pi - gaps.max()))
+
+
+def ransac_circle(points, rng, iterations=RANSAC_ITERATIONS, tolerance=INLIER_TOLERANCE,
+                  min_radius=MIN_RADIUS, max_radius=MAX_ZONE_RADIUS):
+    """
+    Best circle by inlier count over random 3-point hypotheses (scored
+    all at once), refit on the inliers with the least-squares circle fit
+    unless that fit is rejected. Returns (cx, cz, radius, inlier mask) or None.
+    """
+    n = len(points)
+    if n < 3:
+        return None
+    triples = rng.integers(0, n, (iterations, 3))    # repeats come out collinear
+    cx, cz, radius = circumcircles(*(points[triples[:, i]] for i in range(3)))
+    valid = (radius >= min_radius) & (radius <= max_radius)
+    if not valid.any():
+        return None
+    cx, cz, radius = cx[valid], cz[valid], radius[valid]
+    residual = np.abs(np.hypot(points[None, :, 0] - cx[:, None],
+                               points[None, :, 1] - cz[:, None]) - radius[:, None])
+    inliers = residual < tolerance
+    count = inliers.sum(axis=1)
+    error = np.where(inliers, residual, 0.0).sum(axis=1)
+    best = np.lexsort((error, -count))[0]
+    circle, inliers = (cx[best], cz[best], radius[best]), inliers[best]
+
+    fit = CircleStats(points[inliers]).fit(max_radius)
+    if not fit["reason"] and fit["radius"] >= min_radius:
+        circle = fit["x"], fit["z"], fit["radius"]
+    return (*circle, inliers)
+
+
+# ============================================
+# CALIBRATION
+# ============================================
+
+def fit_zone(arrivals, previous_radius, rng):
+    """Centre, radius and how they were obtained for one zone's arrivals"""
+    points = arrivals[:, :2]
+    fit = ransac_circle(points, rng)
+    if fit is not None:
+        cx, cz, radius, inliers = fit
+        coverage = arc_coverage(points[inliers], cx, cz)
+        if coverage >= MIN_ARC_DEGREES and inliers.sum() >= MIN_VISITS:
+            residual = np.hypot(points[inliers, 0] - cx, points[inliers, 1] - cz) - radius
+            return {"x": float(cx), "z": float(cz), "radius": float(radius), "method": "circle",
+                    "inliers": int(inliers.sum()), "arc_degrees": round(coverage, 1),
+                    "rms": round(float(np.sqrt(np.mean(residual ** 2))), 4)}
+
+    centres = points + previous_radius * arrivals[:, 2:]
+    if len(centres) >= MIN_VISITS:
+        centre = np.median(centres, axis=0)
+        spread = np.hypot(*(centres - centre).T)
+        inliers = spread < APPROACH_SPREAD
+        if inliers.sum() >= max(MIN_VISITS, len(centres) // 2 + 1):
+            centre = fixed_radius_centre(points, centres[inliers].mean(axis=0), previous_radius)
+            residual = np.hypot(*(points - centre).T) - previous_radius
+            inliers = np.abs(residual) < INLIER_TOLERANCE
+            if inliers.sum() >= max(MIN_VISITS, len(points) // 2 + 1):
+                centre = fixed_radius_centre(points[inliers], centre, previous_radius)
+                residual = np.hypot(*(points[inliers] - centre).T) - previous_radius
+                return {"x": float(centre[0]), "z": float(centre[1]),
+                        "radius": float(previous_radius), "method": "approach",
+                        "inliers": int(inliers.sum()), "arc_degrees": None,
+                        "rms": round(float(np.sqrt(np.mean(residual ** 2))), 4)}
+    return None
+
+
+def fixed_radius_centre(points, centre, radius, iterations=20):
+    """
+    Gauss-Newton for the centre of a circle of known radius through points,
+    from an initial centre on the right side (arrivals from one direction
+    only fit two mirror-image centres). Directions the points leave
+    unconstrained keep the initial value.
+    """
+    for _ in range(iterations):
+        offset = points - centre
+        distance = np.maximum(np.hypot(*offset.T), 1e-9)
+        jacobian = -offset / distance[:, None]
+        step = np.linalg.lstsq(jacobian, -(distance - radius), rcond=None)[0]
+        centre = centre + step
+        if math.hypot(*step) < 1e-6:
+            break
+    return centre
+
+
+def calibrate(arrivals, layout, seed=0, max_shift=MAX_SHIFT):
+    """
+    Zones from {zone id: arrivals}, labelled by the taped ids. Fits that
+    move a zone further than max_shift are reported but not applied.
+    Returns ({kind: [zones]}, report rows for every zone and unknown id).
+    """
+    rng = np.random.default_rng(seed)
+    known = {zone["id"] for zone in layout.all_zones}
+
+    zones = {kind: [] for kind in ZONE_KINDS}
+    rows = []
+    for kind in ZONE_KINDS:
+        for previous in layout.zones[kind]:
+            members = arrivals.get(previous["id"])
+            if members is None or len(members) < MIN_VISITS:
+                zones[kind].append(dict(previous))
+                rows.append({"id": previous["id"], "status": "not observed", "x": previous["x"],
+                             "z": previous["z"], "radius": previous["radius"],
+                             "visits": 0 if members is None else len(members)})
+                continue
+            fit = fit_zone(members, previous["radius"], rng)
+            if fit is None:
+                zones[kind].append(dict(previous))
+                rows.append(dict(previous, status="unresolved", method="-", visits=len(members)))
+                continue
+            fit["visits"] = len(members)
+            fit["shift"] = round(math.hypot(fit["x"] - previous["x"], fit["z"] - previous["z"]), 4)
+            if fit["shift"] > max_shift:
+                zones[kind].append(dict(previous))
+                rows.append(dict(fit, id=previous["id"], status="review"))
+                continue
+            zones[kind].append({"id": previous["id"], "x": fit["x"], "z": fit["z"],
+                                "radius": fit["radius"]})
+            rows.append(dict(fit, id=previous["id"], status="calibrated"))
+
+    for zone, members in sorted(arrivals.items()):
+        if zone not in known:
+            centre = members[:, :2].mean(axis=0)
+            rows.append({"id": zone, "status": "unlabelled", "x": float(centre[0]),
+                         "z": float(centre[1]), "radius": 0.0, "visits": len(members)})
+    return zones, rows
+
+
+# ============================================
+# VERIFICATION
+# ============================================
+
+def verify_headless(layout_path=LAYOUT_PATH, duration=VERIFY_SECONDS, seed=0,
+                    tolerance=VERIFY_TOLERANCE):
+    """
+    Record a headless run against layout_path and calibrate from it.
+    Returns (rows with each fit's error against the layout, arrivals,
+    whether every zone visited came back within tolerance).
+    """
+    from headless_sim import run_headless   # only needed for the self-check
+
+    layout_path = os.path.abspath(layout_path)
+    layout = load_layout(layout_path)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            run_headless({"RECORD": True, "LAYOUT": layout_path}, duration=duration, seed=seed)
+            paths = sorted(glob.glob(os.path.join(RECORDING_DIR, "*.wrun")))
+            arrivals = merge_arrivals(load_arrivals(path, layout.gps_offset) for path in paths)
+        finally:
+            os.chdir(cwd)
+
+    _, rows = calibrate(arrivals, layout, seed, max_shift=math.inf)
+    truth = {zone["id"]: zone for zone in layout.all_zones}
+    ok = True
+    for row in rows:
+        if row["status"] == "not observed":
+            continue
+        zone = truth.get(row["id"])
+        if row["status"] != "calibrated" or zone is None:
+            ok = False
+            continue
+        row["error"] = round(max(math.hypot(row["x"] - zone["x"], row["z"] - zone["z"]),
+                                 abs(row["radius"] - zone["radius"])), 4)
+        ok = ok and row["error"] <= tolerance
+    return rows, arrivals, ok
+
+
+# ============================================
+# REPORT
+# ============================================
+
+def print_report(rows, arrivals, errors, warnings, output):
+    print(f"\n{'='*70}")
+    print(f"🎯 AUTO CALIBRATION - {arrivals} arrivals, "
+          f"{sum(r['status'] == 'calibrated' for r in rows)} zones calibrated")
+    print(f"{'='*70}")
+    print(f"   {'Zone':<16} {'Status':<13} {'x':>8} {'z':>8} {'r':>6} {'Method':<9} {'Visits':>6} {'Arc°':>6}")
+    for row in rows:
+        arc = f"{row['arc_degrees']:.0f}" if row.get("arc_degrees") is not None else "-"
+        error = f"  err {row['error']:.3f}" if "error" in row else ""
+        print(f"   {row['id']:<16} {row['status']:<13} {row['x']:>8.3f} {row['z']:>8.3f} "
+              f"{row['radius']:>6.3f} {row.get('method') or '-':<9} {row.get('visits', 0):>6} {arc:>6}{error}")
+    for problem in errors:
+        print(f"   ❌ {problem}")
+    for problem in warnings:
+        print(f"   ⚠️  {problem}")
+    if output:
+        print(f"\n💾 Layout: {output}" + (" (INVALID)" if errors else ""))
+    print(f"{'='*70}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate zones from recorded GPS traces")
+    parser.add_argument("recordings", nargs="*", help=f"default: {RECORDING_DIR}/*.wrun")
+    parser.add_argument("--layout", default=LAYOUT_PATH, help="current layout, for ids and offset")
+    parser.add_argument("--output", help="layout file to write (default: warehouse_data/calibration/)")
+    parser.add_argument("--max-shift", type=float, default=MAX_SHIFT,
+                        help="largest move (m) applied without review")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true",
+                        help="record a headless run against --layout and check it is reproduced")
+    parser.add_argument("--duration", type=float, default=VERIFY_SECONDS,
+                        help="--verify run length (sim seconds)")
+    parser.add_argument("--tolerance", type=float, default=VERIFY_TOLERANCE,
+                        help="--verify largest centre/radius error (m)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.verify:
+        rows, arrivals, ok = verify_headless(args.layout, args.duration, args.seed, args.tolerance)
+        count = sum(len(points) for points in arrivals.values())
+        if args.json:
+            print(json.dumps({"layout": args.layout, "arrivals": count, "zones": rows,
+                              "tolerance": args.tolerance, "ok": ok}, indent=2))
+        else:
+            print_report(rows, count, [] if ok else [f"layout not reproduced within {args.tolerance} m"],
+                         [], None)
+        if not ok:
+            raise SystemExit(1)
+        return
+
+    layout = load_layout(args.layout)
+    paths = args.recordings or sorted(glob.glob(os.path.join(RECORDING_DIR, "*.wrun")))
+    arrivals = merge_arrivals(load_arrivals(path, layout.gps_offset) for path in paths)
+    zones, rows = calibrate(arrivals, layout, args.seed, args.max_shift)
+
+    output = args.output
+    if output is None:
+        os.makedirs(CALIBRATION_DIR, exist_ok=True)
+        output = os.path.join(CALIBRATION_DIR,
+                              f"layout_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    errors, warnings = write_layout(
+        output, zones, gps_offset=layout.gps_offset, bounds=layout.bounds,
+        obstacles=[dict(zip(("x", "z", "radius"), o)) for o in layout.obstacles.tolist()],
+        aisles=layout.aisles, name=layout.name)
+
+    count = sum(len(points) for points in arrivals.values())
+    if args.json:
+        print(json.dumps({"recordings": paths, "arrivals": count, "zones": rows,
+                          "errors": errors, "warnings": warnings, "layout": output}, indent=2))
+    else:
+        print_report(rows, count, errors, warnings, output)
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+BACKEND CLIENT - Non-blocking HTTP for the robot controller
+One client per agent: an aiohttp session when aiohttp is installed,
+otherwise a requests session driven from worker threads. Requests are
+coroutines; spawn() runs them as tasks on the agent's event loop, so
+the control loop starts a call on one step and reads its future on a
+later one instead of waiting for the network.
+
+Recorded and replayed runs (run_recorder.py) keep backend calls
+blocking and in call order so a tape replays step for step: spawn()
+then runs the coroutine to completion at once and hands back a future
+that is already done.
+
+Usage:
+    backend = BackendClient(tape_exchange=robot.exchange)
+    future = backend.spawn(backend.post(url, json=payload, timeout=2))
+    backend.spawn(backend.post(url, data=frame, headers={"Content-Type": ...}))
+    ...
+    if future.done():
+        response = future.result()      # .status_code, .json()
+    await backend.close()               # waits briefly for calls in flight
+"""
+
+import asyncio
+import concurrent.futures
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+HTTP_AVAILABLE = aiohttp is not None or requests is not None
+
+# Seconds close() waits for calls still in flight
+DRAIN_TIMEOUT = 2.0
+
+
+class Response:
+    """Status code and JSON body of a backend reply"""
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("response had no JSON body")
+        return self.body
+
+
+class BackendClient:
+    """Shared HTTP session plus the tasks currently in flight"""
+
+    def __init__(self, http=None, tape_exchange=None):
+        """http: requests-like module or session to use instead of the default"""
+        self.tape_exchange = tape_exchange
+        self.http = http
+        self.session = None
+        self.tasks = set()
+
+    @property
+    def blocking(self):
+        return self.tape_exchange is not None
+
+    # ============================================
+    # REQUESTS
+    # ============================================
+
+    async def request(self, method, url, json=None, data=None, headers=None, timeout=None):
+        """json: body to send as JSON; data/headers: raw bytes body instead"""
+        if self.tape_exchange is not None:
+            status_code, body = self.tape_exchange(
+                "http", lambda: self._blocking_request(method, url, json, data, headers, timeout))
+            return Response(status_code, body)
+        if self.http is None and aiohttp is not None:
+            if self.session is None:
+                self.session = aiohttp.ClientSession()
+            async with self.session.request(method, url, json=json, data=data, headers=headers,
+                                            timeout=aiohttp.ClientTimeout(total=timeout)) as reply:
+                try:
+                    body = await reply.json(content_type=None)
+                except ValueError:
+                    body = None
+                return Response(reply.status, body)
+        status_code, body = await asyncio.to_thread(self._blocking_request,
+                                                    method, url, json, data, headers, timeout)
+        return Response(status_code, body)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    def _blocking_request(self, method, url, json, data, headers, timeout):
+        if self.session is None:
+            http = self.http or requests
+            if http is None:
+                raise RuntimeError("no HTTP client installed (aiohttp or requests)")
+            self.session = http.Session() if hasattr(http, "Session") else http
+        if data is None:
+            response = self.session.request(method, url, json=json, timeout=timeout)
+        else:
+            response = self.session.request(method, url, data=data, headers=headers,
+                                            timeout=timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return [response.status_code, body]
+
+    # ============================================
+    # TASKS
+    # ============================================
+
+    def spawn(self, coro):
+        """Start coro; returns its future (already done when blocking)"""
+        if self.blocking:
+            future = concurrent.futures.Future()
+            try:
+                coro.send(None)
+            except StopIteration as finished:
+                future.set_result(finished.value)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                coro.close()
+                future.set_exception(RuntimeError("taped backend call tried to wait"))
+            return future
+
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def close(self, timeout=DRAIN_TIMEOUT):
+        """Let calls in flight finish (up to timeout), then close the session"""
+        if self.tasks:
+            _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        if aiohttp is not None and isinstance(self.session, aiohttp.ClientSession):
+            await self.session.close()
+        elif hasattr(self.session, "close"):
+            self.session.close()
+        self.session = None
@@ -0,0 +1,299 @@
+"""
+BENCHMARK SUITE - Controller hot paths and end-to-end throughput
+Times the per-step functions of the warehouse controller (through the
+headless simulator), DataStorage writes and the calibration circle fit,
+plus tasks/hour on fixed seeded scenarios.
+
+Results are saved as JSON and compared against a baseline to flag regressions.
+
+Usage:
+    python benchmark.py                      # run, save, compare to baseline
+    python benchmark.py --save-baseline      # run and make this the baseline
+    python benchmark.py --quick              # fewer repeats / shorter scenarios
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "calibrate"))
+
+from circle_fit import circle_stats, fit_circle, fit_circles
+from headless_sim import HEADLESS_DEFAULTS, SimWorld, SimRobot, run_headless
+
+BENCH_DIR = os.path.join("warehouse_data", "benchmarks")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Fixed scenarios for end-to-end throughput
+SCENARIO_SEEDS = [0, 1, 2]
+
+# Relative slowdown (timings) or drop (throughput) that counts as a regression
+DEFAULT_TOLERANCE = 0.20
+
+
+# ============================================
+# TIMING HELPERS
+# ============================================
+
+def time_call(func, number, repeat, setup=None):
+    """
+    Best-of-repeat nanoseconds per call (least noisy estimate).
+    setup(), if given, runs untimed before each repeat and returns the callable.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            func = setup()
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+def load_controller():
+    """
+    Live RobotAgent on a headless robot, not started and never shut down
+    (its log stays open), with a body 0.6 m ahead inside sonar range.
+    Returns (robot, agent, obstacle).
+    """
+    from robot_agent import RobotAgent
+
+    world = SimWorld()
+    body = world.add_body(0.0, 0.0, 0.0)
+    obstacle = world.add_body(0.0, 0.6, 0.0)
+    robot = SimRobot(world, body, duration=float('inf'),
+                     custom_data=dict(HEADLESS_DEFAULTS, SEED=0))
+    with contextlib.redirect_stdout(io.StringIO()):   # console log bound to the buffer
+        agent = RobotAgent(robot)
+    robot.step(robot.time_step)
+    return robot, agent, obstacle
+
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+def bench_controller(number, repeat):
+    robot, agent, obstacle = load_controller()
+    goal = agent.shelf_zones[0]
+    results = {
+        "navigate_to_goal": time_call(lambda: agent.navigate_to_goal(goal), number, repeat),
+        "detect_obstacles": time_call(agent.detect_obstacles, number, repeat),
+        "is_in_zone": time_call(lambda: agent.is_in_zone(goal), number, repeat),
+    }
+
+    # update_state_machine changes state every call: time whole steps of a
+    # live run and keep the physics step, pose and battery updates out of
+    # the measurement. The obstacle goes first so the run never gets stuck
+    # and times travel rather than recovery states.
+    robot.world.bodies.remove(obstacle)
+    update = agent.update_state_machine
+    failures = agent.task_failures
+    samples = []
+    for _ in range(repeat):
+        total = 0
+        for _ in range(number):
+            robot.step(robot.time_step)
+            agent.update_pose()
+            agent.drain_battery()
+            start = time.perf_counter_ns()
+            update()
+            total += time.perf_counter_ns() - start
+        samples.append(total / number)
+    if agent.task_failures != failures:
+        print(f"⚠️  update_state_machine timing includes "
+              f"{agent.task_failures - failures} stuck recoveries")
+    agent.log.close()
+    results["update_state_machine"] = min(samples)
+    return results
+
+
+def bench_storage(number, repeat):
+    telemetry = {"robot_id": "bench", "battery": 87.5, "task_state": "GOING_TO_SHELF",
+                 "position_x": 1.25, "position_y": -0.5, "tasks_completed": 3}
+    metrics = {"task_number": 1, "completion_time": 25.6, "energy_used": 8.9,
+               "pickup": "pickup_B", "delivery": "delivery_north"}
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            sys.modules.pop("data_storage", None)
+            from data_storage import DataStorage
+            storage = DataStorage()
+            robot_ids = iter(range(repeat))
+
+            # Metrics files are rewritten whole on every save: start each
+            # repeat from an empty file so repeats stay comparable
+            def fresh_metrics_writer():
+                robot_id = f"bench_{next(robot_ids)}"
+                return lambda: storage.save_performance_metrics(robot_id, metrics)
+
+            return {
+                "storage.save_telemetry": time_call(
+                    lambda: storage.save_telemetry(telemetry), number, repeat),
+                "storage.save_performance_metrics": time_call(
+                    None, number, repeat, setup=fresh_metrics_writer),
+            }
+        finally:
+            os.chdir(previous_dir)
+            sys.modules.pop("data_storage", None)
+
+
+def bench_fit_circle(number, repeat):
+    rng = random.Random(0)
+    results = {}
+    for n in (8, 64, 512):
+        points = [(1.0 + 0.6 * math.cos(a) + rng.gauss(0, 0.01),
+                   2.0 + 0.6 * math.sin(a) + rng.gauss(0, 0.01))
+                  for a in (rng.uniform(0, 2 * math.pi) for _ in range(n))]
+        results[f"fit_circle[{n}]"] = time_call(lambda: fit_circle(points),
+                                                max(number // n, 10), repeat)
+
+    # Bulk re-calibration: 100 zones of 64 points in one batched solve
+    labels = [i // 64 for i in range(6400)]
+    points = [(i % 10 + 0.6 * math.cos(a) + rng.gauss(0, 0.01),
+               i // 10 + 0.6 * math.sin(a) + rng.gauss(0, 0.01))
+              for i, a in ((label, rng.uniform(0, 2 * math.pi)) for label in labels)]
+    results["fit_circles[100x64]"] = time_call(lambda: fit_circles(*circle_stats(points, labels)),
+                                               max(number // 100, 10), repeat)
+    return results
+
+
+def bench_throughput(duration):
+    results = {}
+    wall = 0.0
+    steps = 0
+    for seed in SCENARIO_SEEDS:
+        start = time.perf_counter()
+        run = run_headless(duration=duration, seed=seed)
+        wall += time.perf_counter() - start
+        steps += round(run["sim_time"] * 1000 / run["time_step"])
+        results[f"scenario_{seed}.tasks_per_hour"] = run["tasks_completed"] / (duration / 3600.0)
+        results[f"scenario_{seed}.energy_per_task"] = (
+            run["energy"] / run["tasks_completed"] if run["tasks_completed"] else None)
+    results["steps_per_second"] = steps / wall
+    return results
+
+
+def run_suite(quick=False):
+    number = 200 if quick else 2000
+    repeat = 3 if quick else 7
+    duration = 300.0 if quick else 1800.0
+
+    timings = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings.update(bench_controller(number, repeat))
+    timings.update(bench_storage(number // 10, repeat))
+    timings.update(bench_fit_circle(number, repeat))
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": quick,
+        "timings_ns": timings,
+        "throughput": bench_throughput(duration),
+    }
+
+
+# ============================================
+# BASELINE COMPARISON
+# ============================================
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns (rows, regressions); timings regress when slower, throughput when lower"""
+    rows = []
+    regressions = []
+
+    for name, value in current["timings_ns"].items():
+        base = baseline.get("timings_ns", {}).get(name)
+        if not base:
+            continue
+        change = value / base - 1.0
+        rows.append((name, base, value, change))
+        if change > tolerance:
+            regressions.append(name)
+
+    for name, value in current["throughput"].items():
+        base = baseline.get("throughput", {}).get(name)
+        if not base or value is None:
+            continue
+        change = value / base - 1.0
+        rows.append((name, base, value, change))
+        lower_is_better = name.endswith("energy_per_task")
+        if (change > tolerance) if lower_is_better else (change < -tolerance):
+            regressions.append(name)
+
+    return rows, regressions
+
+
+def print_report(results, rows, regressions):
+    print(f"\n{'='*78}")
+    print(f"⏱️  BENCHMARK - Python {results['python']} ({results['machine']})")
+    print(f"{'='*78}")
+    if not rows:
+        for name, value in results["timings_ns"].items():
+            print(f"   {name:38s} {value / 1000:10.2f} µs")
+        for name, value in results["throughput"].items():
+            if value is not None:
+                print(f"   {name:38s} {value:10.2f}")
+        return
+    print(f"   {'benchmark':38s} {'baseline':>11s} {'current':>11s} {'change':>8s}")
+    for name, base, value, change in rows:
+        flag = "  ❌" if name in regressions else ""
+        print(f"   {name:38s} {base:11.2f} {value:11.2f} {change * 100:+7.1f}%{flag}")
+    print(f"\n   {len(regressions)} regression(s)" if regressions else "\n   ✅ No regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controller benchmark suite")
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_suite(quick=args.quick)
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    out = os.path.join(BENCH_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    rows, regressions = [], []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Quick and full runs differ in scenario length and repeats: not comparable
+        if baseline.get("quick") != results["quick"]:
+            kind = "quick" if baseline.get("quick") else "full"
+            print(f"⚠️  Baseline {args.baseline} is a {kind} run - not compared "
+                  f"(rerun {'with' if baseline.get('quick') else 'without'} --quick)")
+        else:
+            rows, regressions = compare(results, baseline, args.tolerance)
+
+    print_report(results, rows, regressions)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+    print(f"💾 Results saved to {out}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -52,6 +52,17 @@ class DataStorage:
         # Append to JSONL file (one JSON per line)
         with open(filename, 'a') as f:
             f.write(json.dumps(telemetry_data) + '\n')
+
+    def save_telemetry_frame(self, robot_id, frame):
+        """
+        Append a binary telemetry frame (telemetry_codec.py)
+        In production: POST to /api/monitor/telemetry/frames
+        """
+        filename = os.path.join(TELEMETRY_DIR, f"{robot_id}_telemetry.wtel")
+        
+        # Frames concatenate: the file decodes with telemetry_codec.read_archive
+        with open(filename, 'ab') as f:
+            f.write(frame)
     
     # ==========================================
     # TASKS (task assignments)
@@ -0,0 +1,67 @@
+"""
+ENERGY MODEL - Physics-based battery consumption
+Battery drain from wheel speeds, acceleration, turning and payload
+Replaces the constant per-step BATTERY_DRAIN_RATE
+
+Energy is expressed in battery percent, like battery_level.
+Coefficients are tuned so straight cruising at CRUISE_SPEED (3.0 rad/s)
+drains roughly what the old constant rate did (0.25 %/s).
+"""
+
+# Electronics / sensors drain, even when standing still (%/s)
+IDLE_POWER = 0.05
+
+# Rolling resistance per rad/s of mean wheel speed (%/s)
+ROLLING_COEFF = 0.066
+
+# Extra drain per rad/s^2 of wheel acceleration (%/s)
+ACCEL_COEFF = 0.012
+
+# Scrubbing losses per rad/s of wheel speed difference when turning (%/s)
+TURN_COEFF = 0.02
+
+# Rolling and acceleration losses are multiplied by this while carrying a load
+PAYLOAD_FACTOR = 1.35
+
+
+class EnergyModel:
+    """Integrates battery drain step by step and attributes it to tasks"""
+
+    def __init__(self, dt):
+        self.dt = dt
+        self.prev_left = 0.0
+        self.prev_right = 0.0
+
+        self.task_energy = 0.0
+        self.breakdown = {"idle": 0.0, "rolling": 0.0, "accel": 0.0, "turning": 0.0}
+
+    def step(self, left_speed, right_speed, loaded=False):
+        """
+        Energy used during one control step with the given wheel speeds (rad/s).
+        Returns the drain in battery percent.
+        """
+        dt = self.dt
+        left_accel = abs(left_speed - self.prev_left) / dt
+        right_accel = abs(right_speed - self.prev_right) / dt
+        self.prev_left = left_speed
+        self.prev_right = right_speed
+
+        load = PAYLOAD_FACTOR if loaded else 1.0
+
+        idle = IDLE_POWER * dt
+        rolling = ROLLING_COEFF * load * (abs(left_speed) + abs(right_speed)) / 2.0 * dt
+        accel = ACCEL_COEFF * load * (left_accel + right_accel) / 2.0 * dt
+        turning = TURN_COEFF * abs(right_speed - left_speed) * dt
+
+        self.breakdown["idle"] += idle
+        self.breakdown["rolling"] += rolling
+        self.breakdown["accel"] += accel
+        self.breakdown["turning"] += turning
+
+        energy = idle + rolling + accel + turning
+        self.task_energy += energy
+        return energy
+
+    def start_task(self):
+        """Begin attributing energy to a new task"""
+        self.task_energy = 0.0
@@ -0,0 +1,167 @@
+"""
+FALLBACK ALLOCATOR - Zone choice while the AI server is unreachable
+The AI server's recent decisions are cached per (zone the robot comes
+from, target type); the share of them that went to each zone is that
+zone's score. Without the server the robot takes the nearest feasible
+zone over the route planner's distance matrix, each option's distance
+counted to the end of the cheapest order it can still be part of and
+shortened by its score, so the robot keeps the server's preferences
+and never picks a zone the battery cannot serve an order from.
+
+A circuit breaker keeps a failing server from costing a timeout per
+call: after FAILURE_THRESHOLD failures in a row every decision is made
+locally for COOLDOWN_SECONDS, then one trial call decides whether the
+server is back.
+
+Usage:
+    fallback = FallbackAllocator(planner, PICKUP_ZONES, SHELF_ZONES, DELIVERY_ZONES)
+    fallback.remember(START, "pickup", zone['id'])          # per server decision
+    pickup = fallback.choose("pickup", (x, y), None, battery_budget)
+    shelf = fallback.choose("shelf", (x, y), pickup, battery_budget)
+
+    breaker = CircuitBreaker()
+    if breaker.allow(sim_time):
+        ...                                 # call, then breaker.success() / failure(sim_time)
+"""
+
+import collections
+
+import numpy as np
+
+from q_allocator import START_STATE as START
+
+# Server decisions remembered per (from zone, target type)
+DECISION_MEMORY = 20
+
+# Distance (m) a zone the server always picked from here is treated as closer by
+PREFERENCE_DISTANCE = 1.5
+
+# Consecutive failed calls that open the circuit, and seconds (sim time) it stays open
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 30.0
+
+TARGET_TYPES = ("pickup", "shelf", "delivery")
+
+
+# ============================================
+# CIRCUIT BREAKER
+# ============================================
+
+class CircuitBreaker:
+    """closed -> open after repeated failures -> half open (one trial call) -> closed"""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def is_open(self, now):
+        """Calls are pointless: open and still cooling down, or a trial is out"""
+        if self.state == "open":
+            return now - self.opened_at < self.cooldown
+        return self.state == "half_open"
+
+    def allow(self, now):
+        """Whether to make a call now; the first call after the cooldown is the trial"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and now - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            return True
+        return False
+
+    def success(self):
+        """Returns True when this closes an open circuit"""
+        reopened = self.state != "closed"
+        self.state = "closed"
+        self.failures = 0
+        return reopened
+
+    def failure(self, now):
+        """Returns True when this opens the circuit"""
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed"
+                                         and self.failures >= self.threshold):
+            self.state = "open"
+            self.opened_at = now
+            self.trips += 1
+            return True
+        return False
+
+
+# ============================================
+# LOCAL ALLOCATION
+# ============================================
+
+class FallbackAllocator:
+    """Nearest feasible zone, biased towards the AI server's cached choices"""
+
+    def __init__(self, planner, pickups, shelves, deliveries, memory=DECISION_MEMORY,
+                 preference=PREFERENCE_DISTANCE):
+        self.planner = planner
+        self.preference = preference
+        self.decisions = collections.defaultdict(lambda: collections.deque(maxlen=memory))
+        self.options = dict(zip(TARGET_TYPES, (pickups, shelves, deliveries)))
+
+        matrix, index = planner.distances.matrix, planner.distances.index
+        self.rows = {kind: np.array([index[z['id']] for z in zones], dtype=int)
+                     for kind, zones in self.options.items()}
+        pickup_rows, shelf_rows, delivery_rows = (self.rows[k] for k in TARGET_TYPES)
+
+        # Shortest rest of an order once a zone of each type is reached:
+        # a delivery ends it, a shelf still needs its nearest delivery, a
+        # pickup the best shelf + delivery after it
+        to_delivery = matrix[np.ix_(shelf_rows, delivery_rows)].min(axis=1)
+        self.tail = {
+            "delivery": np.zeros(len(delivery_rows)),
+            "shelf": to_delivery,
+            "pickup": (matrix[np.ix_(pickup_rows, shelf_rows)] + to_delivery).min(axis=1),
+        }
+        self.stops_left = {"pickup": 3, "shelf": 2, "delivery": 1}
+
+    def remember(self, from_id, kind, zone_id):
+        """Cache one decision of the AI server"""
+        self.decisions[(from_id or START, kind)].append(zone_id)
+
+    def scores(self, from_id, kind):
+        """Share of the cached server decisions from here that went to each option"""
+        recent = self.decisions.get((from_id or START, kind))
+        if not recent:
+            return np.zeros(len(self.options[kind]))
+        counts = collections.Counter(recent)
+        return np.array([counts[z['id']] for z in self.options[kind]], dtype=float) / len(recent)
+
+    def choose(self, kind, position, previous=None, battery_budget=np.inf):
+        """
+        Zone of `kind` for an order continuing from `previous` (the zone
+        just chosen, None for a pickup, which starts at `position`)
+        """
+        planner = self.planner
+        rows = self.rows[kind]
+        if previous is None:
+            leg = planner.distances.from_point(position)[rows]
+            rate = planner.energy_per_meter
+        else:
+            leg = planner.distances.matrix[planner.distances.index[previous['id']], rows]
+            rate = planner.loaded_energy_per_meter
+        remaining = leg + self.tail[kind]
+
+        # Energy of the cheapest completion through each option (route planner's rates)
+        energy = (leg * rate + self.tail[kind] * planner.loaded_energy_per_meter
+                  + self.stops_left[kind] * planner.stop_energy) * planner.energy_margin
+        feasible = energy <= battery_budget
+        if not feasible.any():
+            feasible[:] = True
+
+        score = remaining - self.preference * self.scores(previous and previous['id'], kind)
+        score[~feasible] = np.inf
+        return self.options[kind][int(np.argmin(score))]
+
+    def order(self, position, battery_budget=np.inf):
+        """A whole (pickup, shelf, delivery) order chosen locally"""
+        pickup = self.choose("pickup", position, None, battery_budget)
+        shelf = self.choose("shelf", position, pickup, battery_budget)
+        return pickup, shelf, self.choose("delivery", position, shelf, battery_budget)
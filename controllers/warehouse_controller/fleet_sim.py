@@ -0,0 +1,580 @@
+"""
+FLEET SIMULATOR - Discrete-event simulation of the warehouse fleet
+Models robots moving between pickup, shelf, delivery and charging zones
+with calibrated travel times, so allocator and charging policies can be
+compared in seconds before running them in Webots or on the floor.
+
+Usage:
+    python fleet_sim.py --robots 200 --hours 24 --policy nearest random
+    python fleet_sim.py --fit 3                # travel times from 3 headless runs
+"""
+
+import argparse
+import heapq
+import math
+import random
+import time
+
+from warehouse_zones import PICKUP_ZONES, SHELF_ZONES, DELIVERY_ZONES, CHARGING_STATIONS
+from motion_profile import WHEEL_RADIUS
+from energy_model import IDLE_POWER, ROLLING_COEFF, ACCEL_COEFF, PAYLOAD_FACTOR
+from q_allocator import QAllocator
+from state_machine import (GOING_TO_PICKUP, AT_PICKUP, GOING_TO_SHELF, AT_SHELF,
+                           GOING_TO_DELIVERY, AT_DELIVERY, GOING_TO_CHARGE, CHARGING,
+                           RECOVERY_REVERSE, RECOVERY_TURN)
+
+# Controller values the simulator mirrors (robot_agent.py)
+TIME_STEP = 32                 # ms, Webots default basicTimeStep
+CRUISE_SPEED = 3.0             # rad/s
+CRITICAL_BATTERY = 15.0        # %
+BATTERY_CHARGE_RATE = 0.3      # % per step
+DWELL_STEPS = 41               # wait_counter > 40 at pickup / shelf / delivery
+
+# Controller states that make up a travel leg, and where each one ends
+LEG_ARRIVALS = {GOING_TO_PICKUP: AT_PICKUP, GOING_TO_SHELF: AT_SHELF,
+                GOING_TO_DELIVERY: AT_DELIVERY, GOING_TO_CHARGE: CHARGING}
+RECOVERY_STATES = (RECOVERY_REVERSE, RECOVERY_TURN)
+DWELL_STATES = ("AT_PICKUP", "AT_SHELF", "AT_DELIVERY")
+
+# Simulated seconds per headless run when fitting the travel model (--fit)
+FIT_DURATION = 1800.0
+
+# Event types
+ORDER_ARRIVAL = 0
+LEG_COMPLETE = 1
+CHARGE_COMPLETE = 2
+
+# Leg kinds, in task order
+LEG_PICKUP = 0
+LEG_SHELF = 1
+LEG_DELIVERY = 2
+LEG_CHARGER = 3
+
+
+def zone_distance(a, b):
+    return math.hypot(b['x'] - a['x'], b['z'] - a['z'])
+
+
+# ============================================
+# TRAVEL TIME MODEL
+# ============================================
+
+class TravelTimeModel:
+    """
+    Leg duration = overhead + distance / speed
+    Defaults come from the controller's cruise speed; fit() calibrates both
+    terms from measured (distance, seconds) samples.
+    """
+
+    def __init__(self, speed=CRUISE_SPEED * WHEEL_RADIUS, overhead=2.0,
+                 dwell_time=DWELL_STEPS * TIME_STEP / 1000.0):
+        self.speed = speed            # m/s
+        self.overhead = overhead      # s, turning on the spot + accel/decel
+        self.dwell_time = dwell_time  # s at each zone
+
+    def fit(self, samples):
+        """Least-squares fit of overhead and speed from (distance, seconds) pairs"""
+        n = len(samples)
+        if n < 2:
+            return self
+        sx = sum(d for d, _ in samples)
+        sy = sum(t for _, t in samples)
+        sxx = sum(d * d for d, _ in samples)
+        sxy = sum(d * t for d, t in samples)
+        denom = n * sxx - sx * sx
+        if abs(denom) < 1e-12:
+            return self
+        slope = (n * sxy - sx * sy) / denom
+        if slope > 0:
+            self.speed = 1.0 / slope
+            self.overhead = max((sy - slope * sx) / n, 0.0)
+        return self
+
+    def travel_time(self, distance):
+        return self.overhead + distance / self.speed
+
+    def travel_energy(self, seconds, loaded):
+        """Battery % for a leg, using the controller's energy model coefficients"""
+        load = PAYLOAD_FACTOR if loaded else 1.0
+        cruise = ROLLING_COEFF * load * CRUISE_SPEED
+        # One ramp up and one ramp down per leg
+        ramps = 2.0 * ACCEL_COEFF * load * CRUISE_SPEED
+        return (IDLE_POWER + cruise) * seconds + ramps
+
+    def dwell_energy(self, seconds):
+        return IDLE_POWER * seconds
+
+
+def fit_travel_model(runs, duration=FIT_DURATION, seed=0):
+    """
+    TravelTimeModel fitted to `runs` headless controller runs: speed and
+    overhead from every leg (GOING_TO_* entered until its zone is reached,
+    stuck recoveries included), dwell time from the time spent at zones.
+    Returns (model, legs).
+    """
+    from headless_sim import run_headless
+
+    legs = []
+    agents = []
+
+    def observe(agent):
+        agents.append(agent)
+        leg = {}
+
+        def on_enter(state):
+            if state in RECOVERY_STATES:
+                return
+            if state in LEG_ARRIVALS:
+                if leg.get("state") != state:   # not a return from recovery
+                    leg.update(state=state, at=agent.robot.getTime(),
+                               position=agent.get_gps_position())
+                return
+            if LEG_ARRIVALS.get(leg.get("state")) == state:
+                (x0, y0), (x1, y1) = leg["position"], agent.get_gps_position()
+                legs.append((math.hypot(x1 - x0, y1 - y0), agent.robot.getTime() - leg["at"]))
+            leg.clear()
+
+        agent.fsm.on_enter = on_enter
+
+    for run in range(runs):
+        run_headless(duration=duration, seed=seed + run, observe=observe)
+
+    model = TravelTimeModel().fit(legs)
+    dwell = visits = 0
+    for agent in agents:
+        seconds = agent.fsm.dwell_snapshot()
+        entries = agent.fsm.entries_snapshot()
+        dwell += sum(seconds.get(state, 0.0) for state in DWELL_STATES)
+        visits += sum(entries.get(state, 0) for state in DWELL_STATES)
+    if visits:
+        model.dwell_time = dwell / visits
+    return model, legs
+
+
+# ============================================
+# POLICIES
+# ============================================
+
+class RandomRoutePolicy:
+    """Controller offline fallback: random.choice over each zone list"""
+    name = "random"
+
+    def choose_route(self, robot, sim):
+        rng = sim.rng
+        return rng.choice(sim.pickups), rng.choice(sim.shelves), rng.choice(sim.deliveries)
+
+
+class NearestPickupPolicy:
+    """Mirrors AIDecisionEngine.assign_task: nearest pickup, random delivery"""
+    name = "nearest"
+
+    def choose_route(self, robot, sim):
+        pickup = min(sim.pickups, key=lambda p: zone_distance(robot.position, p))
+        return pickup, sim.rng.choice(sim.shelves), sim.rng.choice(sim.deliveries)
+
+
+class ShortestRoutePolicy:
+    """Picks the pickup/shelf/delivery combination with the shortest total route"""
+    name = "shortest"
+
+    def choose_route(self, robot, sim):
+        best = None
+        best_cost = float('inf')
+        for pickup in sim.pickups:
+            to_pickup = zone_distance(robot.position, pickup)
+            for shelf in sim.shelves:
+                to_shelf = to_pickup + zone_distance(pickup, shelf)
+                for delivery in sim.deliveries:
+                    cost = to_shelf + zone_distance(shelf, delivery)
+                    if cost < best_cost:
+                        best_cost = cost
+                        best = (pickup, shelf, delivery)
+        return best
+
+
+class QLearningRoutePolicy:
+    """In-process port of the AI server's Q-learning allocator, learning as it goes"""
+    name = "qlearning"
+
+    def __init__(self, allocator=None):
+        self.allocator = allocator
+
+    def choose_route(self, robot, sim):
+        if self.allocator is None:
+            self.allocator = QAllocator(rng=sim.rng)
+        pickup = self.allocator.assign(None, sim.pickups)
+        shelf = self.allocator.assign(pickup['id'], sim.shelves)
+        delivery = self.allocator.assign(shelf['id'], sim.deliveries)
+        return pickup, shelf, delivery
+
+    def task_done(self, robot, sim, duration, success):
+        pickup, shelf, delivery = robot.route
+        self.allocator.complete_task(pickup['id'], shelf['id'], delivery['id'], duration, success)
+
+
+class ThresholdChargePolicy:
+    """Mirrors the controller: charge below CRITICAL_BATTERY, charge to full"""
+    name = "threshold"
+
+    def __init__(self, threshold=CRITICAL_BATTERY, target=100.0):
+        self.threshold = threshold
+        self.target = target
+
+    def needs_charge(self, robot, idle, charger_free):
+        return robot.battery < self.threshold
+
+
+class OpportunisticChargePolicy(ThresholdChargePolicy):
+    """
+    Also tops up below idle_threshold when idle with no pending orders or
+    when a charger is free (nobody charging, queued or on the way)
+    """
+    name = "opportunistic"
+
+    def __init__(self, threshold=CRITICAL_BATTERY, target=100.0, idle_threshold=60.0):
+        super().__init__(threshold, target)
+        self.idle_threshold = idle_threshold
+
+    def needs_charge(self, robot, idle, charger_free):
+        if idle or charger_free:
+            return robot.battery < self.idle_threshold
+        return robot.battery < self.threshold
+
+
+ROUTE_POLICIES = {
+    "random": RandomRoutePolicy,
+    "nearest": NearestPickupPolicy,
+    "shortest": ShortestRoutePolicy,
+    "qlearning": QLearningRoutePolicy,
+}
+
+CHARGE_POLICIES = {
+    "threshold": ThresholdChargePolicy,
+    "opportunistic": OpportunisticChargePolicy,
+}
+
+
+# ============================================
+# SIMULATION
+# ============================================
+
+class SimRobot:
+    """Minimal per-robot state for the event simulation"""
+
+    __slots__ = ("index", "position", "battery", "route", "leg", "order_time",
+                 "leg_start", "tasks_completed", "tasks_abandoned", "energy",
+                 "travel_time", "dwell_time", "charge_time", "queue_time", "charger",
+                 "task_energy", "task_start")
+
+    def __init__(self, index, position):
+        self.index = index
+        self.position = position
+        self.battery = 100.0
+        self.route = None
+        self.leg = None
+        self.order_time = 0.0
+        self.leg_start = 0.0
+        self.tasks_completed = 0
+        self.tasks_abandoned = 0
+        self.energy = 0.0
+        self.task_energy = 0.0
+        self.task_start = 0.0
+        self.travel_time = 0.0
+        self.dwell_time = 0.0
+        self.charge_time = 0.0
+        self.queue_time = 0.0
+        self.charger = None
+
+
+class FleetSimulator:
+    """Priority-queue driven simulation of arrival / leg-complete / charge-complete events"""
+
+    def __init__(self, num_robots=20, route_policy=None, charge_policy=None,
+                 travel_model=None, orders_per_hour=None, seed=42,
+                 pickups=PICKUP_ZONES, shelves=SHELF_ZONES,
+                 deliveries=DELIVERY_ZONES, chargers=CHARGING_STATIONS):
+        self.rng = random.Random(seed)
+        self.route_policy = route_policy or NearestPickupPolicy()
+        self.charge_policy = charge_policy or ThresholdChargePolicy()
+        # Learning policies are told how each task went
+        self._task_done = getattr(self.route_policy, "task_done", None)
+        self.travel = travel_model or TravelTimeModel()
+        # None = saturated backlog: an order is always waiting
+        self.orders_per_hour = orders_per_hour
+
+        self.pickups = pickups
+        self.shelves = shelves
+        self.deliveries = deliveries
+        self.chargers = chargers
+
+        self.charge_rate = BATTERY_CHARGE_RATE / (TIME_STEP / 1000.0)  # %/s
+        self.now = 0.0
+        self._events = []
+        self._seq = 0
+
+        self.pending_orders = []          # arrival times, FIFO
+        self.idle_robots = []
+        self.charger_busy = {c['id']: False for c in chargers}
+        self.charger_queue = {c['id']: [] for c in chargers}
+        # When each charger is through with the robots charging, queued at
+        # or on the way to it: the expected wait of the next one sent there
+        self.charger_free_at = {c['id']: 0.0 for c in chargers}
+
+        self.order_waits = []
+        self.charger_waits = []
+        self.charges = 0
+        self.charger_charges = {c['id']: 0 for c in chargers}
+        self.task_energies = []
+
+        start_zones = chargers + deliveries
+        self.robots = [SimRobot(i, self.rng.choice(start_zones)) for i in range(num_robots)]
+
+    # ==========================================
+    # EVENT QUEUE
+    # ==========================================
+
+    def _schedule(self, at, event_type, robot=None):
+        self._seq += 1
+        heapq.heappush(self._events, (at, self._seq, event_type, robot))
+
+    def run(self, duration):
+        """Simulate `duration` seconds and return the summary"""
+        if self.orders_per_hour:
+            self._schedule(self.rng.expovariate(self.orders_per_hour / 3600.0), ORDER_ARRIVAL)
+
+        for robot in self.robots:
+            self._dispatch(robot)
+
+        events = self._events
+        while events and events[0][0] <= duration:
+            self.now, _, event_type, robot = heapq.heappop(events)
+            if event_type == LEG_COMPLETE:
+                self._leg_complete(robot)
+            elif event_type == ORDER_ARRIVAL:
+                self._order_arrival()
+            else:
+                self._charge_complete(robot)
+
+        self.now = duration
+        return self.summary(duration)
+
+    # ==========================================
+    # EVENT HANDLERS
+    # ==========================================
+
+    def _order_arrival(self):
+        self.pending_orders.append(self.now)
+        self._schedule(self.now + self.rng.expovariate(self.orders_per_hour / 3600.0),
+                       ORDER_ARRIVAL)
+        if self.idle_robots:
+            self._dispatch(self.idle_robots.pop())
+
+    def _dispatch(self, robot):
+        """Give an idle robot its next job: charge, task, or wait for an order"""
+        has_order = self.orders_per_hour is None or bool(self.pending_orders)
+
+        charger_free = any(at <= self.now for at in self.charger_free_at.values())
+        if self.charge_policy.needs_charge(robot, not has_order, charger_free):
+            self._go_charge(robot)
+            return
+
+        if not has_order:
+            self.idle_robots.append(robot)
+            return
+
+        if self.orders_per_hour is None:
+            robot.order_time = self.now
+        else:
+            robot.order_time = self.pending_orders.pop(0)
+            self.order_waits.append(self.now - robot.order_time)
+
+        robot.route = self.route_policy.choose_route(robot, self)
+        robot.task_energy = 0.0
+        robot.task_start = self.now
+        self._start_leg(robot, LEG_PICKUP, robot.route[0])
+
+    def _start_leg(self, robot, leg, target):
+        loaded = leg in (LEG_SHELF, LEG_DELIVERY)
+        travel = self.travel.travel_time(zone_distance(robot.position, target))
+        dwell = self.travel.dwell_time if leg != LEG_CHARGER else 0.0
+        energy = self.travel.travel_energy(travel, loaded) + self.travel.dwell_energy(dwell)
+
+        robot.battery -= energy
+        robot.energy += energy
+        robot.task_energy += energy
+        robot.travel_time += travel
+        robot.dwell_time += dwell
+        robot.leg = leg
+        robot.position = target
+        self._schedule(self.now + travel + dwell, LEG_COMPLETE, robot)
+
+    def _leg_complete(self, robot):
+        leg = robot.leg
+
+        if leg == LEG_CHARGER:
+            self._arrive_at_charger(robot)
+            return
+
+        if leg == LEG_DELIVERY:
+            robot.tasks_completed += 1
+            self.task_energies.append(robot.task_energy)
+            if self._task_done:
+                self._task_done(robot, self, self.now - robot.task_start, True)
+            robot.route = None
+            self._dispatch(robot)
+            return
+
+        # Controller abandons the task mid-route when the battery is critical
+        if robot.battery < self.charge_policy.threshold:
+            robot.tasks_abandoned += 1
+            if self._task_done:
+                self._task_done(robot, self, self.now - robot.task_start, False)
+            robot.route = None
+            if self.orders_per_hour is not None:
+                self.pending_orders.insert(0, robot.order_time)
+            self._go_charge(robot)
+            return
+
+        self._start_leg(robot, leg + 1, robot.route[leg + 1])
+
+    def _charge_seconds(self, robot):
+        return max(self.charge_policy.target - robot.battery, 0.0) / self.charge_rate
+
+    def _go_charge(self, robot):
+        """Send the robot to the charger where it would start charging soonest"""
+        best_start = float('inf')
+        for charger in self.chargers:
+            arrival = self.now + self.travel.travel_time(zone_distance(robot.position, charger))
+            start = max(arrival, self.charger_free_at[charger['id']])
+            if start < best_start:
+                best_start = start
+                robot.charger = charger
+        self._start_leg(robot, LEG_CHARGER, robot.charger)
+        self.charger_free_at[robot.charger['id']] = best_start + self._charge_seconds(robot)
+
+    def _arrive_at_charger(self, robot):
+        cid = robot.charger['id']
+        if self.charger_busy[cid]:
+            self.charger_queue[cid].append((self.now, robot))
+            return
+        self._start_charging(robot, waited=0.0)
+
+    def _start_charging(self, robot, waited):
+        self.charger_busy[robot.charger['id']] = True
+        self.charger_waits.append(waited)
+        self.charges += 1
+        self.charger_charges[robot.charger['id']] += 1
+        seconds = self._charge_seconds(robot)
+        robot.queue_time += waited
+        robot.charge_time += seconds
+        self._schedule(self.now + seconds, CHARGE_COMPLETE, robot)
+
+    def _charge_complete(self, robot):
+        robot.battery = self.charge_policy.target
+        cid = robot.charger['id']
+        self.charger_busy[cid] = False
+        if self.charger_queue[cid]:
+            queued_at, waiting = self.charger_queue[cid].pop(0)
+            self._start_charging(waiting, waited=self.now - queued_at)
+        robot.charger = None
+        self._dispatch(robot)
+
+    # ==========================================
+    # RESULTS
+    # ==========================================
+
+    def summary(self, duration):
+        n = len(self.robots)
+        tasks = sum(r.tasks_completed for r in self.robots)
+        energy = sum(r.energy for r in self.robots)
+        travel = sum(r.travel_time for r in self.robots)
+        dwell = sum(r.dwell_time for r in self.robots)
+        charge = sum(r.charge_time for r in self.robots)
+        queue = sum(r.queue_time for r in self.robots)
+        hours = duration / 3600.0
+        return {
+            "robots": n,
+            "hours": hours,
+            "route_policy": self.route_policy.name,
+            "charge_policy": self.charge_policy.name,
+            "tasks_completed": tasks,
+            "tasks_abandoned": sum(r.tasks_abandoned for r in self.robots),
+            "tasks_per_hour": tasks / hours if hours else 0.0,
+            "tasks_per_robot_hour": tasks / (hours * n) if hours and n else 0.0,
+            "energy_per_task": energy / tasks if tasks else 0.0,
+            "utilization": min((travel + dwell) / (duration * n), 1.0) if n else 0.0,
+            "charge_share": min(charge / (duration * n), 1.0) if n else 0.0,
+            "queue_share": min(queue / (duration * n), 1.0) if n else 0.0,
+            "charges": self.charges,
+            "charges_per_charger": dict(self.charger_charges),
+            "mean_charger_wait": (sum(self.charger_waits) / len(self.charger_waits)
+                                  if self.charger_waits else 0.0),
+            "max_charger_wait": max(self.charger_waits, default=0.0),
+            "mean_order_wait": (sum(self.order_waits) / len(self.order_waits)
+                                if self.order_waits else 0.0),
+            "pending_orders": len(self.pending_orders),
+        }
+
+
+def print_summary(result, elapsed):
+    print(f"\n{'='*60}")
+    print(f"🏭 FLEET SIM - {result['robots']} robots, {result['hours']:.1f} h  "
+          f"[{result['route_policy']} / {result['charge_policy']}]")
+    print(f"{'='*60}")
+    print(f"   Tasks completed : {result['tasks_completed']}  "
+          f"({result['tasks_per_hour']:.0f}/h, {result['tasks_per_robot_hour']:.1f}/robot-h)")
+    print(f"   Tasks abandoned : {result['tasks_abandoned']}")
+    print(f"   Energy per task : {result['energy_per_task']:.3f}%")
+    print(f"   Utilization     : {result['utilization'] * 100:.1f}%  "
+          f"(charging {result['charge_share'] * 100:.1f}%)")
+    print(f"   Charges         : {result['charges']}  ("
+          + ", ".join(f"{cid} {count}" for cid, count in result['charges_per_charger'].items())
+          + ")")
+    print(f"   Charger queue   : {result['queue_share'] * 100:.1f}% of robot time  "
+          f"(mean wait {result['mean_charger_wait']:.1f}s, max {result['max_charger_wait']:.1f}s)")
+    if result['mean_order_wait']:
+        print(f"   Mean order wait : {result['mean_order_wait']:.1f}s  "
+              f"({result['pending_orders']} still pending)")
+    print(f"   Simulated in    : {elapsed:.2f}s wall clock")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete-event warehouse fleet simulator")
+    parser.add_argument("--robots", type=int, default=200)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--policy", nargs="+", default=["nearest"], choices=sorted(ROUTE_POLICIES))
+    parser.add_argument("--charge", nargs="+", default=["threshold"], choices=sorted(CHARGE_POLICIES))
+    parser.add_argument("--orders-per-hour", type=float, default=None,
+                        help="Poisson order arrival rate (default: saturated backlog)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fit", type=int, default=0, metavar="RUNS",
+                        help="fit travel times to RUNS headless controller runs "
+                             "(default: the controller's cruise speed)")
+    args = parser.parse_args()
+
+    travel_model = None
+    if args.fit:
+        travel_model, legs = fit_travel_model(args.fit, seed=args.seed)
+        if len(legs) < 2:
+            print(f"❌ Only {len(legs)} legs in {args.fit} headless run(s) - nothing to fit")
+            raise SystemExit(1)
+        print(f"📐 Travel model fitted to {len(legs)} legs: {travel_model.speed:.3f} m/s, "
+              f"{travel_model.overhead:.1f}s overhead, {travel_model.dwell_time:.2f}s dwell")
+
+    for route_name in args.policy:
+        for charge_name in args.charge:
+            sim = FleetSimulator(
+                num_robots=args.robots,
+                route_policy=ROUTE_POLICIES[route_name](),
+                charge_policy=CHARGE_POLICIES[charge_name](),
+                travel_model=travel_model,
+                orders_per_hour=args.orders_per_hour,
+                seed=args.seed,
+            )
+            started = time.perf_counter()
+            result = sim.run(args.hours * 3600.0)
+            print_summary(result, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
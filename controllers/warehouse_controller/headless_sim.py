@@ -0,0 +1,420 @@
+"""
+HEADLESS SIMULATOR - Runs the warehouse controller without Webots
+Kinematic differential-drive world with stand-ins for the Webots
+Robot, Motor, GPS, Compass and DistanceSensor devices.
+
+The real controller (robot_agent.RobotAgent) drives these devices, so
+parameter sweeps and benchmarks exercise the same code as Webots, and
+run_fleet steps many agents in one shared world and one process.
+Tunables are passed through customData (see RobotAgent.config).
+
+Usage:
+    python headless_sim.py --duration 600 --set CRUISE_SPEED=3.5 GOAL_TOLERANCE=0.4
+    python headless_sim.py --robots 5 --duration 600
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import random
+import sys
+
+from warehouse_layout import load_layout, LAYOUT_PATH
+
+# Pioneer 3-DX geometry
+WHEEL_RADIUS = 0.0975
+WHEEL_BASE = 0.33
+ROBOT_RADIUS = 0.23
+MAX_WHEEL_SPEED = 5.24
+
+# Sonar layout (degrees, positive = left of forward) and range
+SONAR_ANGLES = [90, 50, 30, 10, -10, -30, -50, -90,
+                -90, -130, -150, -170, 170, 150, 130, 90]
+SONAR_RANGE = 5.0
+SONAR_MAX_VALUE = 1024.0
+
+# Arena: 10 x 10 m floor surrounded by walls
+ARENA_HALF_SIZE = 5.0
+
+# customData for headless runs: no backend, no metrics socket, no log files
+HEADLESS_DEFAULTS = {"OFFLINE": True, "METRICS_PORT": 0, "LOG_DIR": ""}
+
+
+# ============================================
+# SIMULATED DEVICES
+# ============================================
+
+class SimMotor:
+    def __init__(self):
+        self.velocity = 0.0
+
+    def setPosition(self, position):
+        pass
+
+    def setVelocity(self, velocity):
+        self.velocity = max(min(velocity, MAX_WHEEL_SPEED), -MAX_WHEEL_SPEED)
+
+    def getVelocity(self):
+        return self.velocity
+
+
+class SimGPS:
+    """
+    Exact by default; noise (m) per reading, an offset drifting by drift
+    (m/sqrt(s)) and outages [(start, end)] in seconds reading NaN, like a
+    Webots GPS without signal. Readings refresh at the enable() period.
+    """
+
+    def __init__(self, body, noise=0.0, drift=0.0, rng=None, outages=()):
+        self.body = body
+        self.noise = noise
+        self.drift = drift
+        self.rng = rng or random.Random(0)
+        self.outages = [tuple(o) for o in outages]
+        self.period = 0.0
+        self.time = 0.0
+        self.sampled = 0.0
+        self.bias = [0.0, 0.0]
+        self.reading = [body.x, 0.0, body.z]
+
+    def enable(self, period):
+        self.period = period / 1000.0
+
+    def advance(self, dt):
+        self.time += dt
+        if self.drift:
+            step = self.drift * math.sqrt(dt)
+            self.bias = [b + self.rng.gauss(0.0, step) for b in self.bias]
+        if any(start <= self.time < end for start, end in self.outages):
+            self.reading = [float('nan')] * 3
+            return
+        if self.time - self.sampled < self.period - 1e-9:
+            return
+        self.sampled = self.time
+        error = [b + self.rng.gauss(0.0, self.noise) if self.noise else b for b in self.bias]
+        # Controller reads the ground plane from indices 0 and 2
+        self.reading = [self.body.x + error[0], 0.0, self.body.z + error[1]]
+
+    def getValues(self):
+        return list(self.reading)
+
+
+class SimCompass:
+    def __init__(self, body):
+        self.body = body
+
+    def enable(self, period):
+        pass
+
+    def getValues(self):
+        return [math.sin(self.body.heading), 0.0, math.cos(self.body.heading)]
+
+
+class SimDistanceSensor:
+    def __init__(self, body, angle):
+        self.body = body
+        self.angle = math.radians(angle)
+
+    def enable(self, period):
+        pass
+
+    def getValue(self):
+        distance = self.body.world.ray_distance(self.body, self.body.heading + self.angle)
+        if distance >= SONAR_RANGE:
+            return 0.0
+        return SONAR_MAX_VALUE * (1.0 - distance / SONAR_RANGE)
+
+
+# ============================================
+# WORLD
+# ============================================
+
+class SimBody:
+    """Ground-plane pose of one robot; heading 0 faces +z, like the compass"""
+
+    def __init__(self, world, x, z, heading):
+        self.world = world
+        self.x = x
+        self.z = z
+        self.heading = heading
+        self.left_motor = SimMotor()
+        self.right_motor = SimMotor()
+
+    def integrate(self, dt):
+        vl = self.left_motor.velocity * WHEEL_RADIUS
+        vr = self.right_motor.velocity * WHEEL_RADIUS
+        v = (vl + vr) / 2.0
+        omega = (vr - vl) / WHEEL_BASE
+
+        heading = self.heading + omega * dt
+        x = self.x + v * math.sin(heading) * dt
+        z = self.z + v * math.cos(heading) * dt
+        self.heading = math.atan2(math.sin(heading), math.cos(heading))
+
+        # Blocked by walls or other robots: rotate in place only
+        if not self.world.collides(self, x, z):
+            self.x = x
+            self.z = z
+
+
+class SimWorld:
+    """Walls plus circular obstacles (other robots, pillars)"""
+
+    def __init__(self, obstacles=None):
+        self.bodies = []
+        self.obstacles = list(obstacles or [])   # (x, z, radius)
+
+    def add_body(self, x, z, heading):
+        body = SimBody(self, x, z, heading)
+        self.bodies.append(body)
+        return body
+
+    def collides(self, body, x, z):
+        limit = ARENA_HALF_SIZE - ROBOT_RADIUS
+        if abs(x) > limit or abs(z) > limit:
+            return True
+        for other in self.bodies:
+            if other is not body and math.hypot(other.x - x, other.z - z) < 2 * ROBOT_RADIUS:
+                return True
+        for ox, oz, radius in self.obstacles:
+            if math.hypot(ox - x, oz - z) < radius + ROBOT_RADIUS:
+                return True
+        return False
+
+    def ray_distance(self, body, angle):
+        """Distance from the robot's hull to the nearest surface along angle"""
+        dx = math.sin(angle)
+        dz = math.cos(angle)
+        best = SONAR_RANGE + ROBOT_RADIUS
+
+        # Walls
+        if dx > 1e-9:
+            best = min(best, (ARENA_HALF_SIZE - body.x) / dx)
+        elif dx < -1e-9:
+            best = min(best, (-ARENA_HALF_SIZE - body.x) / dx)
+        if dz > 1e-9:
+            best = min(best, (ARENA_HALF_SIZE - body.z) / dz)
+        elif dz < -1e-9:
+            best = min(best, (-ARENA_HALF_SIZE - body.z) / dz)
+
+        # Circles
+        circles = [(o.x, o.z, ROBOT_RADIUS) for o in self.bodies if o is not body]
+        for cx, cz, radius in circles + self.obstacles:
+            ox = cx - body.x
+            oz = cz - body.z
+            along = ox * dx + oz * dz
+            if along <= 0.0:
+                continue
+            perp_sq = ox * ox + oz * oz - along * along
+            if perp_sq < radius * radius:
+                best = min(best, along - math.sqrt(radius * radius - perp_sq))
+
+        return max(best - ROBOT_RADIUS, 0.0)
+
+
+# ============================================
+# WEBOTS ROBOT STAND-IN
+# ============================================
+
+class SimRobot:
+    """Implements the part of controller.Robot the warehouse controller uses"""
+
+    def __init__(self, world, body, name="Robot 1", time_step=32,
+                 duration=600.0, custom_data=None, gps=None):
+        self.world = world
+        self.body = body
+        self.name = name
+        self.time_step = time_step
+        self.duration = duration
+        self.custom_data = json.dumps(custom_data or {})
+        self.time = 0.0
+
+        self.devices = {
+            'left wheel': body.left_motor,
+            'right wheel': body.right_motor,
+            'gps': gps or SimGPS(body),
+            'compass': SimCompass(body),
+        }
+        for i, angle in enumerate(SONAR_ANGLES):
+            self.devices[f'so{i}'] = SimDistanceSensor(body, angle)
+
+    def getBasicTimeStep(self):
+        return float(self.time_step)
+
+    def getName(self):
+        return self.name
+
+    def getCustomData(self):
+        return self.custom_data
+
+    def getTime(self):
+        return self.time
+
+    def getDevice(self, name):
+        return self.devices.get(name)
+
+    def step(self, time_step):
+        if self.time >= self.duration:
+            return -1
+        dt = time_step / 1000.0
+        self.body.integrate(dt)
+        if 'gps' in self.devices:
+            self.devices['gps'].advance(dt)
+        self.time += dt
+        return 0
+
+
+def run_controller(robot, quiet=True, observe=None):
+    """
+    Run a RobotAgent on a SimRobot (or any Robot stand-in) until its
+    duration elapses. observe(agent), if given, is called once the agent
+    is built, before it runs. Returns the agent.
+    """
+    from robot_agent import RobotAgent
+
+    with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+        agent = RobotAgent(robot)
+        if observe is not None:
+            observe(agent)
+        agent.run()
+    return agent
+
+
+def run_agents(robots, quiet=True):
+    """
+    Step one RobotAgent per robot in lockstep until every robot's duration
+    elapses. Returns the agents.
+    """
+    from robot_agent import RobotAgent
+
+    async def run_all(agents):
+        for agent in agents:
+            agent.start()
+        running = list(agents)
+        while running:
+            running = [agent for agent in running
+                       if agent.robot.step(agent.time_step) != -1]
+            for agent in running:
+                agent.step()
+            await asyncio.sleep(0)
+        await asyncio.gather(*(agent.shutdown() for agent in agents))
+
+    with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+        agents = [RobotAgent(robot) for robot in robots]
+        asyncio.run(run_all(agents))
+    return agents
+
+
+def agent_results(agent):
+    return {
+        "tasks_completed": agent.tasks_completed,
+        "task_failures": agent.task_failures,
+        "energy": agent.total_energy_consumed,
+        "distance": agent.total_distance_traveled,
+        "battery": agent.battery_level,
+        "sim_time": agent.robot.getTime(),
+        "time_step": agent.time_step,
+    }
+
+
+def run_headless(overrides=None, duration=600.0, seed=0, quiet=True,
+                 gps_noise=0.0, gps_drift=0.0, gps_outages=(), observe=None):
+    """
+    Run one robot for `duration` simulated seconds and return its results.
+    gps_noise / gps_drift / gps_outages degrade the GPS (see SimGPS);
+    observe is passed on to run_controller.
+    """
+    rng = random.Random(seed)
+    layout = load_layout((overrides or {}).get("LAYOUT", LAYOUT_PATH))
+    world = SimWorld(obstacles=[tuple(o) for o in layout.obstacles])
+    body = world.add_body(rng.uniform(-2.0, 2.0), rng.uniform(-2.0, 2.0),
+                          rng.uniform(-math.pi, math.pi))
+
+    custom = dict(HEADLESS_DEFAULTS, SEED=seed)
+    custom.update(overrides or {})
+    gps = SimGPS(body, gps_noise, gps_drift, random.Random(seed + 1), gps_outages)
+    robot = SimRobot(world, body, duration=duration, custom_data=custom, gps=gps)
+
+    return agent_results(run_controller(robot, quiet=quiet, observe=observe))
+
+
+def run_fleet(count, overrides=None, duration=600.0, seed=0, quiet=True):
+    """
+    Run `count` robots in one world and one process. Returns per-robot
+    results plus fleet totals.
+    """
+    rng = random.Random(seed)
+    layout = load_layout((overrides or {}).get("LAYOUT", LAYOUT_PATH))
+    world = SimWorld(obstacles=[tuple(o) for o in layout.obstacles])
+
+    robots = []
+    for i in range(count):
+        while True:
+            x, z = rng.uniform(-3.0, 3.0), rng.uniform(-3.0, 3.0)
+            if not world.collides(None, x, z) and all(
+                    math.hypot(b.x - x, b.z - z) > 4 * ROBOT_RADIUS for b in world.bodies):
+                break
+        body = world.add_body(x, z, rng.uniform(-math.pi, math.pi))
+        custom = dict(HEADLESS_DEFAULTS, SEED=seed + i)
+        custom.update(overrides or {})
+        robots.append(SimRobot(world, body, name=f"Robot {i + 1}", duration=duration,
+                               custom_data=custom))
+
+    robots_results = {agent.robot_name: agent_results(agent)
+                      for agent in run_agents(robots, quiet=quiet)}
+    return {
+        "robots": robots_results,
+        "tasks_completed": sum(r["tasks_completed"] for r in robots_results.values()),
+        "task_failures": sum(r["task_failures"] for r in robots_results.values()),
+        "energy": sum(r["energy"] for r in robots_results.values()),
+    }
+
+
+def parse_value(text):
+    """A --set value: JSON when it parses (numbers, true, lists), else the raw string"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs or []:
+        key, value = pair.split("=", 1)
+        overrides[key] = parse_value(value)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the warehouse controller headless")
+    parser.add_argument("--duration", type=float, default=600.0, help="simulated seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", nargs="*", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--gps-noise", type=float, default=0.0, help="GPS noise per reading (m)")
+    parser.add_argument("--gps-drift", type=float, default=0.0, help="GPS offset drift (m/sqrt(s))")
+    parser.add_argument("--gps-outage", nargs="*", default=[], metavar="START:END",
+                        help="seconds without GPS signal")
+    parser.add_argument("--robots", type=int, default=1,
+                        help="robots sharing one world (exact GPS)")
+    parser.add_argument("--verbose", action="store_true", help="show controller output")
+    args = parser.parse_args()
+
+    if args.robots > 1:
+        result = run_fleet(args.robots, parse_overrides(args.set), args.duration, args.seed,
+                           quiet=not args.verbose)
+        print(json.dumps(result, indent=2))
+        return
+
+    result = run_headless(parse_overrides(args.set), args.duration, args.seed,
+                          quiet=not args.verbose, gps_noise=args.gps_noise,
+                          gps_drift=args.gps_drift,
+                          gps_outages=[tuple(map(float, o.split(":"))) for o in args.gps_outage])
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+METRICS EXPORTER - Prometheus-style scrape endpoint per robot controller
+Counters and gauges rendered in the text exposition format on
+http://localhost:<port>/metrics from a background thread.
+
+The control loop is the only writer. Updates are plain attribute or
+dict writes (atomic under the GIL) and the scrape thread only reads
+snapshots, so the step loop never blocks on a lock or on a scraper.
+Values the controller already tracks can be exported through a
+callback and cost nothing until scraped.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Ports tried in order when several controllers share a machine
+DEFAULT_PORT_RANGE = 32
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """Counter or gauge with an optional single label dimension"""
+
+    def __init__(self, name, help_text, kind="counter", label=None, func=None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label = label
+        self.func = func        # callback read at scrape time
+        self.values = {}        # label value (None if unlabelled) -> number
+        if label is None:
+            self.values[None] = 0.0   # unlabelled series are exported from the start
+
+    def inc(self, amount=1.0, label_value=None):
+        self.values[label_value] = self.values.get(label_value, 0.0) + amount
+
+    def set(self, value, label_value=None):
+        self.values[label_value] = value
+
+    def samples(self):
+        if self.func is not None:
+            return [(None, self.func())]
+        return list(self.values.items())
+
+
+class MetricsRegistry:
+    """Holds metrics for one robot and renders the exposition text"""
+
+    def __init__(self, robot_id, states):
+        self.robot_id = robot_id
+        self.metrics = []
+        # Anything with entries_snapshot() and dwell_snapshot(), e.g. the
+        # controller's StateMachine
+        self.states = states
+
+    def counter(self, name, help_text, label=None, func=None):
+        metric = Metric(name, help_text, "counter", label, func)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, label=None, func=None):
+        metric = Metric(name, help_text, "gauge", label, func)
+        self.metrics.append(metric)
+        return metric
+
+    def _line(self, name, label, label_value, value):
+        labels = f'robot="{_escape(self.robot_id)}"'
+        if label and label_value is not None:
+            labels += f',{label}="{_escape(label_value)}"'
+        return f"{name}{{{labels}}} {float(value)}"
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for label_value, value in metric.samples():
+                lines.append(self._line(metric.name, metric.label, label_value, value))
+
+        lines.append("# HELP warehouse_state_dwell_seconds_total Time spent in each task state")
+        lines.append("# TYPE warehouse_state_dwell_seconds_total counter")
+        for state, seconds in sorted(self.states.dwell_snapshot().items()):
+            lines.append(self._line("warehouse_state_dwell_seconds_total", "state", state, seconds))
+        lines.append("# HELP warehouse_state_entries_total Transitions into each task state")
+        lines.append("# TYPE warehouse_state_entries_total counter")
+        for state, count in sorted(self.states.entries_snapshot().items()):
+            lines.append(self._line("warehouse_state_entries_total", "state", state, count))
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass   # keep scrapes out of the Webots console
+
+
+def start_metrics_server(registry, port, host="127.0.0.1", port_range=DEFAULT_PORT_RANGE):
+    """
+    Serve registry on the first free port in [port, port + port_range).
+    Returns the running server (bound port in server.server_address[1];
+    stop it with server.shutdown() and server.server_close()), or None if
+    no port was free.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    for candidate in range(port, port + port_range):
+        try:
+            server = ThreadingHTTPServer((host, candidate), handler)
+        except OSError:
+            continue
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        return server
+    return None
@@ -0,0 +1,102 @@
+"""
+MOTION PROFILE - Trajectory-aware speed planning
+Continuous trapezoidal / S-curve velocity profiles for the differential drive
+Replaces heading-error speed buckets and the hard 1 m linear slowdown
+
+All speeds are wheel speeds (rad/s) like the rest of the controller,
+distances are metres on the X/Z ground plane.
+"""
+
+import math
+
+# Pioneer 3-DX wheel radius (m) - converts wheel speed to ground speed
+WHEEL_RADIUS = 0.0975
+
+# Wheel acceleration limits (rad/s^2) and jerk limit (rad/s^3, None = trapezoidal)
+MAX_WHEEL_ACCEL = 6.0
+MAX_WHEEL_DECEL = 4.0
+MAX_WHEEL_JERK = 40.0
+
+# Speed kept when crossing a zone edge so the robot rolls in instead of crawling
+APPROACH_SPEED = 0.6
+
+# Lowest share of cruise speed kept while turning on the spot
+MIN_TURN_SCALE = 0.35
+
+
+class MotionProfile:
+    """Plans forward speed along a path and rate-limits wheel commands"""
+
+    def __init__(self, cruise_speed, max_speed, dt,
+                 max_accel=MAX_WHEEL_ACCEL, max_decel=MAX_WHEEL_DECEL,
+                 max_jerk=MAX_WHEEL_JERK, wheel_radius=WHEEL_RADIUS):
+        self.cruise_speed = cruise_speed
+        self.max_speed = max_speed
+        self.dt = dt
+        self.max_accel = max_accel
+        self.max_decel = max_decel
+        self.max_jerk = max_jerk
+        self.wheel_radius = wheel_radius
+
+        # Last commanded wheel speeds and accelerations (for slew / jerk limits)
+        self.left = 0.0
+        self.right = 0.0
+        self.left_accel = 0.0
+        self.right_accel = 0.0
+
+    # ==========================================
+    # SPEED PLANNING
+    # ==========================================
+
+    def stopping_speed(self, distance, end_speed=0.0):
+        """
+        Highest wheel speed from which we can still slow to end_speed
+        within distance metres: v = sqrt(v_end^2 + 2*a*d)
+        """
+        wheel_distance = max(distance, 0.0) / self.wheel_radius
+        return math.sqrt(end_speed * end_speed + 2.0 * self.max_decel * wheel_distance)
+
+    def heading_scale(self, heading_error):
+        """Continuous slowdown while the robot is still turning towards the goal"""
+        return max(math.cos(min(abs(heading_error), math.pi / 2)), MIN_TURN_SCALE)
+
+    def goal_speed(self, distance, heading_error, end_speed=APPROACH_SPEED):
+        """Forward speed towards a single goal `distance` metres away"""
+        speed = min(self.cruise_speed, self.stopping_speed(distance, end_speed))
+        return speed * self.heading_scale(heading_error)
+
+    # ==========================================
+    # WHEEL COMMAND LIMITING
+    # ==========================================
+
+    def _slew(self, current, accel, target):
+        """Move one wheel towards target under accel (and optional jerk) limits"""
+        dv = target - current
+        speeding_up = abs(target) > abs(current) and target * current >= 0.0
+        limit = self.max_accel if speeding_up else self.max_decel
+
+        wanted = max(min(dv / self.dt, limit), -limit)
+        if self.max_jerk is not None:
+            step = self.max_jerk * self.dt
+            wanted = max(min(wanted, accel + step), accel - step)
+
+        new_speed = current + wanted * self.dt
+        # Don't overshoot the target (S-curve tail)
+        if (dv > 0.0 and new_speed > target) or (dv < 0.0 and new_speed < target):
+            return target, 0.0
+        return new_speed, wanted
+
+    def limit(self, left_target, right_target):
+        """Rate-limit a wheel speed command; returns the speeds to apply"""
+        left_target = max(min(left_target, self.max_speed), -self.max_speed)
+        right_target = max(min(right_target, self.max_speed), -self.max_speed)
+        self.left, self.left_accel = self._slew(self.left, self.left_accel, left_target)
+        self.right, self.right_accel = self._slew(self.right, self.right_accel, right_target)
+        return self.left, self.right
+
+    def reset(self, left=0.0, right=0.0):
+        """Sync with speeds set outside the profile (hard stops, recovery)"""
+        self.left = left
+        self.right = right
+        self.left_accel = 0.0
+        self.right_accel = 0.0
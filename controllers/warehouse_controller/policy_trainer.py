@@ -0,0 +1,245 @@
+"""
+POLICY TRAINER - Offline Q-table training from historical task records
+Loads every task record in warehouse_data/metrics into arrays (route,
+completion time, energy, success) and fits the allocator's Q-table with
+batched, vectorized updates (QAllocator.learn_indexed), repeated
+over epochs (whole record set, or shuffled minibatches) until the
+values stop moving. The result is written as
+a QAllocator snapshot that controllers running {"ALLOCATOR": "local"}
+load at startup, so a restarted fleet does not relearn from scratch.
+
+Usage:
+    python policy_trainer.py                          # train and export
+    python policy_trainer.py --epochs 500 --energy-weight 2.0
+    python policy_trainer.py --dry-run --json
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from q_allocator import QAllocator, POLICY_PATH
+from run_analytics import METRICS_DIR, load_task_metrics
+from warehouse_zones import PICKUP_ZONES, SHELF_ZONES, DELIVERY_ZONES
+
+EPOCHS = 200
+
+# None updates on every record at once: each route moves toward its mean
+# target, so epochs converge; minibatches add sampling noise
+BATCH_SIZE = None
+
+# Training stops once no Q-value moved more than this in an epoch
+TOLERANCE = 1e-3
+
+
+# ============================================
+# TASK RECORDS
+# ============================================
+
+class TaskRecords:
+    """Column arrays over every task record of every robot"""
+
+    def __init__(self, task_metrics):
+        robots, pickups, shelves, deliveries = [], [], [], []
+        durations, energies, successes = [], [], []
+        for robot_id, rows in task_metrics.items():
+            previous_number = 0
+            previous_energy = 0.0
+            for row in rows:
+                number = row.get("task_number") or 0
+                if number <= previous_number:   # task numbers restart with every run
+                    previous_energy = 0.0
+                energy = row.get("energy_used")
+                energy = np.nan if energy is None else float(energy)
+                # Older files store energy_used as the run total so far;
+                # records carrying total_energy have the per-task value
+                if "total_energy" not in row and np.isfinite(energy):
+                    energy, previous_energy = energy - previous_energy, energy
+                previous_number = number
+
+                robots.append(robot_id)
+                pickups.append(row.get("pickup"))
+                shelves.append(row.get("shelf"))
+                deliveries.append(row.get("delivery"))
+                duration = row.get("completion_time", row.get("duration"))
+                durations.append(np.nan if duration is None else float(duration))
+                energies.append(energy)
+                successes.append(bool(row.get("success", True)))
+
+        self.robot = np.array(robots, dtype=object)
+        self.pickup = np.array(pickups, dtype=object)
+        self.shelf = np.array(shelves, dtype=object)
+        self.delivery = np.array(deliveries, dtype=object)
+        self.duration = np.array(durations, dtype=float)
+        self.energy = np.array(energies, dtype=float)
+        self.success = np.array(successes, dtype=bool)
+
+    def __len__(self):
+        return len(self.duration)
+
+    def usable(self):
+        """Records with a full pickup -> shelf -> delivery route and a duration"""
+        route = ((self.pickup != None) & (self.shelf != None)   # noqa: E711 (object arrays)
+                 & (self.delivery != None))
+        return route & np.isfinite(self.duration)
+
+
+def load_task_records(metrics_dir=METRICS_DIR):
+    return TaskRecords(load_task_metrics(metrics_dir))
+
+
+# ============================================
+# TRAINING
+# ============================================
+
+def train(records, epochs=EPOCHS, batch_size=BATCH_SIZE, energy_weight=0.0,
+          tolerance=TOLERANCE, seed=0, allocator=None):
+    """
+    Fit a QAllocator on the usable records. energy_weight subtracts that
+    many reward points per % of battery a task used. Visit/time/success
+    counters reflect a single pass over the data, not the epoch count.
+    Returns (allocator, per-epoch max |dQ|).
+    """
+    if epochs < 1:
+        raise ValueError(f"epochs must be at least 1, got {epochs}")
+    allocator = allocator or QAllocator(
+        [z['id'] for z in PICKUP_ZONES + SHELF_ZONES + DELIVERY_ZONES])
+    mask = records.usable()
+    n = int(mask.sum())
+    if not n:
+        return allocator, []
+
+    p = allocator.zone_indices(list(records.pickup[mask]))
+    s = allocator.zone_indices(list(records.shelf[mask]))
+    d = allocator.zone_indices(list(records.delivery[mask]))
+    duration = records.duration[mask]
+    success = records.success[mask]
+    extra = None
+    if energy_weight:
+        extra = -energy_weight * np.nan_to_num(records.energy[mask])
+
+    batch_size = batch_size or n
+    rng = np.random.default_rng(seed)
+    history = []
+    stats = None
+    for epoch in range(epochs):
+        before = allocator.q.copy()
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            idx = order[start:start + batch_size]
+            allocator.learn_indexed(p[idx], s[idx], d[idx], duration[idx], success[idx],
+                                    None if extra is None else extra[idx])
+        if stats is None:
+            stats = (allocator.visits.copy(), allocator.total_time.copy(),
+                     allocator.successes.copy(), allocator.failures.copy())
+        change = float(np.abs(allocator.q - before).max())
+        history.append(change)
+        if change < tolerance:
+            break
+
+    allocator.visits, allocator.total_time, allocator.successes, allocator.failures = stats
+    return allocator, history
+
+
+def greedy_routes(allocator, pickups=PICKUP_ZONES, shelves=SHELF_ZONES, deliveries=DELIVERY_ZONES):
+    """Best shelf per pickup and best delivery per shelf with exploration off"""
+    epsilon = allocator.epsilon
+    allocator.epsilon = 0.0
+    try:
+        return {
+            "shelf_after": {p['id']: allocator.select(p['id'], shelves)['id'] for p in pickups},
+            "delivery_after": {s['id']: allocator.select(s['id'], deliveries)['id'] for s in shelves},
+        }
+    finally:
+        allocator.epsilon = epsilon
+
+
+# ============================================
+# REPORT
+# ============================================
+
+def build_report(records, allocator, history, path):
+    mask = records.usable()
+    known = {z['id'] for z in PICKUP_ZONES + SHELF_ZONES + DELIVERY_ZONES}
+    route_ids = np.concatenate([records.pickup[mask], records.shelf[mask], records.delivery[mask]])
+    return {
+        "records": len(records),
+        "usable_records": int(mask.sum()),
+        "robots": sorted(set(records.robot)),
+        "unknown_zones": sorted({z for z in route_ids if z not in known}),
+        "mean_duration_s": round(float(np.nanmean(records.duration[mask])), 2) if mask.any() else None,
+        "mean_energy": round(float(np.nanmean(records.energy[mask])), 3)
+        if mask.any() and np.isfinite(records.energy[mask]).any() else None,
+        "epochs": len(history),
+        "converged": bool(history) and history[-1] < TOLERANCE,
+        "final_max_change": history[-1] if history else None,
+        "metrics": allocator.efficiency_metrics(),
+        "greedy": greedy_routes(allocator),
+        "routes": allocator.routes(),
+        "policy": path,
+    }
+
+
+def print_report(report):
+    print(f"\n{'='*70}")
+    print(f"🧠 POLICY TRAINER - {report['usable_records']}/{report['records']} task records, "
+          f"{len(report['robots'])} robots")
+    print(f"{'='*70}")
+    if not report["usable_records"]:
+        print("   No task record has a full pickup -> shelf -> delivery route")
+        print(f"{'='*70}\n")
+        return
+    print(f"   Epochs: {report['epochs']} ({'converged' if report['converged'] else 'not converged'}, "
+          f"last max |dQ| {report['final_max_change']:.4f})")
+    print(f"   Mean task: {report['mean_duration_s']}s"
+          + (f", {report['mean_energy']}% energy" if report['mean_energy'] is not None else ""))
+    if report["unknown_zones"]:
+        print(f"   ⚠️  Zones not in the current layout: {', '.join(report['unknown_zones'])}")
+    print(f"\n   {'Route':<34} {'Q':>8} {'Visits':>7} {'Avg s':>7}")
+    routes = sorted(report["routes"].items(), key=lambda item: -item[1]["q_value"])
+    for key, route in routes[:15]:
+        print(f"   {key:<34} {route['q_value']:>8.1f} {route['visits']:>7} {route['avg_time']:>7.1f}")
+    print(f"\n   Greedy: " + ", ".join(f"{p}->{s}" for p, s in report["greedy"]["shelf_after"].items()))
+    print(f"           " + ", ".join(f"{s}->{d}" for s, d in report["greedy"]["delivery_after"].items()))
+    if report["policy"]:
+        print(f"\n💾 Policy: {report['policy']}")
+    print(f"{'='*70}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the zone allocator offline from task records")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR)
+    parser.add_argument("--output", default=POLICY_PATH)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="records per update (default: all)")
+    parser.add_argument("--energy-weight", type=float, default=0.0,
+                        help="reward points lost per %% battery a task used")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="train without writing the policy")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if args.epochs < 1:
+        parser.error("--epochs must be at least 1")
+
+    records = load_task_records(args.metrics_dir)
+    allocator, history = train(records, args.epochs, args.batch_size,
+                               args.energy_weight, seed=args.seed)
+
+    path = None
+    if history and not args.dry_run:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        allocator.save(args.output)
+        path = args.output
+
+    report = build_report(records, allocator, history, path)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+POSE ESTIMATOR - Filtered ground-plane position from GPS, compass and wheels
+Kalman filter over (position, GPS offset) on each axis: wheel odometry along
+the compass heading predicts the motion, GPS corrects it, and whatever GPS
+keeps disagreeing by while the two agree on the motion is learned as offset
+drift on top of the layout's gps_offset.
+
+Innovations are sorted three ways:
+  - normal (below CONSISTENT_SIGMAS)   position and offset are corrected
+  - large  (below GATE_SIGMAS)         wheels slipped or the robot is pushing
+                                       against something: position only, so
+                                       slip is not learned as GPS drift
+  - beyond the gate                    GPS glitch, ignored; MAX_REJECTS in a
+                                       row means the pose is lost and it is
+                                       re-anchored on GPS
+
+Odometry and GPS noise are the same on both axes, so the axes share one
+2x2 covariance and a step is a few dozen float operations.
+
+Without GPS readings (no device, NaN, a slower GPS_PERIOD or an outage)
+predict() keeps dead reckoning on its own, the position uncertainty
+growing with the distance driven; heading comes from the compass, or is
+integrated from the wheel speeds when there is none, and then pulled
+towards the GPS track over every straight HEADING_BASELINE of driving.
+
+Usage:
+    pose = PoseEstimator(WHEEL_RADIUS, WHEEL_BASE)
+    pose.predict(left_speed, right_speed, heading, dt)    # every step, heading None without compass
+    pose.correct(gps_x, gps_z)                             # per GPS reading, layout offset applied
+    x, z = pose.position
+"""
+
+import math
+
+# GPS noise per reading (m, 1 sigma) and random walk of its offset (m per sqrt(s))
+GPS_NOISE = 0.01
+GPS_DRIFT = 0.002
+
+# Odometry error as a share of the distance travelled, plus a small floor (m per sqrt(s))
+ODOMETRY_NOISE = 0.05
+POSITION_NOISE = 0.005
+
+# Prior uncertainty of the layout's gps_offset (m)
+OFFSET_PRIOR = 0.05
+
+# Without a compass: GPS track length (m) and largest wheel-integrated turn
+# (rad) over it that still gives a heading fix, and how much of it is applied
+HEADING_BASELINE = 0.3
+HEADING_MAX_TURN = 0.15
+HEADING_GAIN = 0.5
+
+CONSISTENT_SIGMAS = 3.0
+GATE_SIGMAS = 4.0
+MAX_REJECTS = 5
+
+
+class PoseEstimator:
+    """Position and GPS offset per axis with a shared covariance [[pp, pb], [pb, bb]]"""
+
+    def __init__(self, wheel_radius, wheel_base, gps_noise=GPS_NOISE, drift=GPS_DRIFT,
+                 odometry_noise=ODOMETRY_NOISE):
+        self.wheel_radius = wheel_radius
+        self.wheel_base = wheel_base
+        self.gps_variance = max(gps_noise, 1e-4) ** 2
+        self.drift_variance = drift ** 2
+        self.odometry_noise = odometry_noise
+
+        self.initialized = False
+        self.x = self.z = 0.0
+        self.heading = 0.0
+        self.heading_from_wheels = False
+        self.track_start = None     # (gps x, gps z, heading) of the current straight
+        self.offset_x = self.offset_z = 0.0
+        self.pp = self.pb = 0.0
+        self.bb = OFFSET_PRIOR ** 2
+
+        self.corrections = 0
+        self.slips = 0
+        self.rejected = 0
+        self.reanchors = 0
+        self.reject_streak = 0
+
+        # Seconds of dead reckoning since the last GPS reading used, and
+        # how far off it was when that reading came (m)
+        self.since_fix = 0.0
+        self.last_innovation = 0.0
+
+        # Path length driven by odometry (m); unlike summing pose steps it
+        # does not pick up the jumps of GPS corrections
+        self.distance = 0.0
+
+    @property
+    def position(self):
+        return self.x, self.z
+
+    @property
+    def offset(self):
+        """GPS offset learned on top of the layout's (m)"""
+        return self.offset_x, self.offset_z
+
+    @property
+    def sigma(self):
+        """Position uncertainty (m, 1 sigma per axis)"""
+        return math.sqrt(self.pp)
+
+    def reset(self, x, z, variance=None):
+        """Anchor the position on an offset-corrected GPS reading (or a known pose)"""
+        self.x = x - self.offset_x
+        self.z = z - self.offset_z
+        self.pp = self.gps_variance if variance is None else variance
+        self.pb = 0.0
+        self.initialized = True
+        self.reject_streak = 0
+        self.since_fix = 0.0
+
+    def predict(self, left_speed, right_speed, heading, dt):
+        """
+        Advance by wheel speeds (rad/s) along the compass heading (0 = +z);
+        heading None integrates it from the wheels instead
+        """
+        self.heading_from_wheels = heading is None
+        if heading is None:
+            turn = (right_speed - left_speed) * self.wheel_radius / self.wheel_base * dt
+            heading = math.atan2(math.sin(self.heading + turn), math.cos(self.heading + turn))
+        self.heading = heading
+        distance = (left_speed + right_speed) * 0.5 * self.wheel_radius * dt
+        self.distance += abs(distance)
+        if not self.initialized:
+            return
+        self.since_fix += dt
+        self.x += distance * math.sin(heading)
+        self.z += distance * math.cos(heading)
+        self.pp += (self.odometry_noise * distance) ** 2 + POSITION_NOISE ** 2 * dt
+        self.bb += self.drift_variance * dt
+
+    def correct(self, gps_x, gps_z):
+        """Fuse one GPS reading. Returns "ok", "slip", "rejected" or "reanchored"."""
+        if self.heading_from_wheels:
+            self.follow_track(gps_x, gps_z)
+        if not self.initialized:
+            self.reset(gps_x, gps_z)
+            return "reanchored"
+
+        innovation_x = gps_x - self.x - self.offset_x
+        innovation_z = gps_z - self.z - self.offset_z
+        s = self.pp + 2.0 * self.pb + self.bb + self.gps_variance
+        squared = (innovation_x * innovation_x + innovation_z * innovation_z) / s
+        self.last_innovation = math.hypot(innovation_x, innovation_z)
+
+        if squared > GATE_SIGMAS ** 2:
+            self.rejected += 1
+            self.reject_streak += 1
+            if self.reject_streak < MAX_REJECTS:
+                return "rejected"
+            self.reanchors += 1
+            self.reset(gps_x, gps_z)
+            return "reanchored"
+        self.reject_streak = 0
+        self.since_fix = 0.0
+
+        gain_p = (self.pp + self.pb) / s
+        if squared > CONSISTENT_SIGMAS ** 2:
+            gain_b = 0.0
+            self.slips += 1
+            status = "slip"
+        else:
+            gain_b = (self.pb + self.bb) / s
+            self.corrections += 1
+            status = "ok"
+
+        self.x += gain_p * innovation_x
+        self.z += gain_p * innovation_z
+        self.offset_x += gain_b * innovation_x
+        self.offset_z += gain_b * innovation_z
+
+        pp, pb, bb = self.pp, self.pb, self.bb
+        self.pp = pp - gain_p * (pp + pb)
+        self.pb = pb - gain_p * (pb + bb)
+        self.bb = bb - gain_b * (pb + bb)
+        return status
+
+    def follow_track(self, gps_x, gps_z):
+        """Correct the wheel-integrated heading with the direction of a straight GPS track"""
+        if self.track_start is None:
+            self.track_start = (gps_x, gps_z, self.heading)
+            return
+        start_x, start_z, start_heading = self.track_start
+        dx, dz = gps_x - start_x, gps_z - start_z
+        if math.hypot(dx, dz) < HEADING_BASELINE:
+            return
+        turned = math.atan2(math.sin(self.heading - start_heading),
+                            math.cos(self.heading - start_heading))
+        if abs(turned) < HEADING_MAX_TURN:
+            # The track runs along the mean heading over the straight
+            error = math.atan2(dx, dz) - (start_heading + turned / 2.0)
+            error = math.atan2(math.sin(error), math.cos(error))
+            self.heading = math.atan2(math.sin(self.heading + HEADING_GAIN * error),
+                                      math.cos(self.heading + HEADING_GAIN * error))
+        self.track_start = (gps_x, gps_z, self.heading)
+
+    def stats(self):
+        return {
+            "sigma": round(self.sigma, 4),
+            "offset_x": round(self.offset_x, 4),
+            "offset_z": round(self.offset_z, 4),
+            "corrections": self.corrections,
+            "slips": self.slips,
+            "rejected": self.rejected,
+            "reanchors": self.reanchors,
+        }
@@ -0,0 +1,281 @@
+"""
+Q-LEARNING ALLOCATOR - In-process port of the AI server's zone allocator
+Same learning rule, rewards, congestion penalty and epsilon-greedy
+selection as QLearningEngine in backend/ai_server.js, without the HTTP
+round trip per decision.
+
+The Q-table is a dense NumPy matrix indexed by zone id (state = zone the
+robot is at or "start", action = next zone), with per-entry visit, time
+and success/failure counters alongside. It grows as new zones appear,
+learns from task records one at a time or in vectorized batches, and
+snapshots to / restores from a single .npz file.
+"""
+
+import json
+import os
+import random
+
+import numpy as np
+
+# Learning parameters (ai_server.js QLearningEngine)
+ALPHA = 0.15             # learning rate
+GAMMA = 0.9              # discount factor
+EPSILON = 0.15           # exploration rate
+INITIAL_Q = 50.0         # neutral value of an unseen route
+CONGESTION_PENALTY = 15.0  # score lost per robot already assigned to a zone
+
+# Rewards: success/failure base, +1 per second under 60 s, -0.5 per second over
+SUCCESS_REWARD = 100.0
+FAILURE_REWARD = -50.0
+TARGET_DURATION = 60.0
+SLOW_PENALTY = 0.5
+
+# Failure map: 20 x 20 cells over the -5..5 m floor
+FAILURE_GRID_SIZE = 20
+FAILURE_GRID_HALF_EXTENT = 5.0
+STUCK_SEVERITY = 5       # what the AI server's /api/robots/stuck handler registers
+
+START_STATE = "start"
+
+# Warm-start policy written by policy_trainer.py
+POLICY_PATH = os.path.join("warehouse_data", "policies", "q_policy.npz")
+
+
+def task_reward(duration, success):
+    """Reward for one completed (or failed) task; scalars or arrays"""
+    base = np.where(success, SUCCESS_REWARD, FAILURE_REWARD)
+    bonus = np.maximum(0.0, TARGET_DURATION - duration)
+    penalty = np.maximum(0.0, duration - TARGET_DURATION) * SLOW_PENALTY
+    return base + bonus - penalty
+
+
+class QAllocator:
+    """Epsilon-greedy zone allocator with a NumPy Q-table"""
+
+    def __init__(self, zone_ids=(), alpha=ALPHA, gamma=GAMMA, epsilon=EPSILON, rng=None):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.rng = rng or random   # module random by default: seeded runs stay reproducible
+
+        self.ids = []
+        self.index = {}
+        self.q = np.empty((0, 0))
+        self.visits = np.empty((0, 0), dtype=np.int64)
+        self.total_time = np.empty((0, 0))
+        self.successes = np.empty((0, 0), dtype=np.int64)
+        self.failures = np.empty((0, 0), dtype=np.int64)
+        self.congestion = np.empty(0)
+        self.failure_grid = np.zeros((FAILURE_GRID_SIZE, FAILURE_GRID_SIZE))
+        self._ensure([START_STATE] + list(zone_ids))
+
+    # ==========================================
+    # ZONE INDEX
+    # ==========================================
+
+    def _ensure(self, zone_ids):
+        """Add rows/columns for zone ids not seen before"""
+        new = [z for z in dict.fromkeys(zone_ids) if z not in self.index]
+        if not new:
+            return
+        for zone_id in new:
+            self.index[zone_id] = len(self.ids)
+            self.ids.append(zone_id)
+        grow = len(new)
+        self.q = np.pad(self.q, ((0, grow), (0, grow)), constant_values=INITIAL_Q)
+        self.visits = np.pad(self.visits, ((0, grow), (0, grow)))
+        self.total_time = np.pad(self.total_time, ((0, grow), (0, grow)))
+        self.successes = np.pad(self.successes, ((0, grow), (0, grow)))
+        self.failures = np.pad(self.failures, ((0, grow), (0, grow)))
+        self.congestion = np.pad(self.congestion, (0, grow))
+
+    def zone_indices(self, zone_ids):
+        """Row/column index of each zone id, adding unknown ones"""
+        self._ensure(zone_ids)
+        return np.array([self.index[z] for z in zone_ids], dtype=np.intp)
+
+    def q_value(self, state, action):
+        i = self.index.get(state)
+        j = self.index.get(action)
+        return INITIAL_Q if i is None or j is None else float(self.q[i, j])
+
+    # ==========================================
+    # SELECTION
+    # ==========================================
+
+    def select(self, state, options):
+        """selectBestAction: explore with probability epsilon, else best score"""
+        if self.rng.random() < self.epsilon:
+            return options[int(self.rng.random() * len(options))]
+
+        row = self.index[state] if state in self.index else None
+        best = None
+        best_score = -float('inf')
+        for option in options:
+            j = self.index.get(option['id'])
+            q = self.q[row, j] if row is not None and j is not None else INITIAL_Q
+            score = q - (self.congestion[j] if j is not None else 0.0) * CONGESTION_PENALTY
+            if score > best_score:
+                best_score = score
+                best = option
+        return best or options[0]
+
+    def assign(self, current_zone, options):
+        """/api/allocator/assign-optimal: select and count the robot against the zone"""
+        target = self.select(current_zone or START_STATE, options)
+        self.update_congestion(target['id'], 1)
+        return target
+
+    def update_congestion(self, zone_id, delta):
+        (j,) = self.zone_indices([zone_id])
+        self.congestion[j] = max(0.0, self.congestion[j] + delta)
+
+    # ==========================================
+    # LEARNING
+    # ==========================================
+
+    def update(self, state, action, reward, next_state=None, next_actions=()):
+        """Q(s,a) += alpha * (r + gamma * max Q(s',a') - Q(s,a))"""
+        i, j = self.zone_indices([state, action])
+        max_next = 0.0
+        if next_actions:
+            max_next = max(self.q_value(next_state, a) for a in next_actions)
+        self.q[i, j] += self.alpha * (reward + self.gamma * max_next - self.q[i, j])
+        self.visits[i, j] += 1
+        return float(self.q[i, j])
+
+    def learn_from_task(self, pickup, shelf, delivery, duration, success=True):
+        """learnFromTask: update pickup->shelf and shelf->delivery"""
+        reward = float(task_reward(duration, success))
+        self.update(pickup, shelf, reward, shelf, [delivery])
+        self.update(shelf, delivery, reward)
+        for state, action in ((pickup, shelf), (shelf, delivery)):
+            i, j = self.index[state], self.index[action]
+            self.total_time[i, j] += duration / 2
+            if success:
+                self.successes[i, j] += 1
+            else:
+                self.failures[i, j] += 1
+
+    def complete_task(self, pickup, shelf, delivery, duration, success=True):
+        """/api/tasks/complete: learn, then release the three zones"""
+        self.learn_from_task(pickup, shelf, delivery, duration, success)
+        for zone_id in (pickup, shelf, delivery):
+            self.update_congestion(zone_id, -1)
+
+    def learn_batch(self, pickups, shelves, deliveries, durations, successes=None,
+                    extra_reward=None):
+        """
+        Vectorized update from many task records at once. Targets use the
+        Q-table as it was before the batch; an entry hit k times moves
+        toward its mean target by 1 - (1 - alpha)^k, which is what k
+        sequential updates with that target would do. extra_reward is
+        added to each record's task reward (e.g. an energy penalty).
+        """
+        if not len(durations):
+            return
+        self.learn_indexed(self.zone_indices(list(pickups)), self.zone_indices(list(shelves)),
+                           self.zone_indices(list(deliveries)), durations, successes, extra_reward)
+
+    def learn_indexed(self, p, s, d, durations, successes=None, extra_reward=None):
+        """learn_batch on zone indices (see zone_indices), for repeated passes"""
+        durations = np.asarray(durations, dtype=float)
+        successes = (np.ones(durations.size, dtype=bool) if successes is None
+                     else np.asarray(successes, dtype=bool))
+        reward = task_reward(durations, successes)
+        if extra_reward is not None:
+            reward = reward + extra_reward
+
+        states = np.concatenate([p, s])
+        actions = np.concatenate([s, d])
+        targets = np.concatenate([reward + self.gamma * self.q[s, d], reward])
+
+        n = len(self.ids)
+        flat = states * n + actions
+        counts = np.bincount(flat, minlength=n * n).reshape(n, n)
+        sums = np.bincount(flat, weights=targets, minlength=n * n).reshape(n, n)
+        hit = counts > 0
+        mean_target = np.where(hit, sums / np.maximum(counts, 1), 0.0)
+        step = 1.0 - (1.0 - self.alpha) ** counts
+        self.q = np.where(hit, self.q + step * (mean_target - self.q), self.q)
+
+        self.visits += counts
+        halves = np.concatenate([durations, durations]) / 2
+        self.total_time += np.bincount(flat, weights=halves, minlength=n * n).reshape(n, n)
+        ok = np.concatenate([successes, successes])
+        self.successes += np.bincount(flat[ok], minlength=n * n).reshape(n, n)
+        self.failures += np.bincount(flat[~ok], minlength=n * n).reshape(n, n)
+
+    def register_failure(self, x, y, severity=3):
+        """Stuck event: severity at the cell, severity // 2 on its 3x3 neighbourhood"""
+        scale = FAILURE_GRID_SIZE / (2 * FAILURE_GRID_HALF_EXTENT)
+        gx = min(max(int(np.floor((x + FAILURE_GRID_HALF_EXTENT) * scale)), 0), FAILURE_GRID_SIZE - 1)
+        gy = min(max(int(np.floor((y + FAILURE_GRID_HALF_EXTENT) * scale)), 0), FAILURE_GRID_SIZE - 1)
+        self.failure_grid[gy, gx] += severity
+        self.failure_grid[max(gy - 1, 0):gy + 2, max(gx - 1, 0):gx + 2] += severity // 2
+
+    # ==========================================
+    # STATS AND PERSISTENCE
+    # ==========================================
+
+    def efficiency_metrics(self):
+        learned = self.visits > 0
+        routes = int(learned.sum())
+        visits = int(self.visits.sum())
+        return {
+            "total_routes_learned": routes,
+            "average_q_value": round(float(self.q[learned].mean()), 2) if routes else INITIAL_Q,
+            "total_experience": visits,
+            "success_rate": round(float(self.successes.sum()) / visits * 100, 1) if visits else 0.0,
+            "exploration_rate": self.epsilon,
+        }
+
+    def routes(self):
+        """Learned entries as {"from->to": {...}}, like the AI server's q_table"""
+        table = {}
+        for i, j in zip(*np.nonzero(self.visits)):
+            visits = int(self.visits[i, j])
+            table[f"{self.ids[i]}->{self.ids[j]}"] = {
+                "q_value": float(self.q[i, j]),
+                "visits": visits,
+                "avg_time": float(self.total_time[i, j]) / visits,
+                "success_count": int(self.successes[i, j]),
+                "failure_count": int(self.failures[i, j]),
+            }
+        return table
+
+    def save(self, path):
+        """Snapshot the table (not congestion, which is live state) to .npz"""
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f, ids=np.array(json.dumps(self.ids)), q=self.q, visits=self.visits,
+                total_time=self.total_time, successes=self.successes,
+                failures=self.failures, failure_grid=self.failure_grid,
+                params=np.array([self.alpha, self.gamma, self.epsilon]))
+
+    def restore(self, path):
+        """Load a snapshot, keeping zones known here that it doesn't have"""
+        with np.load(path) as data:
+            ids = json.loads(str(data["ids"]))
+            known = list(self.ids)
+            self.ids = []
+            self.index = {}
+            self.q = np.empty((0, 0))
+            self.visits = np.empty((0, 0), dtype=np.int64)
+            self.total_time = np.empty((0, 0))
+            self.successes = np.empty((0, 0), dtype=np.int64)
+            self.failures = np.empty((0, 0), dtype=np.int64)
+            self.congestion = np.empty(0)
+            self._ensure(ids)
+            self.q[:] = data["q"]
+            self.visits[:] = data["visits"]
+            self.total_time[:] = data["total_time"]
+            self.successes[:] = data["successes"]
+            self.failures[:] = data["failures"]
+            self.failure_grid = data["failure_grid"].copy()
+        self._ensure(known)
+        return self
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        return cls(**kwargs).restore(path)
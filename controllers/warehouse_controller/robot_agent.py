@@ -0,0 +1,1347 @@
+"""
+ROBOT AGENT - The warehouse robot controller as an object
+One RobotAgent drives one robot through whatever implements the part of
+the Webots Robot API the controller uses (getDevice, step, getTime,
+getName, getBasicTimeStep, getCustomData): the Webots robot itself, the
+headless simulator's SimRobot or a ReplayRobot. Randomness comes from
+the agent's own random.Random, so any number of agents can share a
+process without sharing state.
+
+The step loop is a coroutine. Backend and AI server calls go through
+the agent's BackendClient as tasks on the same event loop: a step
+starts a call and a later step picks up its reply (a task assignment
+waits in AWAITING_TASK), so the simulation never waits on the network.
+
+warehouse_controller.py is the Webots entry point; headless_sim.py,
+run_recorder.py and benchmark.py create agents directly.
+
+Usage:
+    agent = RobotAgent(robot)           # robot: Webots Robot or a stand-in
+    agent.run()                         # step until the simulation ends
+
+    agent.start()                       # or drive it step by step, inside
+    while robot.step(agent.time_step) != -1:   # a running event loop
+        agent.step()
+        await asyncio.sleep(0)          # lets backend calls progress
+    await agent.shutdown()
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+
+from warehouse_layout import load_layout, LAYOUT_PATH
+from motion_profile import MotionProfile, WHEEL_RADIUS
+from pose_estimator import PoseEstimator, GPS_NOISE, GPS_DRIFT
+from energy_model import EnergyModel
+from step_profiler import StepProfiler
+from metrics_exporter import MetricsRegistry, start_metrics_server
+from robot_logging import setup_robot_logging, LOG_DIR
+from run_recorder import RunRecorder
+from backend_client import BackendClient, HTTP_AVAILABLE
+from q_allocator import QAllocator, POLICY_PATH, STUCK_SEVERITY
+from route_planner import RoutePlanner, STOP_KINDS, PICKUP, SHELF, DELIVERY
+from fallback_allocator import FallbackAllocator, CircuitBreaker, TARGET_TYPES, COOLDOWN_SECONDS
+from telemetry_codec import TelemetryEncoder, CONTENT_TYPE, BATCH_SIZE, MAX_DELAY
+from state_machine import (StateMachine, TASK_STATES, DWELL, INITIALIZING,
+                           GOING_TO_PICKUP, AT_PICKUP, GOING_TO_SHELF, AT_SHELF,
+                           GOING_TO_DELIVERY, AT_DELIVERY, GOING_TO_CHARGE, CHARGING,
+                           AWAITING_TASK, RECOVERY_REVERSE, RECOVERY_TURN)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+BACKEND_URL = "http://localhost:3000"
+AI_SERVER_URL = "http://localhost:4000"
+
+ROBOT_ICONS = {
+    "Pioneer 3-DX": "🔴", "Pioneer 3-DX(1)": "🔵", "Pioneer 3-DX(2)": "🟢",
+    "Pioneer 3-DX(3)": "🟡", "Pioneer 3-DX(4)": "🟣",
+}
+
+MAX_SPEED = 5.24
+WHEEL_BASE = 0.33
+
+BATTERY_CHARGE_RATE = 0.3
+
+# Steps spent loading, storing and handing over at a stop (customData
+# PICKUP_DWELL, SHELF_DWELL, DELIVERY_DWELL)
+ZONE_DWELL = 40
+
+# Steps of the stuck recovery manoeuvre: backing off, then turning away
+RECOVERY_REVERSE_STEPS = 40
+RECOVERY_TURN_STEPS = 30
+
+GOING_TO = {PICKUP: GOING_TO_PICKUP, SHELF: GOING_TO_SHELF, DELIVERY: GOING_TO_DELIVERY}
+TRAVEL_STATES = frozenset(GOING_TO.values()) | {GOING_TO_CHARGE}
+
+# Zone each state approaches or serves
+STATE_GOALS = {
+    GOING_TO_PICKUP: "current_pickup", AT_PICKUP: "current_pickup",
+    GOING_TO_SHELF: "current_shelf", AT_SHELF: "current_shelf",
+    GOING_TO_DELIVERY: "current_delivery", AT_DELIVERY: "current_delivery",
+    GOING_TO_CHARGE: "current_charger", CHARGING: "current_charger",
+}
+
+
+class RobotAgent:
+    """Controller state and logic for one warehouse robot"""
+
+    __slots__ = (
+        # Devices and I/O
+        "robot", "backend", "rng", "overrides", "replaying", "backend_available",
+        "time_step", "robot_name", "icon", "log", "profiler",
+        "left_motor", "right_motor", "gps", "gps_enabled", "compass", "compass_enabled",
+        "distance_sensors",
+        # Layout and tunables
+        "layout", "pickup_zones", "shelf_zones", "delivery_zones", "gps_offset",
+        "kp_angular", "kd_angular", "goal_tolerance", "obstacle_threshold", "cruise_speed",
+        "critical_battery", "gps_period", "gps_timeout", "start_pose", "metrics_port",
+        "metrics_server",
+        "allocator_mode", "q_table", "q_policy", "batch_orders",
+        # Components
+        "motion_profile", "pose", "energy_model", "metrics", "recovery_metric",
+        "reassign_metric", "allocator", "route_planner", "fallback", "allocator_breaker",
+        # Run state
+        "simulation_run_id", "run_number", "fsm", "battery_level",
+        "tasks_completed", "task_failures", "total_distance_traveled",
+        "total_energy_consumed", "current_pickup", "current_shelf", "current_delivery",
+        "current_charger", "route_stops", "route_index", "current_order", "items_carried",
+        "pending_orders", "assignment", "telemetry_reply", "task_start_time",
+        "startup_delay", "startup_stagger",
+        "last_position", "previous_heading_error", "stuck_counter", "recovery_attempts",
+        "recovery_resume",
+        "gps_lost", "last_gps_fix", "pose_steps", "telemetry_last", "telemetry_encoder",
+        "telemetry_heartbeat", "telemetry_position_deadband", "telemetry_battery_deadband",
+    )
+
+    def __init__(self, robot, http=None, rng=None):
+        """
+        robot: Webots Robot or a stand-in. http: requests-like module or
+        session for the backend (default aiohttp, else requests, when
+        installed). rng: random.Random for every random choice (seeded
+        from customData SEED when given).
+        """
+        self.rng = rng or random.Random()
+        self.backend_available = http is not None or HTTP_AVAILABLE
+
+        self.time_step = int(robot.getBasicTimeStep())
+        self.robot_name = robot.getName()
+        self.icon = ROBOT_ICONS.get(self.robot_name, "🤖")
+
+        # Per-robot overrides as JSON in the Webots customData field,
+        # e.g. {"CRUISE_SPEED": 3.5, "OFFLINE": true, "SEED": 7}.
+        try:
+            self.overrides = json.loads(robot.getCustomData() or "{}")
+        except ValueError:
+            self.overrides = {}
+        config = self.config
+
+        if self.overrides.get("OFFLINE"):
+            self.backend_available = False
+
+        # Record/replay: {"RECORD": true} tapes sensor readings, backend replies and
+        # the seed to warehouse_data/recordings/*.wrun; run_recorder.py replays a
+        # tape through this controller without Webots
+        if config("RECORD", False):
+            self.overrides.setdefault("SEED", random.randrange(2 ** 32))
+            robot = RunRecorder(robot, self.overrides, backend=self.backend_available)
+        self.robot = robot
+
+        self.replaying = getattr(robot, "replaying", False)
+        self.backend = BackendClient(http, tape_exchange=getattr(robot, "exchange", None))
+
+        if self.replaying and not self.overrides.get("OFFLINE"):
+            self.backend_available = True   # replies come from the tape, http is never called
+
+        if "SEED" in self.overrides:
+            self.rng.seed(self.overrides["SEED"])
+
+        # Zones, obstacles, aisles and GPS offset from the validated layout file;
+        # {"LAYOUT": "other_layout.json"} selects another floor
+        self.layout = load_layout(config("LAYOUT", LAYOUT_PATH))
+        self.pickup_zones = self.layout.zones["pickup"]
+        self.shelf_zones = self.layout.zones["shelf"]
+        self.delivery_zones = self.layout.zones["delivery"]
+        self.gps_offset = self.layout.gps_offset
+
+        # Structured logs: JSON lines in warehouse_data/logs/<robot>.log at LOG_LEVEL,
+        # console at LOG_CONSOLE_LEVEL (DEBUG adds every state transition);
+        # {"LOG_DIR": ""} disables the file
+        self.log = setup_robot_logging(
+            self.robot_name, icon=self.icon,
+            level=config("LOG_LEVEL", "INFO"),
+            console_level=config("LOG_CONSOLE_LEVEL", "INFO"),
+            log_dir=config("LOG_DIR", LOG_DIR),
+        )
+        self.log.info("Network: Backend enabled" if self.backend_available else "Network: Offline mode",
+                      event="network", backend=self.backend_available)
+
+        # Control-loop latency histograms ({"PROFILE": true} in customData)
+        self.profiler = StepProfiler(self.robot_name, self.time_step,
+                                     enabled=config("PROFILE", False))
+
+        self._init_devices()
+        self._init_navigation()
+        self._init_state()
+        self._init_state_machine()
+        self._init_metrics()
+        self._init_allocation()
+
+        # The backend connection is made from start(), once the event loop runs,
+        # after this stagger so robots started together do not all call at once
+        self.startup_stagger = self.rng.uniform(0.05, 0.3)
+
+    def config(self, name, default):
+        return type(default)(self.overrides.get(name, default))
+
+    # ============================================
+    # ROBOT INITIALIZATION
+    # ============================================
+
+    def _init_devices(self):
+        robot = self.robot
+        config = self.config
+
+        # Motors
+        self.left_motor = robot.getDevice('left wheel')
+        self.right_motor = robot.getDevice('right wheel')
+        self.left_motor.setPosition(float('inf'))
+        self.right_motor.setPosition(float('inf'))
+
+        # GPS ({"GPS_PERIOD": 256} samples it slower; odometry fills the steps between)
+        self.gps_period = max(config("GPS_PERIOD", self.time_step) // self.time_step, 1) * self.time_step
+        self.gps = robot.getDevice('gps')
+        self.gps_enabled = bool(self.gps)
+        if self.gps:
+            self.gps.enable(self.gps_period)
+
+        # Compass
+        self.compass = robot.getDevice('compass')
+        self.compass_enabled = bool(self.compass)
+        if self.compass:
+            self.compass.enable(self.time_step)
+
+        # Distance sensors
+        self.distance_sensors = []
+        for i in range(16):
+            sensor = robot.getDevice(f'so{i}')
+            if sensor:
+                sensor.enable(self.time_step)
+                self.distance_sensors.append(sensor)
+
+        self.log.info(f"Sensors: {len(self.distance_sensors)} distance, "
+                      f"GPS={'✅' if self.gps_enabled else '❌'}, "
+                      f"Compass={'✅' if self.compass_enabled else '❌'}",
+                      event="sensors", distance_sensors=len(self.distance_sensors),
+                      gps=self.gps_enabled, compass=self.compass_enabled)
+
+    def _init_navigation(self):
+        config = self.config
+
+        # PID gains (reduced for smoother control)
+        self.kp_angular = config("KP_ANGULAR", 2.0)
+        self.kd_angular = config("KD_ANGULAR", 0.08)
+
+        self.goal_tolerance = config("GOAL_TOLERANCE", 0.5)  # 50cm tolerance (increased from 40cm)
+        self.obstacle_threshold = config("OBSTACLE_THRESHOLD", 860)  # raw sonar value, 860 = 0.8 m
+        self.cruise_speed = config("CRUISE_SPEED", 3.0)
+
+        # Trapezoidal/S-curve speed profile with wheel acceleration limits
+        self.motion_profile = MotionProfile(self.cruise_speed, MAX_SPEED, self.time_step / 1000.0)
+
+        # Filtered pose: wheel odometry along the compass heading corrected by GPS,
+        # learning GPS offset drift on top of the layout's gps_offset, and dead
+        # reckoning through GPS outages; {"POSE_FILTER": false} reads the GPS directly
+        self.pose = PoseEstimator(WHEEL_RADIUS, WHEEL_BASE,
+                                  gps_noise=config("GPS_NOISE", GPS_NOISE),
+                                  drift=config("GPS_DRIFT", GPS_DRIFT)) \
+            if config("POSE_FILTER", True) else None
+
+        # No GPS reading for this long (s) counts as an outage; a robot without any
+        # GPS fix by then starts dead reckoning from START_POSE [x, z]
+        self.gps_timeout = max(config("GPS_TIMEOUT", 1.0), 2.0 * self.gps_period / 1000.0)
+        self.start_pose = config("START_POSE", [0.0, 0.0])
+        self.gps_lost = False
+        self.last_gps_fix = None
+        self.pose_steps = 0
+
+    def _init_state(self):
+        self.simulation_run_id = None
+        self.run_number = 1
+
+        self.battery_level = 100.0
+        self.critical_battery = self.config("CRITICAL_BATTERY", 15.0)
+
+        self.tasks_completed = 0
+        self.task_failures = 0
+        self.total_distance_traveled = 0.0
+        self.total_energy_consumed = 0.0
+
+        # Battery drain from wheel speeds, acceleration and payload
+        self.energy_model = EnergyModel(self.time_step / 1000.0)
+
+        self.current_pickup = None
+        self.current_shelf = None
+        self.current_delivery = None
+        self.current_charger = None
+
+        # Current trip: [(kind, zone, order)] stops, order = (pickup, shelf, delivery)
+        self.route_stops = []
+        self.route_index = 0
+        self.current_order = None
+        self.items_carried = 0
+
+        self.task_start_time = 0.0
+        self.startup_delay = self.rng.randint(20, 50)
+
+        self.last_position = None
+        self.previous_heading_error = 0.0
+        self.stuck_counter = 0
+        self.recovery_attempts = 0
+        self.recovery_resume = None   # travel state a recovery manoeuvre returns to
+        self.telemetry_reply = None   # telemetry still in flight
+
+        # Telemetry is change-driven: a sample goes out on a state change,
+        # a completed task, a stuck event, or when position or battery moved
+        # past their deadband since the last sample; the heartbeat (default
+        # ten times the old fixed 200-step period) bounds the silence in
+        # between. A robot standing still only sends heartbeats, and a
+        # 3 m deadband still gives a sample or two per aisle leg.
+        # Charging fills the battery by the deadband every few steps, so
+        # the battery deadband only applies while draining
+        self.telemetry_last = None    # what the last sample reported
+        self.telemetry_heartbeat = self.config("TELEMETRY_HEARTBEAT",
+                                               2000 * self.time_step / 1000.0)
+        self.telemetry_position_deadband = self.config("TELEMETRY_POSITION_DEADBAND", 3.0)
+        self.telemetry_battery_deadband = self.config("TELEMETRY_BATTERY_DEADBAND", 5.0)
+
+        # TELEMETRY_FORMAT "binary": samples batched into compact frames
+        # (telemetry_codec.py), one POST per frame instead of two per sample
+        if self.config("TELEMETRY_FORMAT", "json") == "binary":
+            self.telemetry_encoder = TelemetryEncoder(
+                batch_size=self.config("TELEMETRY_BATCH", BATCH_SIZE),
+                max_delay=self.config("TELEMETRY_MAX_DELAY", MAX_DELAY))
+        else:
+            self.telemetry_encoder = None
+
+    @property
+    def task_state(self):
+        return self.fsm.name
+
+    # ============================================
+    # METRICS ENDPOINT
+    # ============================================
+
+    def _init_metrics(self):
+        # Scrape endpoint http://localhost:<port>/metrics (0 disables); the first
+        # free port from METRICS_PORT upwards is used when robots share a machine
+        self.metrics_port = self.config("METRICS_PORT", 9200)
+        self.metrics_server = None
+
+        metrics = self.metrics = MetricsRegistry(self.robot_name, states=self.fsm)
+        metrics.counter("warehouse_tasks_completed_total", "Tasks completed",
+                        func=lambda: self.tasks_completed)
+        metrics.counter("warehouse_task_failures_total", "Stuck events counted as task failures",
+                        func=lambda: self.task_failures)
+        self.recovery_metric = metrics.counter("warehouse_recovery_attempts_total",
+                                               "Recovery manoeuvres performed")
+        self.reassign_metric = metrics.counter("warehouse_task_reassignments_total",
+                                               "Tasks abandoned after repeated recovery attempts")
+        metrics.gauge("warehouse_battery_percent", "Battery level",
+                      func=lambda: self.battery_level)
+        metrics.counter("warehouse_energy_consumed_percent_total", "Battery energy consumed",
+                        func=lambda: self.total_energy_consumed)
+        metrics.gauge("warehouse_task_energy_percent", "Energy consumed by the current task",
+                      func=lambda: self.energy_model.task_energy)
+        metrics.counter("warehouse_distance_traveled_meters_total", "Distance driven",
+                        func=lambda: self.total_distance_traveled)
+        metrics.gauge("warehouse_stuck_steps", "Consecutive steps without movement",
+                      func=lambda: self.stuck_counter)
+
+        # Queue depths: orders chosen but not yet planned into a trip, and
+        # backend calls (reports, telemetry, assignments) still in flight
+        metrics.gauge("warehouse_pending_orders", "Orders waiting to be planned into a trip",
+                      func=lambda: len(self.pending_orders))
+        metrics.gauge("warehouse_backend_calls_in_flight", "Backend requests not yet answered",
+                      func=lambda: len(self.backend.tasks))
+
+    # ============================================
+    # LOCAL ALLOCATOR AND ORDER BATCHING
+    # ============================================
+
+    def _init_allocation(self):
+        config = self.config
+        log = self.log
+
+        # {"ALLOCATOR": "local"} picks zones with the in-process Q-learning allocator
+        # instead of the AI server (no HTTP round trip, works offline); Q_TABLE is
+        # an .npz snapshot loaded at startup and saved at shutdown. Without one the
+        # table is warm-started from Q_POLICY (policy_trainer.py output, "" disables)
+        self.allocator_mode = config("ALLOCATOR", "remote")
+        self.q_table = config("Q_TABLE", "")
+        self.q_policy = config("Q_POLICY", POLICY_PATH)
+
+        self.allocator = None
+        if self.allocator_mode == "local":
+            allocator = self.allocator = QAllocator(
+                [z['id'] for z in self.pickup_zones + self.shelf_zones + self.delivery_zones],
+                rng=self.rng)
+            if self.q_table and os.path.exists(self.q_table):
+                allocator.restore(self.q_table)
+                log.info(f"🧠 Q-table loaded from {self.q_table}", event="q_table",
+                         path=self.q_table,
+                         routes=allocator.efficiency_metrics()["total_routes_learned"])
+            elif self.q_policy and os.path.exists(self.q_policy):
+                allocator.restore(self.q_policy)
+                log.info(f"🧠 Warm start from trained policy {self.q_policy}", event="q_table",
+                         path=self.q_policy,
+                         routes=allocator.efficiency_metrics()["total_routes_learned"])
+
+        # {"BATCH_ORDERS": 3} plans trips of up to 3 orders (nearest insertion + 2-opt
+        # in route_planner.py) carrying at most BATCH_CAPACITY items and using only the
+        # battery above CRITICAL_BATTERY; 1 = one pickup -> shelf -> delivery per trip
+        self.batch_orders = config("BATCH_ORDERS", 1)
+        self.route_planner = RoutePlanner(
+            self.pickup_zones + self.shelf_zones + self.delivery_zones,
+            capacity=config("BATCH_CAPACITY", 3), cruise_speed=self.cruise_speed)
+        self.pending_orders = []   # chosen but not yet planned into a trip
+
+        # When the AI server fails: nearest feasible zones over the planner's
+        # distance matrix, biased towards the server's cached decisions; after
+        # repeated failures it is not called for ALLOCATOR_COOLDOWN seconds
+        self.fallback = FallbackAllocator(self.route_planner, self.pickup_zones,
+                                          self.shelf_zones, self.delivery_zones)
+        self.allocator_breaker = CircuitBreaker(
+            cooldown=config("ALLOCATOR_COOLDOWN", COOLDOWN_SECONDS))
+        self.assignment = None     # AI server's orders while AWAITING_TASK
+
+    # ============================================
+    # BACKEND I/O
+    # ============================================
+
+    async def initialize_backend(self):
+        if not self.backend_available:
+            return
+
+        if not self.backend.blocking:
+            await asyncio.sleep(self.startup_stagger)
+
+        try:
+            response = await self.backend.get(f"{AI_SERVER_URL}/api/runs/next-number", timeout=2)
+            if response.status_code == 200:
+                self.run_number = response.json().get("run_number", 1)
+
+            response = await self.backend.post(
+                f"{BACKEND_URL}/api/simulations/start",
+                json={"scenario_name": f"warehouse_run_{self.run_number}"},
+                timeout=3
+            )
+
+            if response.status_code == 200:
+                self.simulation_run_id = response.json().get("run_id")
+                self.log.info(f"Connected: Run #{self.run_number}, "
+                              f"DB ID: {self.simulation_run_id[:8]}",
+                              event="backend_connected", run_number=self.run_number,
+                              run_id=self.simulation_run_id)
+
+        except Exception as e:
+            self.log.error(f"Backend init error: {e}", event="backend_error")
+
+    # ============================================
+    # NAVIGATION
+    # ============================================
+
+    def read_gps(self):
+        """Layout-corrected GPS position, or None without a valid reading"""
+        if not self.gps_enabled:
+            return None
+        try:
+            vals = self.gps.getValues()
+        except Exception:
+            return None
+        # Webots reports NaN until the first sample and while the signal is lost
+        if vals[0] != vals[0] or vals[2] != vals[2]:
+            return None
+        return vals[0] - self.gps_offset['x'], vals[2] - self.gps_offset['z']
+
+    def get_gps_position(self):
+        """Filtered pose, else the latest GPS fix - never a made-up origin"""
+        pose = self.pose
+        if pose is not None and pose.initialized:
+            return pose.position
+        fix = self.read_gps()
+        if fix is not None:
+            self.last_gps_fix = fix
+            return fix
+        if self.last_gps_fix is not None:
+            return self.last_gps_fix
+        return self.start_pose[0], self.start_pose[1]
+
+    def update_pose(self):
+        """Once per step: odometry over the last step, then a GPS correction when one is due"""
+        pose = self.pose
+        if pose is None:
+            return
+        pose.predict(self.left_motor.getVelocity(), self.right_motor.getVelocity(),
+                     self.read_compass_heading(), self.time_step / 1000.0)
+        self.total_distance_traveled = pose.distance
+
+        self.pose_steps += 1
+        fix = self.read_gps() if self.pose_steps % (self.gps_period // self.time_step) == 0 else None
+        if fix is not None:
+            pose.correct(*fix)
+        elif not pose.initialized and (not self.gps_enabled
+                                       or self.robot.getTime() >= self.gps_timeout):
+            start_x, start_z = self.start_pose[0], self.start_pose[1]
+            pose.reset(start_x, start_z, variance=1.0)
+            self.log.warning(f"📡 No GPS fix - dead reckoning from START_POSE {self.start_pose}",
+                             event="gps_lost", x=start_x, y=start_z)
+            self.gps_lost = True
+            return
+
+        if not self.gps_lost and pose.initialized and pose.since_fix > self.gps_timeout:
+            self.gps_lost = True
+            self.log.warning("📡 GPS lost - dead reckoning on wheel odometry", event="gps_lost",
+                             x=round(pose.x, 3), y=round(pose.z, 3))
+        elif self.gps_lost and pose.since_fix == 0.0:
+            self.gps_lost = False
+            self.log.info(f"📡 GPS back - dead reckoning was {pose.last_innovation:.2f} m off",
+                          event="gps_restored", error=round(pose.last_innovation, 3))
+
+    def read_compass_heading(self):
+        """Compass heading, or None without a valid reading"""
+        if not self.compass_enabled:
+            return None
+        try:
+            north_vector = self.compass.getValues()
+        except Exception:
+            return None
+        heading = math.atan2(north_vector[0], north_vector[2])
+        return None if heading != heading else heading
+
+    def get_compass_heading(self):
+        heading = self.read_compass_heading()
+        if heading is None:
+            # Integrated from the wheels by the pose filter when there is no compass
+            return self.pose.heading if self.pose is not None else 0.0
+        return heading
+
+    def detect_obstacles(self):
+        """Returns (left_obs, right_obs, front_clear) using distance conversion"""
+        MAX_SENSOR_VALUE = 1024.0  # maximum value the sensors can return
+        # meters - obstacle must be closer than this to matter
+        MIN_DISTANCE = 5.0 * (1.0 - (self.obstacle_threshold / MAX_SENSOR_VALUE))
+
+        left_threat = 0.0
+        right_threat = 0.0
+        front_threat = 0.0
+        sensors = self.distance_sensors
+
+        # Front-left sensors (0-3)
+        for i in range(4):
+            sensor_value = sensors[i].getValue()
+
+            # Ignore zero/very low readings (noise/shadows)
+            if sensor_value < 50:
+                continue
+
+            # Convert to actual distance in meters (from C code formula)
+            distance = 5.0 * (1.0 - (sensor_value / MAX_SENSOR_VALUE))
+
+            # If obstacle is close enough, calculate threat level
+            if distance < MIN_DISTANCE:
+                threat = 1.0 - (distance / MIN_DISTANCE)  # closer = higher threat
+                left_threat += threat
+                front_threat = max(front_threat, threat)
+
+        # Front-right sensors (4-7)
+        for i in range(4, 8):
+            sensor_value = sensors[i].getValue()
+
+            if sensor_value < 50:
+                continue
+
+            distance = 5.0 * (1.0 - (sensor_value / MAX_SENSOR_VALUE))
+
+            if distance < MIN_DISTANCE:
+                threat = 1.0 - (distance / MIN_DISTANCE)
+                right_threat += threat
+                front_threat = max(front_threat, threat)
+
+        # Obstacle detected if cumulative threat exceeds threshold
+        left_obstacle = left_threat > 0.5
+        right_obstacle = right_threat > 0.5
+        front_clear = front_threat < 0.3
+
+        return left_obstacle, right_obstacle, front_clear
+
+    def set_wheel_speeds(self, left, right):
+        self.left_motor.setVelocity(left)
+        self.right_motor.setVelocity(right)
+
+    def stop_wheels(self):
+        """Ramp down to standstill under the deceleration limit"""
+        self.set_wheel_speeds(*self.motion_profile.limit(0.0, 0.0))
+
+    def navigate_to_goal(self, goal):
+        """PID navigation with obstacle avoidance and a smooth speed profile"""
+        motion_profile = self.motion_profile
+        if not goal:
+            return motion_profile.limit(0.0, 0.0)
+
+        current_pos = self.get_gps_position()
+        current_heading = self.get_compass_heading()
+        goal_pos = (goal['x'], goal['z'])
+        distance = euclidean_distance(current_pos, goal_pos)
+
+        # Reached goal - decelerate instead of hard-stopping
+        if distance < self.goal_tolerance:
+            return motion_profile.limit(0.0, 0.0)
+
+        # Check obstacles
+        left_obs, right_obs, front_clear = self.detect_obstacles()
+
+        # REACTIVE: Obstacle avoidance
+        cruise_speed = self.cruise_speed
+        if not front_clear:
+            if left_obs and not right_obs:
+                return motion_profile.limit(cruise_speed * 0.6, -cruise_speed * 0.6)
+            elif right_obs and not left_obs:
+                return motion_profile.limit(-cruise_speed * 0.6, cruise_speed * 0.6)
+            else:
+                return motion_profile.limit(-cruise_speed * 0.4, cruise_speed * 0.4)
+
+        # DELIBERATIVE: Navigate to goal
+        dx = goal_pos[0] - current_pos[0]
+        dy = goal_pos[1] - current_pos[1]
+        desired_heading = math.atan2(dx, dy)
+
+        heading_error = normalize_angle(desired_heading - current_heading)
+
+        # PID control
+        angular_velocity = (self.kp_angular * heading_error) + \
+                           (self.kd_angular * (heading_error - self.previous_heading_error))
+
+        self.previous_heading_error = heading_error
+
+        # Forward speed from the deceleration envelope to the zone edge,
+        # scaled down continuously while still turning towards the goal
+        edge_distance = distance - min(goal.get('radius', self.goal_tolerance), self.goal_tolerance)
+        linear_velocity = motion_profile.goal_speed(edge_distance, heading_error)
+
+        # Differential drive
+        left_speed = linear_velocity - (angular_velocity * WHEEL_BASE / 2.0)
+        right_speed = linear_velocity + (angular_velocity * WHEEL_BASE / 2.0)
+
+        return motion_profile.limit(left_speed, right_speed)
+
+    def is_in_zone(self, zone):
+        """Check if robot is within zone - using generous radius"""
+        if not zone:
+            return False
+
+        current_pos = self.get_gps_position()
+        zone_pos = (zone['x'], zone['z'])
+        distance = euclidean_distance(current_pos, zone_pos)
+
+        # Zone reached if within radius
+        return distance < zone.get('radius', 0.5)
+
+    # ============================================
+    # TASK MANAGEMENT
+    # ============================================
+
+    def start_route(self, stops):
+        """Begin a trip over [(kind, zone, order)] stops"""
+        self.route_stops = stops
+        self.route_index = -1
+        self.items_carried = 0
+        self.next_stop()
+
+    def next_stop(self):
+        """Head for the next stop of the trip; False once every stop is served"""
+        self.route_index += 1
+        if self.route_index >= len(self.route_stops):
+            return False
+        kind, _, self.current_order = self.route_stops[self.route_index]
+        self.current_pickup, self.current_shelf, self.current_delivery = self.current_order
+        self.fsm.enter(GOING_TO[kind])
+        return True
+
+    def undelivered_orders(self):
+        """Orders of the current trip whose delivery has not been completed"""
+        remaining = []
+        for kind, _, order in self.route_stops[max(self.route_index, 0):]:
+            if kind == DELIVERY and all(order is not o for o in remaining):
+                remaining.append(order)
+        return remaining
+
+    def end_trip(self, failed=None):
+        """Abandon the current trip; when batching, orders not yet delivered
+        (except the failed one) are planned into the next trip"""
+        if self.batch_orders > 1:
+            self.pending_orders[:0] = [o for o in self.undelivered_orders() if o is not failed]
+        self.route_stops = []
+        self.route_index = 0
+        self.items_carried = 0
+
+    def go_charge(self, position):
+        self.current_charger = self.layout.nearest(position[0], position[1], "charger")
+        self.fsm.enter(GOING_TO_CHARGE)
+
+    def choose_order(self):
+        """Next (pickup, shelf, delivery) from the local allocator or at random"""
+        if self.allocator is not None:
+            pickup = self.allocator.assign(None, self.pickup_zones)
+            shelf = self.allocator.assign(pickup['id'], self.shelf_zones)
+            delivery = self.allocator.assign(shelf['id'], self.delivery_zones)
+        else:
+            pickup = self.rng.choice(self.pickup_zones)
+            shelf = self.rng.choice(self.shelf_zones)
+            delivery = self.rng.choice(self.delivery_zones)
+        return pickup, shelf, delivery
+
+    async def fetch_order(self):
+        """Next (pickup, shelf, delivery) from the AI server; zones it does not
+        provide, and every zone while its circuit is open, are chosen locally"""
+        current_pos = self.get_gps_position()
+        budget = self.battery_level - self.critical_battery
+        order = []
+        previous = None
+
+        if self.allocator_breaker.allow(self.robot.getTime()):
+            try:
+                for kind, options in zip(TARGET_TYPES, (self.pickup_zones, self.shelf_zones,
+                                                        self.delivery_zones)):
+                    request = {"robot_id": self.robot_name}
+                    if previous is None:
+                        request["current_position"] = {"x": current_pos[0], "y": current_pos[1]}
+                    else:
+                        request["current_zone"] = previous['id']
+                    request["target_type"] = kind
+                    request["available_options"] = options
+
+                    response = await self.backend.post(
+                        f"{AI_SERVER_URL}/api/allocator/assign-optimal", json=request, timeout=2)
+
+                    # An error reply counts against the circuit like no reply
+                    if response.status_code != 200:
+                        raise ConnectionError(f"allocator replied HTTP {response.status_code}")
+                    target = response.json().get("assigned_target")
+                    if target:
+                        self.fallback.remember(previous and previous['id'], kind, target['id'])
+                    else:
+                        target = self.fallback.choose(kind, current_pos, previous, budget)
+                    order.append(target)
+                    previous = target
+
+                if self.allocator_breaker.success():
+                    self.log.info("🔌 AI server back - remote allocation resumed",
+                                  event="allocator_circuit", state="closed")
+
+            except Exception as e:
+                # Only the first opening is worth a warning; failed trial calls
+                # reopen it quietly until the server answers again
+                was_closed = self.allocator_breaker.state == "closed"
+                if self.allocator_breaker.failure(self.robot.getTime()) and was_closed:
+                    self.log.warning(f"🔌 AI server unavailable ({e}) - allocating locally "
+                                     f"for {self.allocator_breaker.cooldown:.0f}s",
+                                     event="allocator_circuit", state="open",
+                                     trips=self.allocator_breaker.trips)
+                elif was_closed:
+                    self.log.sampled("allocator_error", 20, logging.WARNING,
+                                     "Allocator unavailable (%s) - local assignment", e)
+
+        for kind in TARGET_TYPES[len(order):]:
+            previous = self.fallback.choose(kind, current_pos, previous, budget)
+            order.append(previous)
+        return tuple(order)
+
+    async def fetch_orders(self, count):
+        """count orders from the AI server, requested concurrently"""
+        if self.backend.blocking:
+            return [await self.fetch_order() for _ in range(count)]
+        return list(await asyncio.gather(*(self.fetch_order() for _ in range(count))))
+
+    def request_task_assignment(self):
+        with self.profiler.phase("task_assignment"):
+            self.recovery_attempts = 0  # Reset on new task
+
+            wanted = self.batch_orders - len(self.pending_orders) if self.batch_orders > 1 else 1
+            if self.allocator is not None or not self.backend_available or wanted <= 0:
+                self.assign_task()
+                return
+
+            if self.allocator_breaker.is_open(self.robot.getTime()):
+                position = self.get_gps_position()
+                budget = self.battery_level - self.critical_battery
+                self.assign_task([self.fallback.order(position, budget) for _ in range(wanted)])
+                return
+
+            # The AI server picks the zones; the robot waits in AWAITING_TASK
+            # until the reply is in, unless it already is
+            assignment = self.backend.spawn(self.fetch_orders(wanted))
+            if assignment.done():
+                self.assign_task(assignment.result())
+            else:
+                self.assignment = assignment
+                self.fsm.enter(AWAITING_TASK)
+
+    def take_assignment(self):
+        assignment, self.assignment = self.assignment, None
+        self.assign_task(assignment.result())
+
+    def assign_task(self, orders=None):
+        """Start the next trip from orders fetched from the AI server, else chosen here"""
+        log = self.log
+        if orders is None:
+            next_order = self.choose_order
+        else:
+            supply = iter(orders)
+            next_order = lambda: next(supply, None)
+
+        if self.batch_orders > 1:
+            current_pos = self.get_gps_position()
+            pending_orders = self.pending_orders
+            for _ in range(10 * self.batch_orders):
+                if len(pending_orders) >= self.batch_orders:
+                    break
+                order = next_order()
+                if order is None:
+                    break
+                # An order a full battery could not serve would block the queue
+                if self.route_planner.order_energy(current_pos, order) > 100.0 - self.critical_battery:
+                    log.sampled("unservable_order", 20, logging.WARNING,
+                                "Order %s unreachable on a full battery - skipped",
+                                " → ".join(zone['id'] for zone in order))
+                    if self.allocator is not None:
+                        for zone in order:
+                            self.allocator.update_congestion(zone['id'], -1)
+                    continue
+                pending_orders.append(order)
+            stops, batch = self.route_planner.plan(current_pos, pending_orders,
+                                                   self.battery_level - self.critical_battery,
+                                                   self.batch_orders)
+            if not batch:
+                log.warning(f"🪫 No order fits in {self.battery_level:.1f}% battery - charging first",
+                            event="batch_battery", battery=round(self.battery_level, 2))
+                self.end_trip()
+                self.go_charge(current_pos)
+                return
+            for order in batch:
+                pending_orders.remove(order)
+        else:
+            order = next_order()
+            batch = [order]
+            stops = [(kind, zone, order) for kind, zone in zip(STOP_KINDS, order)]
+
+        self.start_route(stops)
+        self.task_start_time = self.robot.getTime()
+        self.energy_model.start_task()
+
+        task = self.tasks_completed + 1
+        if len(batch) == 1:
+            log.info(f"━━━ TASK #{task}: {self.current_pickup['id']} → "
+                     f"{self.current_shelf['id']} → {self.current_delivery['id']}",
+                     event="task_start", task=task, pickup=self.current_pickup['id'],
+                     shelf=self.current_shelf['id'], delivery=self.current_delivery['id'])
+        else:
+            stop_ids = [zone['id'] for _, zone, _ in stops]
+            log.info(f"━━━ TRIP: {len(batch)} orders from TASK #{task}: "
+                     + " → ".join(stop_ids),
+                     event="trip_start", task=task, orders=len(batch), stops=stop_ids)
+
+    def report_task_completion(self, success=True):
+        task_duration = self.robot.getTime() - self.task_start_time
+        pickup, shelf, delivery = self.current_pickup, self.current_shelf, self.current_delivery
+
+        if self.allocator is not None and pickup:
+            self.allocator.complete_task(pickup['id'], shelf['id'], delivery['id'],
+                                         task_duration, success)
+
+        if not self.backend_available:
+            return
+
+        self.backend.spawn(self.post_report(
+            "network.task_complete", "task_report_error", "Task completion report",
+            f"{AI_SERVER_URL}/api/tasks/complete",
+            json={
+                "robot_id": self.robot_name,
+                "run_number": self.run_number,
+                "task_number": self.tasks_completed,
+                "pickup": pickup['id'] if pickup else None,
+                "shelf": shelf['id'] if shelf else None,
+                "delivery": delivery['id'] if delivery else None,
+                "duration": task_duration,
+                "energy_used": self.energy_model.task_energy,
+                "total_energy": self.total_energy_consumed,
+                "failures": self.task_failures,
+                "success": success
+            },
+            timeout=2
+        ))
+
+    async def post_report(self, phase, error_key, what, url, **kwargs):
+        """Fire-and-forget POST timed as profiler phase; failures are logged
+        (sampled), never raised"""
+        try:
+            with self.profiler.phase(phase):
+                await self.backend.post(url, **kwargs)
+        except Exception as e:
+            self.log.sampled(error_key, 20, logging.WARNING, "%s failed: %s", what, e)
+
+    def telemetry_trigger(self):
+        """Why a telemetry sample is due this step, None while nothing changed enough"""
+        if not self.backend_available or not self.simulation_run_id:
+            return None
+        last = self.telemetry_last
+        if last is None:
+            return "start"
+        sent_at, entered_at, x, y, battery, tasks, failures = last
+
+        if self.fsm.entered_at != entered_at:
+            return "state"
+        if self.tasks_completed != tasks:
+            return "task"
+        if self.task_failures != failures:
+            return "stuck"
+        position = self.get_gps_position()
+        if math.hypot(position[0] - x, position[1] - y) >= self.telemetry_position_deadband:
+            return "position"
+        if self.fsm.state != CHARGING and \
+                abs(self.battery_level - battery) >= self.telemetry_battery_deadband:
+            return "battery"
+        if self.robot.getTime() - sent_at >= self.telemetry_heartbeat:
+            return "heartbeat"
+        return None
+
+    def send_telemetry(self, trigger="heartbeat"):
+        if not self.backend_available or not self.simulation_run_id:
+            return
+        encoder = self.telemetry_encoder
+        in_flight = self.telemetry_reply is not None and not self.telemetry_reply.done()
+        if in_flight and encoder is None:
+            return   # previous sample still in flight: the trigger holds until it is back
+
+        x, y = self.get_gps_position()
+        task_state = self.task_state
+        now = self.robot.getTime()
+        self.telemetry_last = (now, self.fsm.entered_at, x, y, self.battery_level,
+                               self.tasks_completed, self.task_failures)
+
+        # Zone being approached or served (per-zone wait times in run_analytics)
+        goal_field = STATE_GOALS.get(self.fsm.state)
+        goal = getattr(self, goal_field) if goal_field else None
+
+        distance_to_goal = euclidean_distance((x, y), (goal['x'], goal['z'])) if goal else 0
+        energy_model = self.energy_model
+
+        telemetry = {
+            "robot_id": self.robot_name,
+            "run_id": self.simulation_run_id,
+            "robot_icon": self.icon,
+            "sim_time": round(now, 3),
+            "position_x": round(x, 4),
+            "position_y": round(y, 4),
+            "position_z": 0,
+            "battery": round(self.battery_level, 2),  # Will be mapped to battery_level by server
+            "task_state": task_state,
+            "status": "active",
+            "trigger": trigger,
+            "current_goal": goal['id'] if goal else None,
+            "distance_to_goal": round(distance_to_goal, 3),
+            "tasks_completed": self.tasks_completed,
+            "task_failures": self.task_failures,
+            "total_energy": round(self.total_energy_consumed, 3),
+            "task_energy": round(energy_model.task_energy, 3),
+            "energy_breakdown": {k: round(v, 3) for k, v in energy_model.breakdown.items()},
+        }
+
+        if encoder is not None:
+            # Samples keep collecting while a frame is in flight; the next
+            # frame then carries them all
+            encoder.add(telemetry)
+            if encoder.ready() and not in_flight:
+                self.telemetry_reply = self.backend.spawn(
+                    self.post_telemetry_frame(encoder.flush()))
+            return
+
+        if self.profiler.enabled:
+            telemetry["profile"] = self.profiler.snapshot()
+
+        self.telemetry_reply = self.backend.spawn(self.post_telemetry(telemetry))
+
+    async def post_telemetry(self, telemetry):
+        """Both telemetry posts at once"""
+        backend = self.backend
+        try:
+            with self.profiler.phase("network.telemetry"):
+                if backend.blocking:
+                    await backend.post(f"{AI_SERVER_URL}/api/monitor/telemetry",
+                                       json=telemetry, timeout=0.5)
+                    await backend.post(f"{BACKEND_URL}/api/telemetry/{self.simulation_run_id}",
+                                       json=telemetry, timeout=0.5)
+                else:
+                    await asyncio.gather(
+                        backend.post(f"{AI_SERVER_URL}/api/monitor/telemetry",
+                                     json=telemetry, timeout=0.5),
+                        backend.post(f"{BACKEND_URL}/api/telemetry/{self.simulation_run_id}",
+                                     json=telemetry, timeout=0.5))
+        except Exception as e:
+            self.log.sampled("telemetry_error", 50, logging.WARNING, "Telemetry failed: %s", e)
+
+    async def post_telemetry_frame(self, frame):
+        """One binary frame to the AI server, which stores and monitors it
+        and refreshes the backend's latest-sample cache"""
+        try:
+            with self.profiler.phase("network.telemetry"):
+                await self.backend.post(f"{AI_SERVER_URL}/api/monitor/telemetry/frames",
+                                        data=frame, headers={"Content-Type": CONTENT_TYPE},
+                                        timeout=0.5)
+        except Exception as e:
+            self.log.sampled("telemetry_error", 50, logging.WARNING, "Telemetry failed: %s", e)
+
+    # ============================================
+    # STUCK DETECTION
+    # ============================================
+
+    def detect_and_recover_stuck(self):
+        current_pos = self.get_gps_position()
+        log = self.log
+
+        if self.last_position:
+            movement = euclidean_distance(self.last_position, current_pos)
+
+            # Only count as stuck if in motion AND not moving
+            if movement < 0.005 and self.fsm.state in TRAVEL_STATES:
+                self.stuck_counter += 1
+
+                # Increased threshold to 250 steps (~25 seconds)
+                if self.stuck_counter > 250:
+                    self.stuck_counter = 0
+                    self.task_failures += 1
+                    self.recovery_attempts += 1
+
+                    # Give up after 5 recovery attempts
+                    if self.recovery_attempts > 5:
+                        log.warning("❌ Task failed after 5 recovery attempts - reassigning",
+                                    event="task_reassigned", failures=self.task_failures)
+                        self.reassign_metric.inc()
+                        self.recovery_attempts = 0
+                        if self.allocator is not None:
+                            self.allocator.complete_task(
+                                self.current_pickup['id'], self.current_shelf['id'],
+                                self.current_delivery['id'],
+                                self.robot.getTime() - self.task_start_time, success=False)
+                        self.end_trip(failed=self.current_order)
+                        self.request_task_assignment()
+                        return True
+
+                    log.warning(f"🚨 STUCK - Recovery attempt #{self.recovery_attempts}",
+                                event="stuck", attempt=self.recovery_attempts,
+                                x=round(current_pos[0], 3), y=round(current_pos[1], 3))
+
+                    if self.allocator is not None:
+                        self.allocator.register_failure(current_pos[0], current_pos[1],
+                                                       severity=STUCK_SEVERITY)
+
+                    if self.backend_available:
+                        self.backend.spawn(self.post_report(
+                            "network.stuck_report", "stuck_report_error", "Stuck report",
+                            f"{AI_SERVER_URL}/api/robots/stuck",
+                            json={
+                                "robot_id": self.robot_name,
+                                "position": {"x": current_pos[0], "y": current_pos[1]},
+                                "task_state": self.task_state,
+                                "failures": self.task_failures
+                            },
+                            timeout=1
+                        ))
+
+                    self.recovery_metric.inc()
+                    self.start_recovery()
+                    return True
+            else:
+                self.stuck_counter = 0
+
+        self.last_position = current_pos
+        return False
+
+    def start_recovery(self):
+        """Back off, then turn a random way (RECOVERY_REVERSE, RECOVERY_TURN
+        run one step per control step) and resume the interrupted trip"""
+        self.recovery_resume = self.fsm.state
+        self.fsm.enter(RECOVERY_REVERSE)
+        self.left_motor.setVelocity(-MAX_SPEED * 0.6)
+        self.right_motor.setVelocity(-MAX_SPEED * 0.6)
+
+    def start_recovery_turn(self):
+        # Random turn direction
+        if self.rng.random() > 0.5:
+            self.left_motor.setVelocity(MAX_SPEED * 0.8)
+            self.right_motor.setVelocity(-MAX_SPEED * 0.8)
+        else:
+            self.left_motor.setVelocity(-MAX_SPEED * 0.8)
+            self.right_motor.setVelocity(MAX_SPEED * 0.8)
+
+    def end_recovery(self):
+        # Manoeuvre bypassed the profile - resume ramping from the last command
+        self.motion_profile.reset(self.left_motor.getVelocity(), self.right_motor.getVelocity())
+        self.fsm.enter(self.recovery_resume)
+
+    # ============================================
+    # ENERGY
+    # ============================================
+
+    def drain_battery(self):
+        """Charge this step's motion energy to the battery and the current task"""
+        if self.fsm.state == CHARGING:
+            return
+
+        energy = self.energy_model.step(self.left_motor.getVelocity(),
+                                        self.right_motor.getVelocity(),
+                                        loaded=self.items_carried > 0)
+        self.battery_level -= energy
+        self.total_energy_consumed += energy
+
+    # ============================================
+    # STATE MACHINE
+    # ============================================
+
+    def _init_state_machine(self):
+        """Transition table: per state, the action run every step, the dwell
+        in steps and the guarded transitions checked after the action"""
+        config = self.config
+        fsm = self.fsm = StateMachine(TASK_STATES, clock=self.robot.getTime)
+        if hasattr(self.robot, "mark"):
+            fsm.on_enter = self.tape_state   # recording: states and goals go on the tape
+
+        # Every log record from here on carries the task state and sim time
+        self.log.context = lambda: {"state": fsm.name,
+                                    "sim_time": round(self.robot.getTime(), 3)}
+
+        fsm.define(INITIALIZING, action=self.stop_wheels, dwell=self.startup_delay,
+                   transitions=[(DWELL, None, self.request_task_assignment)])
+
+        for going, at, field in ((GOING_TO_PICKUP, AT_PICKUP, "current_pickup"),
+                                 (GOING_TO_SHELF, AT_SHELF, "current_shelf"),
+                                 (GOING_TO_DELIVERY, AT_DELIVERY, "current_delivery")):
+            fsm.define(going, action=lambda field=field: self.drive_to(getattr(self, field)),
+                       transitions=[(lambda field=field: self.is_in_zone(getattr(self, field)),
+                                     at, lambda field=field: self.arrived(getattr(self, field)))])
+
+        fsm.define(AT_PICKUP, action=self.stop_wheels, dwell=config("PICKUP_DWELL", ZONE_DWELL),
+                   transitions=[(DWELL, None, self.loaded)])
+        fsm.define(AT_SHELF, action=self.stop_wheels, dwell=config("SHELF_DWELL", ZONE_DWELL),
+                   transitions=[(DWELL, None, self.stored)])
+        fsm.define(AT_DELIVERY, action=self.stop_wheels,
+                   dwell=config("DELIVERY_DWELL", ZONE_DWELL),
+                   transitions=[(DWELL, None, self.delivered)])
+
+        fsm.define(GOING_TO_CHARGE, action=lambda: self.drive_to(self.current_charger),
+                   transitions=[(lambda: self.is_in_zone(self.current_charger),
+                                 CHARGING, self.docked)])
+        fsm.define(CHARGING, action=self.charge,
+                   transitions=[(lambda: self.battery_level >= 100.0, None, self.charged)])
+        fsm.define(AWAITING_TASK, action=self.stop_wheels,
+                   transitions=[(lambda: self.assignment.done(), None, self.take_assignment)])
+
+        # Wheel commands are set on entry and held; the dwell counts the
+        # steps after the one that entered, so it is one short of the total
+        fsm.define(RECOVERY_REVERSE, dwell=RECOVERY_REVERSE_STEPS - 1,
+                   transitions=[(DWELL, RECOVERY_TURN, self.start_recovery_turn)])
+        fsm.define(RECOVERY_TURN, dwell=RECOVERY_TURN_STEPS - 1,
+                   transitions=[(DWELL, None, self.end_recovery)])
+
+    def tape_state(self, state):
+        goal_field = STATE_GOALS.get(state)
+        goal = getattr(self, goal_field) if goal_field else None
+        self.robot.mark({"state": TASK_STATES[state], "goal": goal['id'] if goal else None})
+
+    def update_state_machine(self):
+        log = self.log
+        current_pos = self.get_gps_position()
+        if self.pose is None and self.last_position:
+            # No pose filter: distance from raw GPS steps instead of odometry
+            self.total_distance_traveled += euclidean_distance(self.last_position, current_pos)
+
+        if self.detect_and_recover_stuck():
+            return
+
+        if self.battery_level < self.critical_battery and \
+                self.fsm.state not in (GOING_TO_CHARGE, CHARGING,
+                                       RECOVERY_REVERSE, RECOVERY_TURN):
+            log.warning(f"⚠️  LOW BATTERY: {self.battery_level:.1f}%",
+                        event="low_battery", battery=round(self.battery_level, 2))
+            self.end_trip()
+            self.go_charge(current_pos)
+            return
+
+        self.fsm.step()
+
+    # State actions and transition effects
+
+    def drive_to(self, goal):
+        self.set_wheel_speeds(*self.navigate_to_goal(goal))
+
+    def arrived(self, zone):
+        self.stop_wheels()
+        self.log.debug("✅ At %s", zone['id'], event="arrived", zone=zone['id'])
+
+    def loaded(self):
+        self.items_carried += 1
+        self.next_stop()
+        self.log.debug("📦 Loaded → %s", self.route_stops[self.route_index][1]['id'],
+                       event="loaded")
+
+    def stored(self):
+        self.next_stop()
+        self.log.debug("📦 Stored → %s", self.route_stops[self.route_index][1]['id'],
+                       event="stored")
+
+    def delivered(self):
+        self.tasks_completed += 1
+        self.items_carried -= 1
+        task_duration = self.robot.getTime() - self.task_start_time
+
+        self.log.info(f"✅ TASK #{self.tasks_completed} DONE - {task_duration:.1f}s, "
+                      f"battery {self.battery_level:.1f}%, "
+                      f"energy {self.energy_model.task_energy:.2f}%",
+                      event="task_done", task=self.tasks_completed,
+                      duration=round(task_duration, 3), battery=round(self.battery_level, 2),
+                      energy=round(self.energy_model.task_energy, 3))
+
+        self.report_task_completion(success=True)
+
+        if self.next_stop():
+            # Next order of the batch: its time and energy start here
+            self.task_start_time = self.robot.getTime()
+            self.energy_model.start_task()
+        elif self.battery_level > self.critical_battery:
+            self.request_task_assignment()
+        else:
+            self.go_charge(self.get_gps_position())
+
+    def docked(self):
+        self.stop_wheels()
+        self.log.info(f"⚡ Charging at {self.current_charger['id']}",
+                      event="charging", charger=self.current_charger['id'],
+                      battery=round(self.battery_level, 2))
+
+    def charge(self):
+        self.stop_wheels()
+        self.battery_level += BATTERY_CHARGE_RATE
+
+    def charged(self):
+        self.battery_level = 100.0
+        self.log.info("🔋 Charged!", event="charged")
+        self.request_task_assignment()
+
+    # ============================================
+    # MAIN LOOP
+    # ============================================
+
+    def start(self):
+        """Backend connection, startup banner and metrics endpoint; call it
+        from inside the event loop (run() does)"""
+        self.backend.spawn(self.initialize_backend())
+        self.log.info(f"WAREHOUSE SYSTEM - Run #{self.run_number} - calibrated zones loaded",
+                      event="startup", run_number=self.run_number)
+
+        if self.metrics_port:
+            self.metrics_server = start_metrics_server(self.metrics, self.metrics_port)
+            if self.metrics_server is not None:
+                bound_port = self.metrics_server.server_address[1]
+                self.log.info(f"📈 Metrics: http://localhost:{bound_port}/metrics",
+                              event="metrics", port=bound_port)
+            else:
+                self.log.warning(f"⚠️  Metrics: no free port from {self.metrics_port}",
+                                 event="metrics")
+
+    def step(self):
+        """One control step; call after robot.step() returned"""
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler.begin_step()
+
+        self.update_pose()
+        self.drain_battery()
+
+        if profiler.enabled:
+            phase_start = time.perf_counter_ns()
+            self.update_state_machine()
+            profiler.record("state_machine", time.perf_counter_ns() - phase_start)
+        else:
+            self.update_state_machine()
+
+        trigger = self.telemetry_trigger()
+        if trigger is not None:
+            with profiler.phase("telemetry"):
+                self.send_telemetry(trigger)
+
+        if profiler.enabled:
+            profiler.end_step()
+
+    async def shutdown(self):
+        """Backend calls still in flight, final log lines, Q-table snapshot,
+        stopping the metrics endpoint, closing the log and any recording"""
+        encoder = self.telemetry_encoder
+        if encoder is not None and encoder.samples:
+            await self.post_telemetry_frame(encoder.flush())
+        await self.backend.close()
+        log = self.log
+        log.info(f"Simulation ended: {self.tasks_completed} tasks, {self.task_failures} failures",
+                 event="shutdown", tasks=self.tasks_completed, failures=self.task_failures)
+        pose = self.pose
+        if pose is not None:
+            log.info(f"📍 Pose filter: GPS offset drift ({pose.offset_x:+.3f}, "
+                     f"{pose.offset_z:+.3f}) m, {pose.slips} slips, "
+                     f"{pose.rejected} GPS readings rejected",
+                     event="pose_filter", **pose.stats())
+        seconds = self.fsm.dwell_snapshot()
+        log.info("⏱️  Time per state: " + ", ".join(
+                     f"{name} {total:.0f}s" for name, total in seconds.items()),
+                 event="state_time", entries=self.fsm.entries_snapshot(),
+                 seconds={name: round(total, 3) for name, total in seconds.items()})
+        if self.allocator is not None and self.q_table:
+            self.allocator.save(self.q_table)
+            log.info(f"🧠 Q-table saved to {self.q_table}", event="q_table", path=self.q_table)
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+        log.close()
+        if self.config("RECORD", False):
+            self.robot.close()
+
+    async def run_async(self):
+        self.start()
+        while self.robot.step(self.time_step) != -1:
+            self.step()
+            # One pass of the event loop: replies that arrived meanwhile are
+            # handed to their tasks, new calls go out
+            await asyncio.sleep(0)
+        await self.shutdown()
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+
+def normalize_angle(angle):
+    while angle > math.pi:
+        angle -= 2.0 * math.pi
+    while angle < -math.pi:
+        angle += 2.0 * math.pi
+    return angle
+
+
+def euclidean_distance(p1, p2):
+    dx = p2[0] - p1[0]
+    dy = p2[1] - p1[1]
+    return math.sqrt(dx * dx + dy * dy)
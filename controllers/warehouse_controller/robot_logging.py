@@ -0,0 +1,185 @@
+"""
+ROBOT LOGGING - Structured, level-gated logging for the robot controllers
+Records carry the robot id plus key/value fields and go through a queue
+to a background listener, which writes JSON lines to a rotating file
+and a short "<icon> message" line to the console.
+
+The step loop only pays for the level check and, for enabled records,
+putting the record on the queue: console and file I/O happen on the
+listener thread. High-frequency events go through sampled().
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_DIR = os.path.join("warehouse_data", "logs")
+
+# Rotating file: 5 MB per file, 3 backups per robot
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, robot, event, message, fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "robot": getattr(record, "robot", None),
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Human-readable line prefixed with the robot's icon"""
+
+    def format(self, record):
+        icon = getattr(record, "icon", "")
+        message = record.getMessage()
+        return f"{icon} {message}" if icon else message
+
+
+class RobotLogger:
+    """
+    Per-robot logger. Every record carries the robot id, the bound fields
+    and whatever the context callback returns (evaluated only for records
+    that pass the level check).
+    """
+
+    def __init__(self, logger, robot_id, icon="", context=None, listener=None):
+        self.logger = logger
+        self.robot_id = robot_id
+        self.icon = icon
+        self.context = context
+        self.listener = listener
+        self.bound = {}
+        self.sample_counts = {}
+
+    def bind(self, **fields):
+        self.bound.update(fields)
+
+    def enabled_for(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, msg, *args, event=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        merged = dict(self.bound)
+        if self.context:
+            merged.update(self.context())
+        merged.update(fields)
+        self.logger.log(level, msg, *args, extra={
+            "robot": self.robot_id, "icon": self.icon, "event": event, "fields": merged})
+
+    def debug(self, msg, *args, **fields):
+        self.log(logging.DEBUG, msg, *args, **fields)
+
+    def info(self, msg, *args, **fields):
+        self.log(logging.INFO, msg, *args, **fields)
+
+    def warning(self, msg, *args, **fields):
+        self.log(logging.WARNING, msg, *args, **fields)
+
+    def error(self, msg, *args, **fields):
+        self.log(logging.ERROR, msg, *args, **fields)
+
+    def sampled(self, key, every, level, msg, *args, **fields):
+        """Log the first occurrence of key and then one in every `every`"""
+        count = self.sample_counts.get(key, 0) + 1
+        self.sample_counts[key] = count
+        if (count - 1) % every:
+            return
+        self.log(level, msg, *args, event=key, occurrences=count, **fields)
+
+    def close(self):
+        """Flush the queue, stop the listener thread and close its handlers (log file)"""
+        if self.listener:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+        for handler in self.logger.handlers[:]:
+            self.logger.removeHandler(handler)
+            handler.close()
+
+
+def _level(value):
+    if isinstance(value, int):
+        return value
+    return logging.getLevelName(str(value).upper())
+
+
+def setup_robot_logging(robot_id, icon="", level="INFO", console_level="INFO",
+                        log_dir=LOG_DIR, context=None):
+    """
+    Configure queue-based logging for one robot and return its RobotLogger.
+    level gates the rotating file, console_level the console; an empty
+    log_dir disables the file.
+    """
+    file_level = _level(level)
+    console_level = _level(console_level)
+
+    handlers = []
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(console_level)
+    console.setFormatter(ConsoleFormatter())
+    handlers.append(console)
+
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        filename = os.path.join(log_dir, f"{robot_id.replace(' ', '_')}.log")
+        file_handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+        file_handler.setLevel(file_level)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    logger = logging.getLogger(f"warehouse.{robot_id}")
+    logger.setLevel(min(h.level for h in handlers))
+    logger.propagate = False
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+
+    records = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+
+    return RobotLogger(logger, robot_id, icon, context, listener)
+
+
+def setup_component_logging(component, level="INFO", log_dir=None):
+    """
+    Logger 'warehouse.<component>' for non-robot modules (e.g. the AI
+    decision engine): console lines, plus JSON lines to
+    <log_dir>/<component>.log when log_dir is given. Handlers are attached
+    once; these modules log rarely, so no queue or listener thread.
+    """
+    logger = logging.getLogger(f"warehouse.{component}")
+    if logger.handlers:
+        return logger
+    logger.setLevel(_level(level))
+    logger.propagate = False
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    logger.addHandler(console)
+
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, f"{component}.log"), maxBytes=MAX_BYTES,
+            backupCount=BACKUP_COUNT, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        logger.addHandler(file_handler)
+    return logger
@@ -0,0 +1,197 @@
+"""
+ROUTE PLANNER - Multi-stop order batching
+Groups several pickup -> shelf -> delivery orders into one trip and
+sequences the stops: orders are added by cheapest (nearest) insertion,
+then the stop list is improved with 2-opt. Every candidate sequence
+must keep each order's pickup before its shelf before its delivery,
+never carry more than `capacity` items, and fit the battery budget.
+
+Distances come from a zone distance matrix computed once per layout
+and cached, so planning a trip is a few thousand table lookups.
+
+Usage:
+    planner = RoutePlanner(PICKUP_ZONES + SHELF_ZONES + DELIVERY_ZONES, capacity=3)
+    stops, batch = planner.plan((x, y), orders, battery_level - CRITICAL_BATTERY)
+"""
+
+import math
+
+from energy_model import IDLE_POWER, ROLLING_COEFF, PAYLOAD_FACTOR
+from motion_profile import WHEEL_RADIUS
+from warehouse_layout import DistanceMatrix
+
+CAPACITY = 3          # items carried at once
+CRUISE_SPEED = 3.0    # rad/s, controller default
+DWELL_SECONDS = 41 * 0.032   # controller's default ZONE_DWELL at every stop
+
+# Planned energy is multiplied by this: real paths curve around obstacles
+ENERGY_MARGIN = 1.5
+
+# Stop kinds, in the order each order visits them; the controller's
+# GOING_TO_<kind> / AT_<kind> states
+PICKUP = "PICKUP"
+SHELF = "SHELF"
+DELIVERY = "DELIVERY"
+STOP_KINDS = (PICKUP, SHELF, DELIVERY)
+LOAD_CHANGE = {PICKUP: 1, SHELF: 0, DELIVERY: -1}
+
+
+# ============================================
+# DISTANCE MATRIX
+# ============================================
+
+_MATRICES = {}
+
+
+def distance_matrix(zones):
+    """DistanceMatrix for this layout, computed on first use"""
+    key = tuple((z['id'], z['x'], z['z']) for z in zones)
+    matrix = _MATRICES.get(key)
+    if matrix is None:
+        matrix = _MATRICES[key] = DistanceMatrix(zones)
+    return matrix
+
+
+# ============================================
+# PLANNER
+# ============================================
+
+class RoutePlanner:
+    """Nearest-insertion + 2-opt stop sequencing under capacity and battery limits"""
+
+    def __init__(self, zones, capacity=CAPACITY, cruise_speed=CRUISE_SPEED,
+                 energy_margin=ENERGY_MARGIN):
+        self.distances = distance_matrix(zones)
+        self.capacity = capacity
+        speed = cruise_speed * WHEEL_RADIUS                    # m/s
+        self.energy_per_meter = (IDLE_POWER + ROLLING_COEFF * cruise_speed) / speed
+        self.loaded_energy_per_meter = (IDLE_POWER + ROLLING_COEFF * PAYLOAD_FACTOR
+                                        * cruise_speed) / speed
+        self.stop_energy = IDLE_POWER * DWELL_SECONDS
+        self.energy_margin = energy_margin
+
+    # ==========================================
+    # SEQUENCE EVALUATION
+    # ==========================================
+    # A sequence is a list of (kind, zone index, order number); legs start
+    # at the robot's position, whose distances to every zone are `start`
+
+    def _leg(self, start, previous, stop):
+        if previous is None:
+            return float(start[stop[1]])
+        return float(self.distances.matrix[previous[1], stop[1]])
+
+    def length(self, start, sequence):
+        total = 0.0
+        previous = None
+        for stop in sequence:
+            total += self._leg(start, previous, stop)
+            previous = stop
+        return total
+
+    def energy(self, start, sequence):
+        """Estimated battery % for driving and serving the sequence"""
+        total = 0.0
+        load = 0
+        previous = None
+        for stop in sequence:
+            rate = self.loaded_energy_per_meter if load else self.energy_per_meter
+            total += self._leg(start, previous, stop) * rate + self.stop_energy
+            load += LOAD_CHANGE[stop[0]]
+            previous = stop
+        return total * self.energy_margin
+
+    def feasible(self, sequence):
+        """Pickup before shelf before delivery per order, load within capacity"""
+        stage = {}
+        load = 0
+        for kind, _, order in sequence:
+            expected = STOP_KINDS[stage.get(order, 0)]
+            if kind != expected:
+                return False
+            stage[order] = stage.get(order, 0) + 1
+            load += LOAD_CHANGE[kind]
+            if load > self.capacity:
+                return False
+        return True
+
+    # ==========================================
+    # CONSTRUCTION AND IMPROVEMENT
+    # ==========================================
+
+    def insert(self, start, sequence, stops):
+        """
+        Cheapest feasible insertion of one order's three stops, keeping
+        their relative order. Returns (added length, new sequence) or None.
+        """
+        base = self.length(start, sequence)
+        best = None
+        n = len(sequence)
+        for i in range(n + 1):
+            for j in range(i, n + 1):
+                for k in range(j, n + 1):
+                    candidate = (sequence[:i] + [stops[0]] + sequence[i:j] + [stops[1]]
+                                 + sequence[j:k] + [stops[2]] + sequence[k:])
+                    if not self.feasible(candidate):
+                        continue
+                    added = self.length(start, candidate) - base
+                    if best is None or added < best[0] - 1e-12:
+                        best = (added, candidate)
+        return best
+
+    def two_opt(self, start, sequence, battery_budget=math.inf):
+        """Reverse segments while that shortens the route and stays feasible"""
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(sequence) - 1):
+                for j in range(i + 1, len(sequence)):
+                    candidate = sequence[:i] + sequence[i:j + 1][::-1] + sequence[j + 1:]
+                    if (self.length(start, candidate) < self.length(start, sequence) - 1e-9
+                            and self.feasible(candidate)
+                            and self.energy(start, candidate) <= battery_budget):
+                        sequence = candidate
+                        improved = True
+        return sequence
+
+    def order_energy(self, position, order):
+        """Estimated battery % for serving one order alone from position"""
+        index = self.distances.index
+        sequence = [(kind, index[zone['id']], 0) for kind, zone in zip(STOP_KINDS, order)]
+        return self.energy(self.distances.from_point(position), sequence)
+
+    def plan(self, position, orders, battery_budget=math.inf, max_orders=None):
+        """
+        Choose and sequence orders for one trip from position.
+        orders are (pickup, shelf, delivery) zone tuples; orders are
+        added nearest-first while capacity and battery_budget (battery %
+        that may be spent) allow. Returns (stops, batch): stops as
+        [(kind, zone, order)] and the orders taken, in input order.
+        """
+        start = self.distances.from_point(position)
+        index = self.distances.index
+        candidates = {
+            n: [(kind, index[zone['id']], n) for kind, zone in zip(STOP_KINDS, order)]
+            for n, order in enumerate(orders)
+        }
+        limit = len(orders) if max_orders is None else max_orders
+
+        sequence = []
+        taken = []
+        while candidates and len(taken) < limit:
+            best = None
+            for n, stops in candidates.items():
+                option = self.insert(start, sequence, stops)
+                if option is None or self.energy(start, option[1]) > battery_budget:
+                    continue
+                if best is None or option[0] < best[1][0]:
+                    best = (n, option)
+            if best is None:
+                break
+            n, (_, sequence) = best
+            del candidates[n]
+            taken.append(n)
+            sequence = self.two_opt(start, sequence, battery_budget)
+
+        stops = [(kind, orders[n][STOP_KINDS.index(kind)], orders[n]) for kind, _, n in sequence]
+        return stops, [orders[n] for n in sorted(taken)]
@@ -0,0 +1,408 @@
+"""
+RUN ANALYTICS - Fleet KPIs from stored telemetry and task metrics
+Loads every robot's telemetry into column arrays and computes, in one
+vectorized pass over the run: utilization, time share per state,
+travel vs dwell time, energy per task, stall/stuck hotspots and
+per-zone wait times. Results are compared with previous runs from
+DataStorage.get_previous_runs() and turned into findings about what
+limits throughput.
+
+Reads both telemetry layouts found in warehouse_data/telemetry: the
+current controller's (sim_time, GOING_TO_*/AT_* states, positions) and
+the older one (timestamp, MOVING_TO_*/PICKING/DELIVERING), as JSON lines
+(*.jsonl) or binary frame archives (*.wtel, telemetry_codec.py).
+
+Usage:
+    python run_analytics.py                 # report on warehouse_data
+    python run_analytics.py --save          # also store KPIs as a new run
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from telemetry_codec import read_archive
+
+DATA_DIR = "warehouse_data"
+TELEMETRY_DIR = os.path.join(DATA_DIR, "telemetry")
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+
+# State -> activity category
+STATE_CATEGORIES = {
+    "GOING_TO_PICKUP": "travel", "GOING_TO_SHELF": "travel",
+    "GOING_TO_DELIVERY": "travel", "GOING_TO_CHARGE": "charging",
+    "AT_PICKUP": "dwell", "AT_SHELF": "dwell", "AT_DELIVERY": "dwell",
+    "CHARGING": "charging", "INITIALIZING": "idle", "AWAITING_TASK": "idle",
+    # Recovery is part of the trip it interrupts
+    "RECOVERY_REVERSE": "travel", "RECOVERY_TURN": "travel",
+    # Older telemetry layout
+    "MOVING_TO_PICKUP": "travel", "MOVING_TO_SHELF": "travel",
+    "MOVING_TO_DELIVERY": "travel", "PICKING": "dwell", "STORING": "dwell",
+    "DELIVERING": "dwell", "IDLE": "idle",
+}
+CATEGORIES = ("travel", "dwell", "charging", "idle")
+PRODUCTIVE = ("travel", "dwell")
+
+# Zone a state refers to, for telemetry without current_goal
+STATE_ZONE_FIELDS = {
+    "GOING_TO_PICKUP": "current_pickup", "AT_PICKUP": "current_pickup",
+    "GOING_TO_SHELF": "current_shelf", "AT_SHELF": "current_shelf",
+    "GOING_TO_DELIVERY": "current_delivery", "AT_DELIVERY": "current_delivery",
+    "MOVING_TO_PICKUP": "current_pickup", "PICKING": "current_pickup",
+    "MOVING_TO_SHELF": "current_shelf", "STORING": "current_shelf",
+    "MOVING_TO_DELIVERY": "current_delivery", "DELIVERING": "current_delivery",
+}
+
+# A telemetry gap longer than this many typical intervals is not counted.
+# Typical is the 90th percentile: change-driven telemetry clusters samples
+# around events, and its heartbeat gaps must still count.
+MAX_GAP_FACTOR = 5.0
+TYPICAL_INTERVAL_PERCENTILE = 90
+
+# Travelling slower than this (m/s) between samples counts as a stall
+STALL_SPEED = 0.02
+
+# Queueing near a zone: travelling within this distance (m) of the goal
+APPROACH_RADIUS = 1.0
+
+HOTSPOT_CELL = 0.5
+
+
+class Telemetry:
+    """All robots' telemetry as parallel column arrays, sorted by robot and time"""
+
+    def __init__(self, rows):
+        self.robots = sorted({r.get("robot_id", "unknown") for r in rows})
+        self.states = sorted({r.get("task_state", "UNKNOWN") for r in rows})
+        self.zones = sorted({z for z in (self._zone(r) for r in rows) if z})
+
+        robot_index = {name: i for i, name in enumerate(self.robots)}
+        state_index = {name: i for i, name in enumerate(self.states)}
+        zone_index = {name: i for i, name in enumerate(self.zones)}
+
+        def column(key, default=np.nan):
+            return np.array([r.get(key, default) if r.get(key) is not None else default
+                             for r in rows], dtype=float)
+
+        robot = np.array([robot_index[r.get("robot_id", "unknown")] for r in rows], dtype=int)
+        t = np.array([r.get("sim_time", r.get("timestamp", np.nan)) for r in rows], dtype=float)
+        state = np.array([state_index[r.get("task_state", "UNKNOWN")] for r in rows], dtype=int)
+        zone = np.array([zone_index.get(self._zone(r), -1) for r in rows], dtype=int)
+        energy = np.array([r.get("total_energy", r.get("total_energy_used", np.nan)) for r in rows],
+                          dtype=float)
+
+        # Files are appended across runs: a time reset starts a new segment.
+        # Stable sort by robot keeps each file's (chronological) row order.
+        order = np.argsort(robot, kind="stable")
+        self.robot = robot[order]
+        self.t = t[order]
+        self.state = state[order]
+        self.zone = zone[order]
+        self.energy = energy[order]
+        self.battery = column("battery")[order]
+        self.x = column("position_x")[order]
+        self.y = column("position_y")[order]
+        self.tasks = column("tasks_completed", 0.0)[order]
+        self.failures = column("task_failures", 0.0)[order]
+        self.distance_to_goal = column("distance_to_goal")[order]
+
+        # Interval i -> i+1 belongs to sample i when both are in the same segment
+        same = (self.robot[1:] == self.robot[:-1]) & (self.t[1:] > self.t[:-1])
+        dt = np.where(same, np.diff(self.t), 0.0)
+        if np.any(dt > 0):
+            typical = np.percentile(dt[dt > 0], TYPICAL_INTERVAL_PERCENTILE)
+            dt = np.where(dt > MAX_GAP_FACTOR * typical, 0.0, dt)
+        self.same = same
+        self.dt = np.append(dt, 0.0)
+        self.step_distance = np.append(
+            np.where(same, np.hypot(np.diff(self.x), np.diff(self.y)), np.nan), np.nan)
+
+    @staticmethod
+    def _zone(row):
+        if row.get("current_goal"):
+            return row["current_goal"]
+        field = STATE_ZONE_FIELDS.get(row.get("task_state"))
+        return row.get(field) if field else None
+
+    def __len__(self):
+        return len(self.t)
+
+    def increments(self, values):
+        """Per-sample increase of a cumulative column (0 across segment starts)"""
+        diff = np.where(self.same, np.diff(values), 0.0)
+        return np.append(np.clip(np.nan_to_num(diff), 0.0, None), 0.0)
+
+    def category_mask(self, category):
+        codes = [i for i, s in enumerate(self.states) if STATE_CATEGORIES.get(s) == category]
+        return np.isin(self.state, codes)
+
+
+def load_telemetry(telemetry_dir=TELEMETRY_DIR):
+    rows = []
+    if not os.path.isdir(telemetry_dir):
+        return Telemetry(rows)
+    for name in sorted(os.listdir(telemetry_dir)):
+        path = os.path.join(telemetry_dir, name)
+        if name.endswith(".wtel"):
+            rows.extend(read_archive(path))
+        elif name.endswith(".jsonl"):
+            with open(path) as f:
+                rows.extend(json.loads(line) for line in f if line.strip())
+    return Telemetry(rows)
+
+
+def load_task_metrics(metrics_dir=METRICS_DIR):
+    """{robot_id: [task metrics]} from the per-robot metrics files"""
+    tasks = {}
+    if not os.path.isdir(metrics_dir):
+        return tasks
+    for name in sorted(os.listdir(metrics_dir)):
+        if name.endswith("_metrics.json"):
+            with open(os.path.join(metrics_dir, name)) as f:
+                data = json.load(f)
+            tasks[data.get("robot_id", name[:-len("_metrics.json")])] = data.get("metrics", [])
+    return tasks
+
+
+# ============================================
+# KPIs
+# ============================================
+
+def state_times(tel):
+    """Seconds per (robot, state) as an R x S matrix"""
+    flat = tel.robot * len(tel.states) + tel.state
+    return np.bincount(flat, weights=tel.dt,
+                       minlength=len(tel.robots) * len(tel.states)).reshape(
+                           len(tel.robots), len(tel.states))
+
+
+def category_times(tel, times):
+    """Seconds per (robot, category) from the state time matrix"""
+    result = np.zeros((len(tel.robots), len(CATEGORIES)))
+    for j, state in enumerate(tel.states):
+        category = STATE_CATEGORIES.get(state)
+        if category in CATEGORIES:
+            result[:, CATEGORIES.index(category)] += times[:, j]
+    return result
+
+
+def hotspots(tel, mask, weights=None, cell=HOTSPOT_CELL, top=5):
+    """Most frequent grid cells among samples in mask"""
+    valid = mask & np.isfinite(tel.x) & np.isfinite(tel.y)
+    if not np.any(valid):
+        return []
+    cells = np.stack([np.floor(tel.x[valid] / cell), np.floor(tel.y[valid] / cell)], axis=1)
+    unique, inverse = np.unique(cells, axis=0, return_inverse=True)
+    w = np.ones(valid.sum()) if weights is None else weights[valid]
+    scores = np.bincount(inverse.ravel(), weights=w)
+    best = np.argsort(scores)[::-1][:top]
+    return [{"x": round(float(unique[i, 0] + 0.5) * cell, 2),
+             "y": round(float(unique[i, 1] + 0.5) * cell, 2),
+             "score": round(float(scores[i]), 2)} for i in best]
+
+
+def zone_wait_times(tel):
+    """Dwell and approach-queue seconds per zone"""
+    if not tel.zones:
+        return {}
+    has_zone = tel.zone >= 0
+    dwell = has_zone & tel.category_mask("dwell")
+    approach = (has_zone & (tel.category_mask("travel") | tel.category_mask("charging"))
+                & (tel.distance_to_goal < APPROACH_RADIUS))
+    visits = has_zone & tel.category_mask("dwell") & np.append(
+        True, (tel.zone[1:] != tel.zone[:-1]) | (tel.state[1:] != tel.state[:-1]) | ~tel.same)
+
+    n = len(tel.zones)
+    dwell_s = np.bincount(tel.zone[dwell], weights=tel.dt[dwell], minlength=n)
+    approach_s = np.bincount(tel.zone[approach], weights=tel.dt[approach], minlength=n)
+    visit_count = np.bincount(tel.zone[visits], minlength=n)
+    return {zone: {"dwell_s": round(float(dwell_s[i]), 2),
+                   "approach_s": round(float(approach_s[i]), 2),
+                   "visits": int(visit_count[i]),
+                   "mean_wait_s": round(float((dwell_s[i] + approach_s[i]) / visit_count[i]), 2)
+                   if visit_count[i] else None}
+            for i, zone in enumerate(tel.zones)}
+
+
+def task_durations(task_metrics):
+    times = np.array([m["completion_time"] for ms in task_metrics.values() for m in ms
+                      if m.get("completion_time") is not None], dtype=float)
+    if not times.size:
+        return {}
+    return {"count": int(times.size), "mean_s": round(float(times.mean()), 2),
+            "p50_s": round(float(np.percentile(times, 50)), 2),
+            "p90_s": round(float(np.percentile(times, 90)), 2)}
+
+
+def compute_kpis(tel, task_metrics=None):
+    if not len(tel):
+        return {"robots": 0}
+
+    times = state_times(tel)
+    cats = category_times(tel, times)
+    total = times.sum(axis=1)
+    fleet_total = total.sum()
+
+    energy = tel.increments(tel.energy)
+    tasks = tel.increments(tel.tasks)
+    failures = tel.increments(tel.failures)
+    travel = tel.category_mask("travel")
+    stalled = travel & (tel.dt > 0) & (tel.step_distance / np.where(tel.dt > 0, tel.dt, 1.0) < STALL_SPEED)
+
+    per_robot = {}
+    robot_tasks = np.bincount(tel.robot, weights=tasks, minlength=len(tel.robots))
+    robot_energy = np.bincount(tel.robot, weights=energy, minlength=len(tel.robots))
+    for i, name in enumerate(tel.robots):
+        per_robot[name] = {
+            "observed_s": round(float(total[i]), 1),
+            "utilization": round(float(cats[i, :2].sum() / total[i]), 4) if total[i] else 0.0,
+            "tasks_completed": int(robot_tasks[i]),
+            "energy_per_task": round(float(robot_energy[i] / robot_tasks[i]), 3)
+            if robot_tasks[i] else None,
+        }
+
+    fleet_cats = cats.sum(axis=0)
+    total_tasks = float(tasks.sum())
+    kpis = {
+        "robots": len(tel.robots),
+        "observed_s": round(float(fleet_total), 1),
+        "tasks_completed": int(total_tasks),
+        "tasks_per_robot_hour": round(total_tasks / (fleet_total / 3600.0), 2)
+        if fleet_total else 0.0,
+        "task_failures": int(failures.sum()),
+        "utilization": round(float(fleet_cats[:2].sum() / fleet_total), 4) if fleet_total else 0.0,
+        "category_share": {c: round(float(fleet_cats[k] / fleet_total), 4) if fleet_total else 0.0
+                           for k, c in enumerate(CATEGORIES)},
+        "state_share": {s: round(float(times[:, j].sum() / fleet_total), 4) if fleet_total else 0.0
+                        for j, s in enumerate(tel.states)},
+        "travel_s": round(float(fleet_cats[0]), 1),
+        "dwell_s": round(float(fleet_cats[1]), 1),
+        "travel_dwell_ratio": round(float(fleet_cats[0] / fleet_cats[1]), 3) if fleet_cats[1] else None,
+        "stall_share": round(float(tel.dt[stalled].sum() / max(tel.dt[travel].sum(), 1e-9)), 4),
+        "energy_per_task": round(float(energy.sum() / total_tasks), 3) if total_tasks else None,
+        "stall_hotspots": hotspots(tel, stalled, tel.dt),
+        "stuck_hotspots": hotspots(tel, failures > 0),
+        "zone_wait": zone_wait_times(tel),
+        "per_robot": per_robot,
+    }
+    if task_metrics:
+        kpis["task_durations"] = task_durations(task_metrics)
+    return kpis
+
+
+# ============================================
+# COMPARISON AND FINDINGS
+# ============================================
+
+# KPI -> True if higher is better
+COMPARED_KPIS = {
+    "tasks_per_robot_hour": True, "utilization": True, "energy_per_task": False,
+    "task_failures": False, "stall_share": False, "travel_dwell_ratio": False,
+}
+
+# Names the same KPI was stored under by earlier versions
+KPI_ALIASES = {"tasks_per_robot_hour": "tasks_per_hour"}
+
+
+def compare_runs(kpis, previous_runs):
+    """Change of each headline KPI against the mean of previous runs' metrics"""
+    comparison = {}
+    for name, higher_is_better in COMPARED_KPIS.items():
+        current = kpis.get(name)
+        stored = [r.get("metrics", {}) for r in previous_runs]
+        stored = [m.get(name, m.get(KPI_ALIASES.get(name))) for m in stored]
+        history = np.array([v for v in stored if isinstance(v, (int, float))], dtype=float)
+        if current is None or not history.size:
+            continue
+        baseline = float(history.mean())
+        change = (current - baseline) / abs(baseline) if baseline else 0.0
+        comparison[name] = {"current": current, "baseline": round(baseline, 4),
+                            "change": round(change, 4),
+                            "improved": change > 0 if higher_is_better else change < 0}
+    return comparison
+
+
+def findings(kpis, comparison=None):
+    """Plain-language statements of what limits throughput, most important first"""
+    notes = []
+    if not kpis.get("robots"):
+        return ["No telemetry recorded"]
+
+    shares = kpis["category_share"]
+    if shares["idle"] > 0.10:
+        notes.append(f"Robots idle {shares['idle']:.0%} of the time - assign work sooner")
+    if shares["charging"] > 0.20:
+        notes.append(f"Charging takes {shares['charging']:.0%} of fleet time - "
+                     f"charge opportunistically or raise CRITICAL_BATTERY")
+    if kpis["stall_share"] > 0.05:
+        spot = kpis["stall_hotspots"][0] if kpis["stall_hotspots"] else None
+        where = f" (worst near x={spot['x']}, y={spot['y']})" if spot else ""
+        notes.append(f"{kpis['stall_share']:.0%} of travel time stalled{where}")
+    if kpis["task_failures"]:
+        notes.append(f"{kpis['task_failures']} stuck events - see stuck_hotspots")
+
+    waits = [(z, w["mean_wait_s"]) for z, w in kpis.get("zone_wait", {}).items() if w["mean_wait_s"]]
+    if waits:
+        zone, wait = max(waits, key=lambda zw: zw[1])
+        notes.append(f"Longest wait per visit at {zone}: {wait:.1f}s")
+    ratio = kpis.get("travel_dwell_ratio")
+    if ratio:
+        notes.append(f"Travel/dwell ratio {ratio:.2f} - "
+                     + ("travel dominates, shorten routes" if ratio > 2 else "dwell dominates, speed up handling"))
+
+    for name, c in (comparison or {}).items():
+        direction = "improved" if c["improved"] else "regressed"
+        notes.append(f"{name} {direction} {c['change']:+.1%} vs previous runs "
+                     f"({c['baseline']} -> {c['current']})")
+    return notes
+
+
+def analyze(data_dir=DATA_DIR, previous_runs=None):
+    tel = load_telemetry(os.path.join(data_dir, "telemetry"))
+    kpis = compute_kpis(tel, load_task_metrics(os.path.join(data_dir, "metrics")))
+    comparison = compare_runs(kpis, previous_runs or [])
+    return {"kpis": kpis, "comparison": comparison, "findings": findings(kpis, comparison)}
+
+
+def print_report(report):
+    kpis = report["kpis"]
+    print(f"\n{'='*70}")
+    print(f"📊 RUN ANALYTICS - {kpis.get('robots', 0)} robots, {kpis.get('observed_s', 0):.0f}s observed")
+    print(f"{'='*70}")
+    if kpis.get("robots"):
+        print(f"   Tasks: {kpis['tasks_completed']} ({kpis['tasks_per_robot_hour']:.1f}/robot-h), "
+              f"failures: {kpis['task_failures']}")
+        print(f"   Utilization: {kpis['utilization']:.1%}  |  "
+              + "  ".join(f"{c} {s:.0%}" for c, s in kpis["category_share"].items()))
+        if kpis["energy_per_task"] is not None:
+            print(f"   Energy per task: {kpis['energy_per_task']:.2f}%")
+    print(f"\n🔎 Findings:")
+    for note in report["findings"]:
+        print(f"   - {note}")
+    print(f"{'='*70}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post-run fleet KPIs")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--previous", type=int, default=3, help="previous runs to compare with")
+    parser.add_argument("--save", action="store_true", help="store the KPIs as a new run")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    from data_storage import DataStorage   # creates warehouse_data/ on import
+    storage = DataStorage()
+    report = analyze(args.data_dir, storage.get_previous_runs(args.previous))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.save:
+        storage.save_run_metrics(report["kpis"])
+
+
+if __name__ == "__main__":
+    main()
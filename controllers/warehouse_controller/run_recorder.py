@@ -0,0 +1,321 @@
+"""
+RUN RECORDER - Deterministic record and replay of controller runs
+Recording wraps the Webots robot: after every robot.step the GPS,
+compass and sonar readings, the sim time and the wheel commands of
+that step are appended to a gzip-compressed binary tape, together
+with every backend/allocator reply, the run's random seed and a mark
+for every task state entered (state and goal zone, at the frame it
+happened; auto_calibrate.py locates zones from them).
+
+Replay runs the unmodified controller (RobotAgent) against a robot
+stand-in that serves the taped readings and replies, at full speed and
+without Webots or the backend. Wheel commands are compared with the
+recording, so the first step where behaviour diverges is reported.
+
+Usage:
+    python run_recorder.py warehouse_data/recordings/Pioneer_3-DX_20250101_120000.wrun
+    python run_recorder.py <recording> --set KP_ANGULAR=2.5    # same inputs, new tuning
+"""
+
+import argparse
+import collections
+import gzip
+import json
+import os
+import struct
+import time
+from datetime import datetime
+
+RECORDING_DIR = os.path.join("warehouse_data", "recordings")
+
+MAGIC = b"WRUN1\n"
+TAG_FRAME = 1
+TAG_EXCHANGE = 2
+TAG_MARK = 3
+
+_TAG = struct.Struct("<B")
+_LENGTH = struct.Struct("<I")
+
+
+def frame_struct(sonar_count):
+    """time, left/right command, gps xyz, compass xyz, one double per sonar"""
+    return struct.Struct(f"<9d{sonar_count}d")
+
+
+class ReplayedError(Exception):
+    """A backend call that failed while recording fails the same way on replay"""
+
+
+# ============================================
+# RECORDING
+# ============================================
+
+class RunRecorder:
+    """Wraps a Webots Robot and tapes its inputs; everything else is delegated"""
+
+    replaying = False
+
+    def __init__(self, robot, custom_data, backend, path=None):
+        self.robot = robot
+        self.gps = robot.getDevice('gps')
+        self.compass = robot.getDevice('compass')
+        self.sonars = [s for s in (robot.getDevice(f'so{i}') for i in range(16)) if s]
+        self.left_motor = robot.getDevice('left wheel')
+        self.right_motor = robot.getDevice('right wheel')
+        self.frame = frame_struct(len(self.sonars))
+
+        if path is None:
+            os.makedirs(RECORDING_DIR, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(RECORDING_DIR, f"{robot.getName().replace(' ', '_')}_{stamp}.wrun")
+        self.path = path
+
+        header = json.dumps({
+            "robot": robot.getName(),
+            "time_step": robot.getBasicTimeStep(),
+            "custom_data": custom_data,
+            "backend": backend,
+            "sonars": len(self.sonars),
+            "gps": self.gps is not None,
+            "compass": self.compass is not None,
+            "created": datetime.now().isoformat(),
+        }).encode("utf-8")
+        self.file = gzip.open(path, "wb", compresslevel=6)
+        self.file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+
+    def __getattr__(self, name):
+        return getattr(self.robot, name)
+
+    def step(self, time_step):
+        if self.file is None:
+            return -1
+        command = (self.left_motor.getVelocity(), self.right_motor.getVelocity())
+        result = self.robot.step(time_step)
+        if result == -1:
+            self.close()
+            return result
+
+        gps = self.gps.getValues() if self.gps else (0.0, 0.0, 0.0)
+        compass = self.compass.getValues() if self.compass else (0.0, 0.0, 1.0)
+        self.file.write(_TAG.pack(TAG_FRAME) + self.frame.pack(
+            self.robot.getTime(), *command, *gps[:3], *compass[:3],
+            *(s.getValue() for s in self.sonars)))
+        return result
+
+    def exchange(self, name, func):
+        """Call func and tape its JSON-serialisable result (or its error)"""
+        try:
+            value = func()
+        except Exception as e:
+            self._write_exchange({"name": name, "error": str(e)})
+            raise
+        self._write_exchange({"name": name, "value": value})
+        return value
+
+    def mark(self, record):
+        """Tape a JSON-serialisable annotation of the last frame"""
+        if self.file is None:
+            return
+        data = json.dumps(record).encode("utf-8")
+        self.file.write(_TAG.pack(TAG_MARK) + _LENGTH.pack(len(data)) + data)
+
+    def _write_exchange(self, record):
+        if self.file is None:
+            return
+        data = json.dumps(record).encode("utf-8")
+        self.file.write(_TAG.pack(TAG_EXCHANGE) + _LENGTH.pack(len(data)) + data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# ============================================
+# REPLAY
+# ============================================
+
+def read_recording(path):
+    """
+    Returns (header, frames, exchanges by name in call order, marks);
+    each mark carries "frame", the index of the frame it annotates
+    """
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a run recording")
+
+    offset = len(MAGIC)
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    header = json.loads(data[offset:offset + length])
+    offset += length
+
+    frame = frame_struct(header["sonars"])
+    frames = []
+    exchanges = collections.defaultdict(collections.deque)
+    marks = []
+    while offset < len(data):
+        (tag,) = _TAG.unpack_from(data, offset)
+        offset += _TAG.size
+        if tag == TAG_FRAME:
+            frames.append(frame.unpack_from(data, offset))
+            offset += frame.size
+        elif tag == TAG_EXCHANGE:
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            record = json.loads(data[offset:offset + length])
+            offset += length
+            exchanges[record["name"]].append(record)
+        elif tag == TAG_MARK:
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            record = json.loads(data[offset:offset + length])
+            offset += length
+            record["frame"] = len(frames) - 1
+            marks.append(record)
+        else:
+            raise ValueError(f"corrupt recording: tag {tag} at byte {offset}")
+    return header, frames, exchanges, marks
+
+
+class ReplayMotor:
+    def __init__(self):
+        self.velocity = 0.0
+
+    def setPosition(self, position):
+        pass
+
+    def setVelocity(self, velocity):
+        self.velocity = velocity
+
+    def getVelocity(self):
+        return self.velocity
+
+
+class ReplaySensor:
+    """GPS, compass or sonar serving one slice of the current frame"""
+
+    def __init__(self, robot, start, count=None):
+        self.robot = robot
+        self.start = start
+        self.count = count
+
+    def enable(self, period):
+        pass
+
+    def getValues(self):
+        return list(self.robot.frame[self.start:self.start + self.count])
+
+    def getValue(self):
+        return self.robot.frame[self.start]
+
+
+class ReplayRobot:
+    """Robot stand-in that plays a recording back into the controller"""
+
+    replaying = True
+
+    def __init__(self, path, overrides=None):
+        self.header, self.frames, self.exchanges, _ = read_recording(path)
+        self.index = -1
+        self.frame = (0.0,) * (9 + self.header["sonars"])
+
+        custom = dict(self.header["custom_data"])
+        custom.update({"RECORD": False, "OFFLINE": not self.header["backend"],
+                       "METRICS_PORT": 0, "LOG_DIR": ""})
+        custom.update(overrides or {})
+        self.custom_data = json.dumps(custom)
+
+        self.left_motor = ReplayMotor()
+        self.right_motor = ReplayMotor()
+        self.devices = {'left wheel': self.left_motor, 'right wheel': self.right_motor}
+        if self.header["gps"]:
+            self.devices['gps'] = ReplaySensor(self, 3, 3)
+        if self.header["compass"]:
+            self.devices['compass'] = ReplaySensor(self, 6, 3)
+        for i in range(self.header["sonars"]):
+            self.devices[f'so{i}'] = ReplaySensor(self, 9 + i)
+
+        self.first_divergence = None
+        self.max_command_error = 0.0
+
+    def getBasicTimeStep(self):
+        return self.header["time_step"]
+
+    def getName(self):
+        return self.header["robot"]
+
+    def getCustomData(self):
+        return self.custom_data
+
+    def getTime(self):
+        return self.frame[0]
+
+    def getDevice(self, name):
+        return self.devices.get(name)
+
+    def step(self, time_step):
+        if self.index + 1 >= len(self.frames):
+            return -1
+        self.index += 1
+        self.frame = self.frames[self.index]
+
+        error = max(abs(self.left_motor.velocity - self.frame[1]),
+                    abs(self.right_motor.velocity - self.frame[2]))
+        if error > self.max_command_error:
+            self.max_command_error = error
+        if error > 1e-9 and self.first_divergence is None:
+            self.first_divergence = self.index
+        return 0
+
+    def exchange(self, name, func):
+        """Serve the next taped reply instead of calling func"""
+        pending = self.exchanges.get(name)
+        if not pending:
+            raise ReplayedError(f"no recorded '{name}' reply left")
+        record = pending.popleft()
+        if "error" in record:
+            raise ReplayedError(record["error"])
+        return record["value"]
+
+
+def replay(path, overrides=None, quiet=True):
+    """Replay a recording through the controller and summarise it"""
+    from headless_sim import run_controller   # only needed on the replay side
+
+    robot = ReplayRobot(path, overrides)
+    start = time.perf_counter()
+    agent = run_controller(robot, quiet=quiet)
+    wall = time.perf_counter() - start
+    steps = robot.index + 1
+    return {
+        "steps": steps,
+        "recorded_steps": len(robot.frames),
+        "sim_time": robot.getTime(),
+        "wall_time": wall,
+        "steps_per_second": steps / wall if wall else 0.0,
+        "first_divergence": robot.first_divergence,
+        "max_command_error": robot.max_command_error,
+        "tasks_completed": agent.tasks_completed,
+        "task_failures": agent.task_failures,
+        "energy": agent.total_energy_consumed,
+        "battery": agent.battery_level,
+    }
+
+
+def main():
+    from headless_sim import parse_overrides
+
+    parser = argparse.ArgumentParser(description="Replay a recorded controller run")
+    parser.add_argument("recording")
+    parser.add_argument("--set", nargs="*", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--verbose", action="store_true", help="show controller output")
+    args = parser.parse_args()
+
+    result = replay(args.recording, parse_overrides(args.set), quiet=not args.verbose)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
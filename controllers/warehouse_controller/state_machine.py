@@ -0,0 +1,119 @@
+"""
+STATE MACHINE - Table-driven task state machine with integer state codes
+Each state code indexes one row of the table: the action run on every
+step in the state, a dwell (steps in the state before its DWELL
+transition fires) and guarded transitions checked in order after the
+action. Dispatch is a list lookup, not a chain of string compares.
+
+    (guard, target, effect)   guard() true: enter target (None leaves
+                              the choice to effect), then run effect()
+    (DWELL, target, effect)   true once the state has run dwell steps
+
+Every entry is counted and the time spent in the state left is added
+up as it happens, so entry counts and time per state cost nothing
+extra; the metrics endpoint reads them from here. on_enter, when set,
+is called with each state entered (run recordings tape them).
+
+Usage:
+    fsm = StateMachine(TASK_STATES, clock=robot.getTime)
+    fsm.define(AT_PICKUP, action=stop_wheels, dwell=40,
+               transitions=[(DWELL, None, load)])
+    fsm.step()                  # once per control step
+    fsm.enter(GOING_TO_SHELF)   # from outside the table (preemption)
+"""
+
+# Codes go over the wire in binary telemetry: append new states, never reorder
+TASK_STATES = (
+    "INITIALIZING",
+    "GOING_TO_PICKUP", "AT_PICKUP",
+    "GOING_TO_SHELF", "AT_SHELF",
+    "GOING_TO_DELIVERY", "AT_DELIVERY",
+    "GOING_TO_CHARGE", "CHARGING",
+    "AWAITING_TASK",
+    "RECOVERY_REVERSE", "RECOVERY_TURN",
+)
+(INITIALIZING,
+ GOING_TO_PICKUP, AT_PICKUP,
+ GOING_TO_SHELF, AT_SHELF,
+ GOING_TO_DELIVERY, AT_DELIVERY,
+ GOING_TO_CHARGE, CHARGING,
+ AWAITING_TASK,
+ RECOVERY_REVERSE, RECOVERY_TURN) = range(len(TASK_STATES))
+STATE_CODES = {name: code for code, name in enumerate(TASK_STATES)}
+
+# Guard of the transition taken once a state's dwell has elapsed
+DWELL = "dwell"
+
+
+class StateMachine:
+    """Current state, its table row and per-state entry counts and time"""
+
+    __slots__ = ("names", "clock", "state", "steps", "entered_at", "now",
+                 "actions", "dwells", "transitions", "entries", "seconds", "on_enter")
+
+    def __init__(self, names, clock, initial=0):
+        count = len(names)
+        self.names = names
+        self.clock = clock
+        self.actions = [None] * count
+        self.dwells = [0] * count
+        self.transitions = [()] * count
+
+        self.entries = [0] * count
+        self.seconds = [0.0] * count
+        self.state = initial
+        self.steps = 0              # steps run in the current state
+        self.now = self.entered_at = clock()
+        self.entries[initial] = 1
+        self.on_enter = None
+
+    def define(self, state, action=None, dwell=0, transitions=()):
+        self.actions[state] = action
+        self.dwells[state] = dwell
+        self.transitions[state] = tuple(transitions)
+
+    @property
+    def name(self):
+        return self.names[self.state]
+
+    def enter(self, state):
+        now = self.clock()
+        self.seconds[self.state] += now - self.entered_at
+        self.entries[state] += 1
+        self.state = state
+        self.steps = 0
+        self.entered_at = self.now = now
+        if self.on_enter is not None:
+            self.on_enter(state)
+
+    def step(self):
+        """Run the current state's action and its first passing transition"""
+        state = self.state
+        self.steps += 1
+        self.now = self.clock()
+        action = self.actions[state]
+        if action is not None:
+            action()
+        for guard, target, effect in self.transitions[state]:
+            if self.steps > self.dwells[state] if guard is DWELL else guard():
+                if target is not None:
+                    self.enter(target)
+                if effect is not None:
+                    effect()
+                return True
+        return False
+
+    # ============================================
+    # STATISTICS
+    # ============================================
+
+    def entries_snapshot(self):
+        """Entries per state name, states never entered left out"""
+        return {self.names[code]: count for code, count in enumerate(self.entries) if count}
+
+    def dwell_snapshot(self):
+        """Seconds per state name including the ongoing state, as of the last step"""
+        seconds = list(self.seconds)
+        seconds[self.state] += self.now - self.entered_at
+        return {self.names[code]: total for code, total in enumerate(seconds)
+                if self.entries[code]}
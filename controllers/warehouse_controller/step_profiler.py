@@ -0,0 +1,152 @@
+"""
+STEP PROFILER - Control-loop latency instrumentation
+Monotonic timers around each phase of a robot.step iteration,
+HDR-style log-linear latency histograms and overrun counters
+against the TIME_STEP budget.
+
+When disabled, phase() hands back a shared no-op context and the
+controller skips its per-step timing calls, so the cost is at most a
+boolean check.
+"""
+
+import contextlib
+import json
+import os
+import time
+
+PROFILE_DIR = os.path.join("warehouse_data", "profiles")
+
+# Histogram resolution: sub-buckets per power of two (16 -> ~6% relative error)
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class LatencyHistogram:
+    """Log-linear histogram of microsecond latencies (HDR histogram layout)"""
+
+    def __init__(self):
+        self.counts = []
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return SUB_BUCKETS + shift * SUB_BUCKETS + ((value >> shift) - SUB_BUCKETS)
+
+    @staticmethod
+    def _lower_bound(index):
+        if index < SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index - SUB_BUCKETS, SUB_BUCKETS)
+        return (SUB_BUCKETS + sub) << shift
+
+    def record(self, elapsed_ns):
+        value = elapsed_ns // 1000
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.total += 1
+        self.sum_us += value
+        if value > self.max_us:
+            self.max_us = value
+
+    def percentile(self, pct):
+        if not self.total:
+            return 0
+        target = self.total * pct / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return self._lower_bound(index)
+        return self.max_us
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "mean_us": round(self.sum_us / self.total, 1) if self.total else 0.0,
+            "p50_us": self.percentile(50),
+            "p90_us": self.percentile(90),
+            "p99_us": self.percentile(99),
+            "max_us": self.max_us,
+        }
+
+
+class StepProfiler:
+    """Per-phase latency histograms for the controller step loop"""
+
+    def __init__(self, robot_id, time_step_ms, enabled=False, export_every=1000):
+        self.robot_id = robot_id
+        self.enabled = enabled
+        self.budget_ns = int(time_step_ms * 1_000_000)
+        self.export_every = export_every
+
+        self.histograms = {}
+        self.steps = 0
+        self.overruns = 0
+        self._step_start = 0
+        self._last_end = 0
+
+    def record(self, phase, elapsed_ns):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = LatencyHistogram()
+        histogram.record(elapsed_ns)
+
+    @contextlib.contextmanager
+    def _timed(self, phase):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter_ns() - start)
+
+    def phase(self, name):
+        """Context manager timing one phase (no-op when disabled)"""
+        if not self.enabled:
+            return _NULL_PHASE
+        return self._timed(name)
+
+    def begin_step(self):
+        """Call right after robot.step returns"""
+        now = time.perf_counter_ns()
+        if self._last_end:
+            self.record("sim_step", now - self._last_end)
+        self._step_start = now
+
+    def end_step(self):
+        """Call at the end of the loop body; counts budget overruns"""
+        now = time.perf_counter_ns()
+        busy = now - self._step_start
+        self.record("step", busy)
+        if busy > self.budget_ns:
+            self.overruns += 1
+        self._last_end = now
+        self.steps += 1
+        if self.export_every and self.steps % self.export_every == 0:
+            self.export()
+
+    def snapshot(self):
+        return {
+            "steps": self.steps,
+            "overruns": self.overruns,
+            "overrun_rate": round(self.overruns / self.steps, 4) if self.steps else 0.0,
+            "budget_us": self.budget_ns // 1000,
+            "phases": {name: h.summary() for name, h in sorted(self.histograms.items())},
+        }
+
+    def export(self):
+        """Append the current snapshot to the local profile file"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        filename = os.path.join(PROFILE_DIR, f"{self.robot_id}_profile.jsonl")
+        record = {"robot_id": self.robot_id, "timestamp": time.time()}
+        record.update(self.snapshot())
+        with open(filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,135 @@
+"""
+SWEEP RUNNER - Parallel parameter sweeps over the headless controller
+Fans a parameter grid or random search out over all CPU cores,
+aggregates tasks completed, failures and energy per configuration
+and writes a ranked results table.
+
+Usage:
+    python sweep_runner.py --grid GOAL_TOLERANCE=0.3,0.4,0.5 CRUISE_SPEED=2.5,3.0,3.5
+    python sweep_runner.py --random 64 --range CRUISE_SPEED=2.0:4.5 KP_ANGULAR=1.0:3.0
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from headless_sim import parse_value, run_headless
+
+RESULTS_DIR = os.path.join("warehouse_data", "sweeps")
+
+
+def grid_configs(grid):
+    """Cartesian product of {name: [values]}"""
+    names = sorted(grid)
+    for values in itertools.product(*(grid[n] for n in names)):
+        yield dict(zip(names, values))
+
+
+def random_configs(ranges, count, seed=0):
+    """Uniform random search over {name: (low, high)}"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield {name: round(rng.uniform(low, high), 4) for name, (low, high) in sorted(ranges.items())}
+
+
+def run_config(config, seeds, duration):
+    """Worker: run one configuration over several seeds"""
+    runs = [run_headless(config, duration=duration, seed=seed) for seed in seeds]
+    n = len(runs)
+    tasks = sum(r["tasks_completed"] for r in runs)
+    energy = sum(r["energy"] for r in runs)
+    return {
+        "config": config,
+        "tasks_completed": tasks / n,
+        "task_failures": sum(r["task_failures"] for r in runs) / n,
+        "energy": energy / n,
+        "energy_per_task": energy / tasks if tasks else float('inf'),
+        "tasks_per_hour": tasks / n / (duration / 3600.0),
+    }
+
+
+def rank(results):
+    """Most tasks first, then fewest failures, then least energy per task"""
+    return sorted(results, key=lambda r: (-r["tasks_completed"], r["task_failures"],
+                                          r["energy_per_task"]))
+
+
+def write_results(ranked, path):
+    param_names = sorted({k for r in ranked for k in r["config"]})
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank"] + param_names + ["tasks_completed", "task_failures",
+                                                  "energy", "energy_per_task", "tasks_per_hour"])
+        for i, r in enumerate(ranked, 1):
+            writer.writerow([i] + [r["config"].get(n) for n in param_names] + [
+                round(r["tasks_completed"], 2), round(r["task_failures"], 2),
+                round(r["energy"], 3), round(r["energy_per_task"], 3),
+                round(r["tasks_per_hour"], 1)])
+
+
+def sweep(configs, seeds, duration, workers=None):
+    configs = list(configs)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(run_config, c, seeds, duration) for c in configs]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            print(f"\r⚙️  {done}/{len(configs)} configurations", end="", flush=True)
+    print()
+    return rank(results)
+
+
+def parse_grid(pairs):
+    return {name: [parse_value(v) for v in values.split(",")]
+            for name, values in (p.split("=", 1) for p in pairs)}
+
+
+def parse_ranges(pairs):
+    ranges = {}
+    for name, span in (p.split("=", 1) for p in pairs):
+        low, high = span.split(":")
+        ranges[name] = (float(low), float(high))
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel headless parameter sweep")
+    parser.add_argument("--grid", nargs="*", default=[], metavar="NAME=V1,V2,...")
+    parser.add_argument("--random", type=int, default=0, help="number of random configurations")
+    parser.add_argument("--range", nargs="*", default=[], metavar="NAME=LOW:HIGH")
+    parser.add_argument("--seeds", type=int, default=3, help="scenarios per configuration")
+    parser.add_argument("--duration", type=float, default=600.0, help="simulated seconds per run")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.random:
+        configs = random_configs(parse_ranges(args.range), args.random)
+    else:
+        configs = grid_configs(parse_grid(args.grid))
+
+    started = time.perf_counter()
+    ranked = sweep(configs, list(range(args.seeds)), args.duration, args.workers)
+    elapsed = time.perf_counter() - started
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    write_results(ranked, path)
+
+    print(f"\n{'='*70}")
+    print(f"📊 SWEEP RESULTS - {len(ranked)} configs x {args.seeds} seeds in {elapsed:.1f}s")
+    print(f"{'='*70}")
+    for i, r in enumerate(ranked[:args.top], 1):
+        params = ", ".join(f"{k}={v}" for k, v in r["config"].items())
+        print(f"{i:3d}. {r['tasks_completed']:6.1f} tasks  {r['task_failures']:4.1f} fails  "
+              f"{r['energy_per_task']:6.2f}%/task  |  {params}")
+    print(f"\n💾 Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+TELEMETRY CODEC - Compact binary telemetry frames
+A frame batches one robot's samples behind a fixed header:
+
+    header   struct FRAME_HEADER: magic b"WTEL", version, sample count,
+             body length (bytes after the header)
+    body     robot id, run id, goal zone table (varint length + UTF-8 each)
+             then per sample: state code (TASK_STATES index, 1 byte),
+             goal (table index + 1, 0 = none) and the FIELDS as zigzag
+             varints of their quantized values
+
+Values are quantized to the precision the JSON telemetry is rounded to,
+so decoding gives back the same numbers. DELTA fields are stored as the
+change since the previous sample of the frame (the first sample against
+zero), so a robot crawling across the floor costs one or two bytes per
+coordinate. Every frame starts from zero again: a lost frame loses only
+its own samples. About 15 bytes per sample against ~500 for the JSON
+dict; the icon, trigger, energy breakdown and profile are not sent.
+
+Frames concatenate, so an archive file is just frames appended one
+after another (DataStorage.save_telemetry_frame, read by
+run_analytics.load_telemetry). backend/telemetry_codec.js decodes the
+same layout on the AI server.
+
+Usage:
+    encoder = TelemetryEncoder(batch_size=10, max_delay=2.0)
+    encoder.add(telemetry)                   # the JSON telemetry dict
+    if encoder.ready():
+        frame = encoder.flush()              # bytes, one POST
+    samples = decode_frames(frame)           # list of telemetry dicts
+"""
+
+import struct
+
+from state_machine import TASK_STATES, STATE_CODES
+
+MAGIC = b"WTEL"
+VERSION = 1
+CONTENT_TYPE = "application/x-warehouse-telemetry"
+
+FRAME_HEADER = struct.Struct("<4sBHI")
+
+DELTA, ABSOLUTE = 0, 1
+
+# (telemetry key, scale, coding) in wire order; append only
+FIELDS = (
+    ("sim_time", 1000, DELTA),
+    ("position_x", 10000, DELTA),
+    ("position_y", 10000, DELTA),
+    ("battery", 100, DELTA),
+    ("distance_to_goal", 1000, ABSOLUTE),
+    ("tasks_completed", 1, DELTA),
+    ("task_failures", 1, DELTA),
+    ("total_energy", 1000, DELTA),
+    ("task_energy", 1000, ABSOLUTE),
+)
+
+# Samples per frame, and seconds (sim time) the oldest sample may wait
+BATCH_SIZE = 10
+MAX_DELAY = 2.0
+
+
+class TelemetryFormatError(ValueError):
+    pass
+
+
+# ============================================
+# VARINTS
+# ============================================
+
+def put_varint(buffer, value):
+    """Append an unsigned LEB128 varint"""
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def put_signed(buffer, value):
+    put_varint(buffer, (value << 1) if value >= 0 else ((-value << 1) - 1))
+
+
+def get_varint(data, offset):
+    """(value, next offset)"""
+    value = shift = 0
+    while True:
+        try:
+            byte = data[offset]
+        except IndexError:
+            raise TelemetryFormatError("truncated varint") from None
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def get_signed(data, offset):
+    value, offset = get_varint(data, offset)
+    return (value >> 1) ^ -(value & 1), offset
+
+
+def put_text(buffer, text):
+    raw = (text or "").encode("utf-8")
+    put_varint(buffer, len(raw))
+    buffer += raw
+
+
+def get_text(data, offset):
+    length, offset = get_varint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise TelemetryFormatError("truncated string")
+    return bytes(data[offset:end]).decode("utf-8"), end
+
+
+# ============================================
+# ENCODER
+# ============================================
+
+class TelemetryEncoder:
+    """Collects telemetry dicts and packs them into frames"""
+
+    def __init__(self, batch_size=BATCH_SIZE, max_delay=MAX_DELAY):
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.samples = []
+
+    def add(self, telemetry):
+        self.samples.append(telemetry)
+
+    def ready(self):
+        """A full batch, or the oldest sample has waited max_delay"""
+        samples = self.samples
+        if not samples:
+            return False
+        return (len(samples) >= self.batch_size
+                or samples[-1]["sim_time"] - samples[0]["sim_time"] >= self.max_delay)
+
+    def flush(self):
+        """Frame of everything collected (None when empty)"""
+        if not self.samples:
+            return None
+        frame = encode_frame(self.samples)
+        self.samples = []
+        return frame
+
+
+def encode_frame(samples):
+    """One frame of telemetry dicts, all from the same robot and run"""
+    first = samples[0]
+    goals = []
+    goal_index = {}
+    for sample in samples:
+        goal = sample.get("current_goal")
+        if goal and goal not in goal_index:
+            goal_index[goal] = len(goals) + 1
+            goals.append(goal)
+
+    body = bytearray()
+    put_text(body, first.get("robot_id"))
+    put_text(body, str(first.get("run_id") or ""))
+    put_varint(body, len(goals))
+    for goal in goals:
+        put_text(body, goal)
+
+    previous = [0] * len(FIELDS)
+    for sample in samples:
+        body.append(STATE_CODES.get(sample.get("task_state"), 0xFF))
+        put_varint(body, goal_index.get(sample.get("current_goal"), 0))
+        for i, (key, scale, coding) in enumerate(FIELDS):
+            value = int(round((sample.get(key) or 0) * scale))
+            if coding == DELTA:
+                put_signed(body, value - previous[i])
+                previous[i] = value
+            else:
+                put_signed(body, value)
+
+    return FRAME_HEADER.pack(MAGIC, VERSION, len(samples), len(body)) + bytes(body)
+
+
+# ============================================
+# DECODER
+# ============================================
+
+def decode_frame(data, offset=0):
+    """(telemetry dicts, offset after the frame) for the frame at offset"""
+    if len(data) - offset < FRAME_HEADER.size:
+        raise TelemetryFormatError("truncated frame header")
+    magic, version, count, length = FRAME_HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise TelemetryFormatError(f"bad magic {magic!r}")
+    if version != VERSION:
+        raise TelemetryFormatError(f"unsupported version {version}")
+    pos = offset + FRAME_HEADER.size
+    end = pos + length
+    if end > len(data):
+        raise TelemetryFormatError("truncated frame body")
+    body = memoryview(data)[:end]
+
+    robot_id, pos = get_text(body, pos)
+    run_id, pos = get_text(body, pos)
+    goal_count, pos = get_varint(body, pos)
+    goals = [None]
+    for _ in range(goal_count):
+        goal, pos = get_text(body, pos)
+        goals.append(goal)
+
+    samples = []
+    values = [0] * len(FIELDS)
+    for _ in range(count):
+        if pos >= end:
+            raise TelemetryFormatError("truncated sample")
+        code = body[pos]
+        goal, pos = get_varint(body, pos + 1)
+        sample = {
+            "robot_id": robot_id,
+            "run_id": run_id or None,
+            "task_state": TASK_STATES[code] if code < len(TASK_STATES) else "UNKNOWN",
+            "current_goal": goals[goal] if goal < len(goals) else None,
+            "position_z": 0,
+            "status": "active",
+        }
+        for i, (key, scale, coding) in enumerate(FIELDS):
+            value, pos = get_signed(body, pos)
+            values[i] = values[i] + value if coding == DELTA else value
+            sample[key] = values[i] if scale == 1 else values[i] / scale
+        samples.append(sample)
+
+    if pos != end:
+        raise TelemetryFormatError("frame body length mismatch")
+    return samples, end
+
+
+def decode_frames(data):
+    """Telemetry dicts of every frame in data (frames back to back)"""
+    samples = []
+    offset = 0
+    while offset < len(data):
+        frame, offset = decode_frame(data, offset)
+        samples.extend(frame)
+    return samples
+
+
+def read_archive(path):
+    """Telemetry dicts from a file of appended frames"""
+    with open(path, "rb") as f:
+        return decode_frames(f.read())
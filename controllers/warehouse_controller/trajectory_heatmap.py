@@ -0,0 +1,343 @@
+"""
+TRAJECTORY HEATMAP - Spatial aggregation of historical telemetry
+Rasterizes every robot's trajectory (linearly between telemetry samples)
+into a grid of dwell time, travel time, mean speed, stall time and
+stuck events, then flags congested cells that recur across runs and
+groups them into bottleneck areas and aisles.
+
+Outputs a .npz with all layers plus a navigation cost map, a CSV of one
+layer, a JSON list of bottlenecks and a PNG heatmap (written with zlib,
+no imaging library needed).
+
+Usage:
+    python trajectory_heatmap.py                       # warehouse_data -> warehouse_data/heatmaps
+    python trajectory_heatmap.py --cell 0.2 --layer stall_s
+"""
+
+import argparse
+import json
+import os
+import struct
+import zlib
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from run_analytics import DATA_DIR, STALL_SPEED, load_telemetry
+
+HEATMAP_DIR = os.path.join(DATA_DIR, "heatmaps")
+
+GRID_CELL = 0.25           # m
+MAX_SUBSTEPS = 64          # rasterization points per telemetry interval
+
+# A cell is congested when its score is this many standard deviations
+# above the mean of visited cells; persistent when congested in at least
+# PERSISTENCE of the runs that passed through it
+CONGESTION_SIGMA = 2.0
+PERSISTENCE = 0.5
+STUCK_EVENT_WEIGHT = 10.0  # seconds of congestion one stuck event counts as
+
+# Navigation cost: 1 in free space, up to 1 + COST_WEIGHT in the worst cell
+COST_WEIGHT = 4.0
+
+# Regions at least this long and this elongated are reported as aisles
+AISLE_MIN_CELLS = 3
+AISLE_ASPECT = 3.0
+
+LAYERS = ("dwell_s", "travel_s", "mean_speed", "stall_s", "stuck_events", "samples")
+
+
+class Grid:
+    """Regular grid over the ground plane; row 0 is the lowest y"""
+
+    def __init__(self, bounds, cell=GRID_CELL):
+        x_min, x_max, y_min, y_max = bounds
+        self.cell = cell
+        self.x_min = np.floor(x_min / cell) * cell
+        self.y_min = np.floor(y_min / cell) * cell
+        self.cols = max(int(np.ceil((x_max - self.x_min) / cell)), 1)
+        self.rows = max(int(np.ceil((y_max - self.y_min) / cell)), 1)
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    @property
+    def bounds(self):
+        return (float(self.x_min), float(self.x_min + self.cols * self.cell),
+                float(self.y_min), float(self.y_min + self.rows * self.cell))
+
+    def index(self, x, y):
+        col = np.clip(((x - self.x_min) / self.cell).astype(int), 0, self.cols - 1)
+        row = np.clip(((y - self.y_min) / self.cell).astype(int), 0, self.rows - 1)
+        return row * self.cols + col
+
+    def center(self, row, col):
+        return (round(float(self.x_min + (col + 0.5) * self.cell), 3),
+                round(float(self.y_min + (row + 0.5) * self.cell), 3))
+
+    def accumulate(self, flat_index, weights=None):
+        return np.bincount(flat_index, weights=weights,
+                           minlength=self.rows * self.cols).reshape(self.shape)
+
+
+def trajectory_points(tel, cell=GRID_CELL):
+    """
+    Points along each telemetry interval, spaced about half a cell apart.
+    Each point carries an equal share of the interval's duration.
+    Returns dict of arrays: x, y, weight, speed, travel, stalled, segment.
+    """
+    has_pos = np.isfinite(tel.x) & np.isfinite(tel.y)
+    valid = (tel.dt > 0) & has_pos & np.append(has_pos[1:], False)
+    start = np.flatnonzero(valid)
+    if not start.size:
+        return None
+
+    x0, y0 = tel.x[start], tel.y[start]
+    dx, dy = tel.x[start + 1] - x0, tel.y[start + 1] - y0
+    length = np.hypot(dx, dy)
+    dt = tel.dt[start]
+    speed = length / dt
+
+    counts = np.clip(np.ceil(length / (cell / 2)), 1, MAX_SUBSTEPS).astype(int)
+    owner = np.repeat(np.arange(start.size), counts)
+    # Position of each point within its interval: (k + 0.5) / count
+    offsets = np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    frac = (offsets + 0.5) / counts[owner]
+
+    travel = (tel.category_mask("travel") | tel.category_mask("charging"))[start]
+    segment = np.cumsum(np.append(True, ~tel.same))
+    return {
+        "x": x0[owner] + frac * dx[owner],
+        "y": y0[owner] + frac * dy[owner],
+        "weight": dt[owner] / counts[owner],
+        "speed": speed[owner],
+        "travel": travel[owner],
+        "stalled": (travel & (speed < STALL_SPEED))[owner],
+        "segment": segment[start][owner],
+    }
+
+
+def build_layers(tel, grid, points):
+    """Per-cell dwell/travel/stall seconds, speed, stuck events and sample counts"""
+    layers = {name: np.zeros(grid.shape) for name in LAYERS}
+
+    has_pos = np.isfinite(tel.x) & np.isfinite(tel.y)
+    if np.any(has_pos):
+        sample_cells = grid.index(tel.x[has_pos], tel.y[has_pos])
+        layers["samples"] = grid.accumulate(sample_cells)
+        stuck = tel.increments(tel.failures)[has_pos]
+        layers["stuck_events"] = grid.accumulate(sample_cells, stuck)
+
+    if points is None:
+        return layers
+
+    cells = grid.index(points["x"], points["y"])
+    w = points["weight"]
+    travel = points["travel"]
+    layers["dwell_s"] = grid.accumulate(cells, w)
+    layers["travel_s"] = grid.accumulate(cells[travel], w[travel])
+    layers["stall_s"] = grid.accumulate(cells[points["stalled"]], w[points["stalled"]])
+    speed_sum = grid.accumulate(cells[travel], (w * points["speed"])[travel])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        layers["mean_speed"] = np.where(layers["travel_s"] > 0, speed_sum / layers["travel_s"], 0.0)
+    return layers
+
+
+def congestion_score(travel_s, mean_speed, stall_s, stuck_events, free_speed):
+    """Travel time weighted by slowdown, plus stall time and stuck events"""
+    slowdown = np.clip(1.0 - mean_speed / free_speed, 0.0, 1.0) if free_speed > 0 else 0.0
+    return travel_s * slowdown + stall_s + STUCK_EVENT_WEIGHT * stuck_events
+
+
+def _flag(score, visited):
+    values = score[visited]
+    if values.size < 2:
+        return np.zeros_like(score, dtype=bool)
+    threshold = values.mean() + CONGESTION_SIGMA * values.std()
+    return visited & (score > threshold) & (score > 0)
+
+
+def detect_bottlenecks(grid, points, layers):
+    """
+    Flag cells congested in at least PERSISTENCE of the runs that visited
+    them, and group neighbouring flagged cells into regions.
+    Returns (persistent mask, persistence matrix, score matrix, regions).
+    """
+    if points is None:
+        empty = np.zeros(grid.shape)
+        return empty.astype(bool), empty, empty, []
+
+    travel = points["travel"]
+    free_speed = np.percentile(points["speed"][travel], 90) if np.any(travel) else 0.0
+    score = congestion_score(layers["travel_s"], layers["mean_speed"], layers["stall_s"],
+                             layers["stuck_events"], free_speed)
+
+    # Same score per run (telemetry segment) to test persistence
+    cells = grid.index(points["x"], points["y"])
+    segments, run = np.unique(points["segment"], return_inverse=True)
+    n_cells = grid.rows * grid.cols
+    flat = run * n_cells + cells
+    size = segments.size * n_cells
+    w = points["weight"]
+    run_travel = np.bincount(flat[travel], w[travel], minlength=size).reshape(segments.size, n_cells)
+    run_speed = np.bincount(flat[travel], (w * points["speed"])[travel],
+                            minlength=size).reshape(segments.size, n_cells)
+    stalled = points["stalled"]
+    run_stall = np.bincount(flat[stalled], w[stalled], minlength=size).reshape(segments.size, n_cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        run_mean_speed = np.where(run_travel > 0, run_speed / run_travel, 0.0)
+    run_score = congestion_score(run_travel, run_mean_speed, run_stall, 0.0, free_speed)
+
+    run_visited = run_travel > 0
+    run_flags = np.array([_flag(run_score[r], run_visited[r]) for r in range(segments.size)])
+    visits = run_visited.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        persistence = np.where(visits > 0, run_flags.sum(axis=0) / visits, 0.0).reshape(grid.shape)
+
+    flagged = _flag(score, layers["travel_s"] > 0) | (layers["stuck_events"] > 0)
+    persistent = flagged & ((persistence >= PERSISTENCE) | (layers["stuck_events"] > 0))
+    return persistent, persistence, score, label_regions(grid, persistent, score, persistence)
+
+
+def label_regions(grid, mask, score, persistence):
+    """4-connected components of mask, worst first"""
+    seen = np.zeros_like(mask, dtype=bool)
+    regions = []
+    for row, col in zip(*np.nonzero(mask)):
+        if seen[row, col]:
+            continue
+        cells = []
+        queue = deque([(row, col)])
+        seen[row, col] = True
+        while queue:
+            r, c = queue.popleft()
+            cells.append((r, c))
+            for nr, nc in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                if 0 <= nr < grid.rows and 0 <= nc < grid.cols and mask[nr, nc] and not seen[nr, nc]:
+                    seen[nr, nc] = True
+                    queue.append((nr, nc))
+
+        rows = np.array([r for r, _ in cells])
+        cols = np.array([c for _, c in cells])
+        height = rows.max() - rows.min() + 1
+        width = cols.max() - cols.min() + 1
+        length = max(height, width)
+        if length >= AISLE_MIN_CELLS and length >= AISLE_ASPECT * min(height, width):
+            kind = "aisle_x" if width > height else "aisle_y"
+        else:
+            kind = "area"
+        x0, y0 = grid.center(rows.min(), cols.min())
+        x1, y1 = grid.center(rows.max(), cols.max())
+        cx, cy = grid.center(rows.mean(), cols.mean())
+        regions.append({
+            "kind": kind,
+            "cells": len(cells),
+            "center": {"x": cx, "y": cy},
+            "bounds": {"x_min": x0, "x_max": x1, "y_min": y0, "y_max": y1},
+            "score": round(float(score[rows, cols].sum()), 2),
+            "persistence": round(float(persistence[rows, cols].mean()), 3),
+        })
+    return sorted(regions, key=lambda r: -r["score"])
+
+
+def cost_map(score):
+    """Navigation cost per cell: 1 + COST_WEIGHT * normalized congestion"""
+    peak = score.max() if score.size else 0.0
+    return 1.0 + COST_WEIGHT * (score / peak if peak > 0 else score)
+
+
+# ============================================
+# OUTPUT
+# ============================================
+
+def colorize(matrix, highlight=None, scale=8):
+    """Log-scaled 'hot' colormap as an RGB uint8 image, y axis pointing up"""
+    values = np.log1p(np.clip(matrix, 0.0, None))
+    peak = values.max()
+    v = values / peak if peak > 0 else values
+    rgb = np.stack([np.clip(3 * v, 0, 1), np.clip(3 * v - 1, 0, 1), np.clip(3 * v - 2, 0, 1)], axis=-1)
+    if highlight is not None:
+        rgb[highlight] = 0.5 * rgb[highlight] + 0.5 * np.array([0.0, 0.6, 1.0])
+    image = (rgb[::-1] * 255).astype(np.uint8)
+    return np.repeat(np.repeat(image, scale, axis=0), scale, axis=1)
+
+
+def write_png(path, rgb):
+    height, width, _ = rgb.shape
+    raw = b"".join(b"\x00" + rgb[row].tobytes() for row in range(height))
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 9)))
+        f.write(chunk(b"IEND", b""))
+
+
+def build_heatmap(data_dir=DATA_DIR, cell=GRID_CELL, bounds=None):
+    tel = load_telemetry(os.path.join(data_dir, "telemetry"))
+    if bounds is None:
+        has_pos = np.isfinite(tel.x) & np.isfinite(tel.y)
+        if not np.any(has_pos):
+            raise ValueError("telemetry has no positions to map")
+        bounds = (tel.x[has_pos].min() - cell, tel.x[has_pos].max() + cell,
+                  tel.y[has_pos].min() - cell, tel.y[has_pos].max() + cell)
+    grid = Grid(bounds, cell)
+    points = trajectory_points(tel, cell)
+    layers = build_layers(tel, grid, points)
+    persistent, persistence, score, regions = detect_bottlenecks(grid, points, layers)
+    layers["congestion"] = score
+    layers["persistence"] = persistence
+    layers["cost"] = cost_map(score)
+    return grid, layers, persistent, regions
+
+
+def save_heatmap(grid, layers, persistent, regions, out_dir=HEATMAP_DIR, layer="dwell_s", scale=8):
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"heatmap_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    np.savez_compressed(stem + ".npz", bounds=np.array(grid.bounds), cell=grid.cell,
+                        bottleneck=persistent, **layers)
+    np.savetxt(stem + f"_{layer}.csv", layers[layer][::-1], delimiter=",", fmt="%.3f")
+    with open(stem + "_bottlenecks.json", "w") as f:
+        json.dump({"bounds": grid.bounds, "cell": grid.cell, "regions": regions}, f, indent=2)
+    write_png(stem + ".png", colorize(layers[layer], persistent, scale))
+    return stem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trajectory heatmap and bottleneck detector")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out-dir", default=HEATMAP_DIR)
+    parser.add_argument("--cell", type=float, default=GRID_CELL, help="grid cell size (m)")
+    parser.add_argument("--layer", default="dwell_s",
+                        choices=LAYERS + ("congestion", "persistence", "cost"))
+    parser.add_argument("--scale", type=int, default=8, help="image pixels per cell")
+    args = parser.parse_args()
+
+    try:
+        grid, layers, persistent, regions = build_heatmap(args.data_dir, args.cell)
+    except ValueError:
+        print(f"❌ No positions in {os.path.join(args.data_dir, 'telemetry')}: "
+              f"the telemetry predates the position_x/position_y fields")
+        raise SystemExit(1)
+    stem = save_heatmap(grid, layers, persistent, regions, args.out_dir, args.layer, args.scale)
+
+    print(f"\n{'='*70}")
+    print(f"🗺️  HEATMAP - {grid.rows}x{grid.cols} cells of {grid.cell} m, "
+          f"{int(persistent.sum())} bottleneck cells")
+    print(f"{'='*70}")
+    for region in regions[:10]:
+        c = region["center"]
+        print(f"   {region['kind']:8s} at ({c['x']:6.2f}, {c['y']:6.2f})  "
+              f"{region['cells']:3d} cells  score {region['score']:8.1f}  "
+              f"persistence {region['persistence']:.0%}")
+    print(f"\n💾 Saved {stem}.npz/.png/_bottlenecks.json/_{args.layer}.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+WAREHOUSE LAYOUT - Declarative layout file compiled into a zone model
+warehouse_layout.json describes the floor: pickup, shelf, delivery and
+charger zones (circles on the x/z ground plane), obstacles, aisles, the
+GPS offset and the floor bounds. load_layout() validates it once and
+compiles it into a ZoneModel (coordinate arrays, a grid spatial index
+and the zone distance matrix) that controllers, simulators and
+allocators share instead of each recomputing geometry.
+
+Usage:
+    python warehouse_layout.py                         # validate the default layout
+    python warehouse_layout.py my_layout.json --json   # compiled summary as JSON
+"""
+
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+LAYOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warehouse_layout.json")
+
+# Zone kinds, in task order; the compiled model stores them as these codes
+ZONE_KINDS = ("pickup", "shelf", "delivery", "charger")
+
+# A zone is a spot the robot parks in: a fitted radius above this is a
+# calibration error (e.g. a circle fitted through near-collinear points)
+MAX_ZONE_RADIUS = 2.0
+
+# Spatial index cell size (m)
+INDEX_CELL = 1.0
+
+
+class LayoutError(ValueError):
+    """The layout file is malformed or geometrically invalid"""
+
+    def __init__(self, path, problems):
+        self.problems = problems
+        super().__init__(f"{path}: " + "; ".join(problems))
+
+
+# ============================================
+# VALIDATION
+# ============================================
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_layout(data):
+    """Returns (errors, warnings) for a parsed layout"""
+    errors = []
+    warnings = []
+    zones = data.get("zones")
+    if not isinstance(zones, dict):
+        return ["'zones' must map each kind to a list of zones"], warnings
+
+    bounds = data.get("bounds")
+    seen = set()
+    for kind in ZONE_KINDS:
+        entries = zones.get(kind)
+        if not entries:
+            errors.append(f"no {kind} zones")
+            continue
+        for zone in entries:
+            zone_id = zone.get("id")
+            if not isinstance(zone_id, str) or not zone_id:
+                errors.append(f"{kind} zone without an id")
+                continue
+            if zone_id in seen:
+                errors.append(f"duplicate zone id {zone_id}")
+            seen.add(zone_id)
+            if not all(_number(zone.get(key)) for key in ("x", "z", "radius")):
+                errors.append(f"{zone_id}: x, z and radius must be numbers")
+                continue
+            if not 0.0 < zone["radius"] <= MAX_ZONE_RADIUS:
+                errors.append(f"{zone_id}: radius {zone['radius']} outside (0, {MAX_ZONE_RADIUS}] m")
+            if bounds and not (bounds["x"][0] <= zone["x"] <= bounds["x"][1]
+                               and bounds["z"][0] <= zone["z"] <= bounds["z"][1]):
+                errors.append(f"{zone_id}: centre ({zone['x']}, {zone['z']}) outside the floor bounds")
+    for kind in zones:
+        if kind not in ZONE_KINDS:
+            warnings.append(f"unknown zone kind '{kind}' ignored")
+
+    for obstacle in data.get("obstacles", []):
+        if not all(_number(obstacle.get(key)) for key in ("x", "z", "radius")):
+            errors.append(f"obstacle {obstacle.get('id', '?')}: x, z and radius must be numbers")
+            continue
+        for kind in ZONE_KINDS:
+            for zone in zones.get(kind) or []:
+                if (all(_number(zone.get(key)) for key in ("x", "z"))
+                        and math.hypot(zone["x"] - obstacle["x"], zone["z"] - obstacle["z"])
+                        < obstacle["radius"]):
+                    errors.append(f"{zone['id']}: centre inside obstacle {obstacle.get('id', '?')}")
+
+    for aisle in data.get("aisles", []):
+        ends = [aisle.get("from"), aisle.get("to")]
+        if not (all(isinstance(p, list) and len(p) == 2 and all(map(_number, p)) for p in ends)
+                and _number(aisle.get("width")) and aisle["width"] > 0):
+            errors.append(f"aisle {aisle.get('id', '?')}: needs from/to [x, z] and a positive width")
+
+    offset = data.get("gps_offset", {"x": 0.0, "z": 0.0})
+    if not (_number(offset.get("x")) and _number(offset.get("z"))):
+        errors.append("gps_offset needs numeric x and z")
+
+    # Different zones whose centres nearly coincide are usually one spot logged twice
+    flat = [z for kind in ZONE_KINDS for z in zones.get(kind) or []
+            if all(_number(z.get(key)) for key in ("x", "z"))]
+    for i, a in enumerate(flat):
+        for b in flat[i + 1:]:
+            if math.hypot(a["x"] - b["x"], a["z"] - b["z"]) < 0.05:
+                warnings.append(f"{a['id']} and {b['id']} are less than 5 cm apart")
+    return errors, warnings
+
+
+# ============================================
+# COMPILED MODEL
+# ============================================
+
+class DistanceMatrix:
+    """Pairwise zone distances on the (x, z) ground plane"""
+
+    def __init__(self, zones):
+        self.ids = [z['id'] for z in zones]
+        self.index = {zone_id: i for i, zone_id in enumerate(self.ids)}
+        self.xy = np.array([(z['x'], z['z']) for z in zones], dtype=float).reshape(-1, 2)
+        delta = self.xy[:, None, :] - self.xy[None, :, :]
+        self.matrix = np.hypot(delta[..., 0], delta[..., 1])
+
+    def between(self, a, b):
+        return float(self.matrix[self.index[a], self.index[b]])
+
+    def from_point(self, position):
+        """Distance from an (x, y) position to every zone"""
+        return np.hypot(self.xy[:, 0] - position[0], self.xy[:, 1] - position[1])
+
+
+class ZoneModel:
+    """
+    Validated layout as arrays. Zone dicts ({"id", "x", "z", "radius"})
+    are kept for code that passes zones around; geometry queries use the
+    arrays and the grid index.
+    """
+
+    def __init__(self, data, path=None):
+        self.path = path
+        self.name = data.get("name", "warehouse")
+        offset = data.get("gps_offset", {"x": 0.0, "z": 0.0})
+        self.gps_offset = {"x": float(offset["x"]), "z": float(offset["z"])}
+        self.bounds = data.get("bounds")
+        self.warnings = validate_layout(data)[1]
+
+        self.zones = {kind: [{"id": z["id"], "x": float(z["x"]), "z": float(z["z"]),
+                              "radius": float(z["radius"])} for z in data["zones"][kind]]
+                      for kind in ZONE_KINDS}
+        self.all_zones = [z for kind in ZONE_KINDS for z in self.zones[kind]]
+        self.ids = [z["id"] for z in self.all_zones]
+        self.index = {zone_id: i for i, zone_id in enumerate(self.ids)}
+        self.kind = np.array([ZONE_KINDS.index(kind) for kind in ZONE_KINDS
+                              for _ in self.zones[kind]], dtype=np.int8)
+        self.xy = np.array([(z["x"], z["z"]) for z in self.all_zones], dtype=float)
+        self.radius = np.array([z["radius"] for z in self.all_zones], dtype=float)
+        self.distances = DistanceMatrix(self.all_zones)
+
+        self.obstacles = np.array([(o["x"], o["z"], o["radius"]) for o in data.get("obstacles", [])],
+                                  dtype=float).reshape(-1, 3)
+        self.aisles = [dict(a) for a in data.get("aisles", [])]
+        self.aisle_segments = np.array([(a["from"], a["to"]) for a in self.aisles],
+                                       dtype=float).reshape(-1, 2, 2)
+        self.aisle_width = np.array([a["width"] for a in self.aisles], dtype=float)
+
+        # Grid index: cell -> indices of zones whose circle overlaps the cell
+        self.cells = {}
+        for i, ((x, z), r) in enumerate(zip(self.xy, self.radius)):
+            for cx in range(self._cell(x - r), self._cell(x + r) + 1):
+                for cz in range(self._cell(z - r), self._cell(z + r) + 1):
+                    self.cells.setdefault((cx, cz), []).append(i)
+        self.cells = {cell: np.array(members) for cell, members in self.cells.items()}
+
+    @staticmethod
+    def _cell(value):
+        return int(math.floor(value / INDEX_CELL))
+
+    def zone(self, zone_id):
+        return self.all_zones[self.index[zone_id]]
+
+    def zone_at(self, x, z, kind=None):
+        """Zone whose circle contains (x, z), closest centre first; None if none"""
+        members = self.cells.get((self._cell(x), self._cell(z)))
+        if members is None:
+            return None
+        if kind is not None:
+            members = members[self.kind[members] == ZONE_KINDS.index(kind)]
+        distance = np.hypot(self.xy[members, 0] - x, self.xy[members, 1] - z)
+        inside = distance < self.radius[members]
+        if not inside.any():
+            return None
+        return self.all_zones[members[inside][np.argmin(distance[inside])]]
+
+    def nearest(self, x, z, kind):
+        """Closest zone of a kind to (x, z)"""
+        members = np.flatnonzero(self.kind == ZONE_KINDS.index(kind))
+        distance = np.hypot(self.xy[members, 0] - x, self.xy[members, 1] - z)
+        return self.all_zones[members[np.argmin(distance)]]
+
+    def in_aisle(self, x, z):
+        """True when (x, z) lies within half an aisle width of an aisle centre line"""
+        if not len(self.aisles):
+            return False
+        start = self.aisle_segments[:, 0]
+        direction = self.aisle_segments[:, 1] - start
+        length_sq = np.maximum((direction ** 2).sum(axis=1), 1e-12)
+        t = np.clip(((np.array([x, z]) - start) * direction).sum(axis=1) / length_sq, 0.0, 1.0)
+        closest = start + direction * t[:, None]
+        distance = np.hypot(closest[:, 0] - x, closest[:, 1] - z)
+        return bool((distance <= self.aisle_width / 2).any())
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "zones": {kind: [z["id"] for z in self.zones[kind]] for kind in ZONE_KINDS},
+            "obstacles": len(self.obstacles),
+            "aisles": [a.get("id") for a in self.aisles],
+            "gps_offset": self.gps_offset,
+            "index_cells": len(self.cells),
+            "max_zone_distance": round(float(self.distances.matrix.max()), 3) if self.ids else 0.0,
+            "warnings": self.warnings,
+        }
+
+
+# ============================================
+# LOADING AND WRITING
+# ============================================
+
+_LOADED = {}
+
+
+def load_layout(path=LAYOUT_PATH):
+    """Validated, compiled ZoneModel for a layout file (cached per file version)"""
+    path = os.path.abspath(path)
+    key = (path, os.path.getmtime(path))
+    model = _LOADED.get(key)
+    if model is None:
+        with open(path) as f:
+            data = json.load(f)
+        errors = validate_layout(data)[0]
+        if errors:
+            raise LayoutError(path, errors)
+        model = _LOADED[key] = ZoneModel(data, path)
+    return model
+
+
+def write_layout(path, zones, gps_offset=None, bounds=None, obstacles=(), aisles=(),
+                 name="warehouse"):
+    """
+    Write a layout file from {kind: [zone dicts]}. Returns (errors,
+    warnings); the file is written either way so a partial survey is kept.
+    """
+    data = {
+        "name": name,
+        "gps_offset": gps_offset or {"x": 0.0, "z": 0.0},
+        "zones": {kind: [{"id": z["id"], "x": round(z["x"], 4), "z": round(z["z"], 4),
+                          "radius": round(z["radius"], 4)} for z in zones.get(kind, [])]
+                  for kind in ZONE_KINDS},
+        "obstacles": list(obstacles),
+        "aisles": list(aisles),
+    }
+    if bounds:
+        data["bounds"] = bounds
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return validate_layout(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and compile a warehouse layout file")
+    parser.add_argument("path", nargs="?", default=LAYOUT_PATH)
+    parser.add_argument("--json", action="store_true", help="print the compiled summary as JSON")
+    args = parser.parse_args()
+
+    try:
+        model = load_layout(args.path)
+    except LayoutError as e:
+        print(f"❌ Invalid layout {args.path}")
+        for problem in e.problems:
+            print(f"   - {problem}")
+        raise SystemExit(1)
+
+    summary = model.summary()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"\n{'='*70}")
+    print(f"🗺️  LAYOUT {summary['name']} - {len(model.ids)} zones, "
+          f"{summary['obstacles']} obstacles, {len(summary['aisles'])} aisles")
+    print(f"{'='*70}")
+    for kind in ZONE_KINDS:
+        print(f"   {kind:<9} " + ", ".join(summary["zones"][kind]))
+    print(f"   GPS offset: x={model.gps_offset['x']}, z={model.gps_offset['z']}")
+    for warning in summary["warnings"]:
+        print(f"   ⚠️  {warning}")
+    print(f"{'='*70}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+WAREHOUSE ZONES - Zone lists from the default layout file
+Shared by the Webots controller and the offline simulators
+Edit warehouse_layout.json (validated by warehouse_layout.py) to change them
+"""
+
+from warehouse_layout import load_layout
+
+LAYOUT = load_layout()
+
+PICKUP_ZONES = LAYOUT.zones["pickup"]
+SHELF_ZONES = LAYOUT.zones["shelf"]
+DELIVERY_ZONES = LAYOUT.zones["delivery"]
+CHARGING_STATIONS = LAYOUT.zones["charger"]
+
+GPS_OFFSET = LAYOUT.gps_offset